@@ -0,0 +1,155 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Benchmark for the embedding predicate of the STIX importer.
+
+A STIX package with a wide Observables container (10000 observables by default)
+is parsed into its dictionary representation, i.e., the import is run
+without writing anything to the database. The script reports the time taken,
+the time spent in the embedding predicate and the number of attribute
+dictionaries built by the predicate.
+
+Run from the top-level directory of the repository::
+
+    python benchmarks/embedding_predicate.py [-n <number of observables>] [-r <repetitions>]
+"""
+
+import sys
+import os
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from django.conf import settings
+
+settings.configure(
+    USE_TZ=True,
+    DATABASES={
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+        }
+    },
+    INSTALLED_APPS=[
+        "dingos",
+        "mantis_stix_importer",
+    ],
+)
+
+from mantis_core.import_handling import MantisImporter
+
+import mantis_stix_importer.importer as stix_importer
+
+
+PACKAGE_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<stix:STIX_Package xmlns:stix="http://stix.mitre.org/stix-1"
+    xmlns:cybox="http://cybox.mitre.org/cybox-2"
+    xmlns:cyboxCommon="http://cybox.mitre.org/common-2"
+    xmlns:AddressObj="http://cybox.mitre.org/objects#AddressObject-2"
+    xmlns:URIObj="http://cybox.mitre.org/objects#URIObject-2"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xmlns:example="http://example.com/"
+    id="example:Package-benchmark" version="1.0.1">
+  <stix:Observables cybox_major_version="2" cybox_minor_version="0">
+%s
+  </stix:Observables>
+</stix:STIX_Package>
+"""
+
+OBSERVABLE_TEMPLATES = [
+    """    <cybox:Observable id="example:Observable-%(n)d">
+      <cybox:Object id="example:Object-%(n)d">
+        <cybox:Properties xsi:type="AddressObj:AddressObjectType" category="ipv4-addr">
+          <AddressObj:Address_Value condition="Equals">10.%(a)d.%(b)d.%(c)d</AddressObj:Address_Value>
+        </cybox:Properties>
+      </cybox:Object>
+    </cybox:Observable>""",
+    """    <cybox:Observable id="example:Observable-%(n)d">
+      <cybox:Object id="example:Object-%(n)d">
+        <cybox:Properties xsi:type="URIObj:URIObjectType" type="URL">
+          <URIObj:Value condition="Equals" datatype="AnyURI">http://host-%(n)d.example.com/index.html</URIObj:Value>
+        </cybox:Properties>
+      </cybox:Object>
+    </cybox:Observable>""",
+]
+
+
+def generate_package(number_of_observables):
+    observables = []
+    for n in range(number_of_observables):
+        observables.append(OBSERVABLE_TEMPLATES[n % len(OBSERVABLE_TEMPLATES)] % {'n': n,
+                                                                                   'a': (n >> 16) % 256,
+                                                                                   'b': (n >> 8) % 256,
+                                                                                   'c': n % 256})
+    return PACKAGE_TEMPLATE % "\n".join(observables)
+
+
+def run(xml_content):
+    """
+    Parse the package with the hooks of the STIX importer and return
+    (seconds, seconds spent in the predicate, number of attribute extractions).
+    """
+
+    importer = stix_importer.STIX_Import()
+
+    counters = {'extractions': 0, 'predicate_seconds': 0.0}
+
+    original_extract_attributes = stix_importer.extract_attributes
+
+    def counting_extract_attributes(*args, **kwargs):
+        counters['extractions'] += 1
+        return original_extract_attributes(*args, **kwargs)
+
+    def timed_predicate(parent, child, ns_mapping):
+        start = time.time()
+        try:
+            return importer.stix_embedding_pred(parent, child, ns_mapping)
+        finally:
+            counters['predicate_seconds'] += time.time() - start
+
+    stix_importer.extract_attributes = counting_extract_attributes
+    try:
+        start = time.time()
+        MantisImporter.xml_import(xml_content=xml_content,
+                                  ns_mapping=importer.namespace_dict,
+                                  embedded_predicate=timed_predicate,
+                                  id_and_revision_extractor=importer.id_and_revision_extractor)
+        seconds = time.time() - start
+    finally:
+        stix_importer.extract_attributes = original_extract_attributes
+
+    return (seconds, counters['predicate_seconds'], counters['extractions'])
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option('-n', '--observables', type='int', dest='observables', default=10000,
+                      help="Number of observables in the generated package")
+    parser.add_option('-r', '--repetitions', type='int', dest='repetitions', default=3,
+                      help="Number of runs; the fastest run is reported")
+    (options, args) = parser.parse_args()
+
+    xml_content = generate_package(options.observables)
+
+    results = [run(xml_content) for i in range(options.repetitions)]
+    (seconds, predicate_seconds, extractions) = min(results)
+
+    sys.stdout.write("observables: %d (%d KB)\n" % (options.observables, len(xml_content) / 1024))
+    sys.stdout.write("parse time: %.2fs\n" % seconds)
+    sys.stdout.write("time in embedding predicate: %.2fs\n" % predicate_seconds)
+    sys.stdout.write("attribute extractions: %d\n" % extractions)
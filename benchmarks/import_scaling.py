@@ -0,0 +1,189 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Scaling benchmark for the STIX importer.
+
+For each size, a synthetic package (see ``stix_corpus.py``) is generated
+and imported into an empty SQLite database. Half of the objects of a package
+are observables, the other half are indicators. The script reports for each
+size the objects and facts imported per second, the database queries per
+object and the peak resident set size of the process.
+
+Each size is imported in a process of its own, so that the peak RSS
+of one import is not hidden by a larger import before it, and each import
+starts with a fresh database. With ``--streaming``, the streaming import is
+used; this is the only sensible choice for the largest sizes.
+
+Run from the top-level directory of the repository::
+
+    python benchmarks/import_scaling.py [-s 10,100,1000,10000] [--streaming] [-f <fanout>]
+
+Sizes up to 1000000 objects are possible, but take hours with SQLite.
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import resource
+import tempfile
+import subprocess
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stix_corpus
+
+
+DEFAULT_SIZES = '10,100,1000,10000'
+
+
+def setup(directory):
+    """
+    Configure Django with a SQLite database in the given directory and
+    create the tables.
+    """
+
+    from django.conf import settings
+
+    settings.configure(
+        USE_TZ=True,
+        DATABASES={
+            "default": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": os.path.join(directory, 'benchmark.sqlite'),
+            }
+        },
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "dingos",
+            "mantis_stix_importer",
+        ],
+        DINGOS={'BLOB_ROOT': os.path.join(directory, 'blobs')},
+    )
+
+    from django.core.management import call_command
+
+    call_command('syncdb', interactive=False, verbosity=0)
+
+
+def run(size, options):
+    """
+    Generate a package with the given number of objects, import it and
+    return the measurements as dictionary.
+    """
+
+    directory = tempfile.mkdtemp(prefix='mantis-benchmark-')
+
+    try:
+        setup(directory)
+
+        from mantis_stix_importer.importer import STIX_Import
+
+        indicators = size // 2
+        observables = size - indicators
+
+        filename = os.path.join(directory, 'package.xml')
+        with open(filename, 'w') as package_file:
+            stix_corpus.write_package(package_file,
+                                      indicators=indicators,
+                                      observables=observables,
+                                      fanout=options.fanout,
+                                      openioc_every=options.openioc_every,
+                                      raw_size=options.raw_size)
+
+        start = time.time()
+        stats = STIX_Import().xml_import(filepath=filename,
+                                         streaming=options.streaming,
+                                         transactional=options.transactional,
+                                         profile=True)
+        seconds = time.time() - start
+
+        phases = stats['phases'].values()
+
+        return {'size': size,
+                'bytes': os.path.getsize(filename),
+                'seconds': seconds,
+                'objects': sum([phase['objects'] for phase in phases]),
+                'facts': sum([phase['facts'] for phase in phases]),
+                'queries': stats['queries'],
+                # ru_maxrss is given in kilobytes on Linux
+                'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option('-s', '--sizes', dest='sizes', default=DEFAULT_SIZES,
+                      help="Comma-separated list of package sizes (number of objects)")
+    parser.add_option('-f', '--fanout', type='int', dest='fanout', default=2,
+                      help="Number of observables referenced by each indicator")
+    parser.add_option('--openioc-every', type='int', dest='openioc_every', default=10,
+                      help="Embed an OpenIOC test mechanism in every n-th indicator (0: none)")
+    parser.add_option('--raw-size', type='int', dest='raw_size', default=2048,
+                      help="Size of the Raw_Header and Raw_Artifact values in bytes")
+    parser.add_option('--streaming', action='store_true', dest='streaming', default=False,
+                      help="Use the streaming import")
+    parser.add_option('--transactional', action='store_true', dest='transactional', default=False,
+                      help="Use the transactional import")
+    parser.add_option('--single', type='int', dest='single', default=None,
+                      help="Run a single size in this process and write the result as JSON "
+                           "(used internally)")
+    (options, args) = parser.parse_args()
+
+    if options.single is not None:
+        sys.stdout.write(json.dumps(run(options.single, options)) + "\n")
+        sys.exit(0)
+
+    sys.stdout.write("%10s %10s %10s %10s %10s %10s %10s %12s\n" % ('size', 'KB', 'seconds', 'objects',
+                                                                   'objects/s', 'facts/s', 'queries/obj',
+                                                                   'peak RSS MB'))
+
+    for size in [int(size) for size in options.sizes.split(',')]:
+        arguments = [sys.executable, os.path.abspath(__file__),
+                     '--single', str(size),
+                     '--fanout', str(options.fanout),
+                     '--openioc-every', str(options.openioc_every),
+                     '--raw-size', str(options.raw_size)]
+        if options.streaming:
+            arguments.append('--streaming')
+        if options.transactional:
+            arguments.append('--transactional')
+
+        output = subprocess.Popen(arguments, stdout=subprocess.PIPE).communicate()[0]
+        try:
+            result = json.loads(output.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            sys.stdout.write("%10d failed\n" % size)
+            continue
+
+        seconds = result['seconds'] or 1e-9
+        sys.stdout.write("%10d %10d %10.2f %10d %10.1f %10.1f %10.2f %12.1f\n" % (
+            size,
+            result['bytes'] / 1024,
+            result['seconds'],
+            result['objects'],
+            result['objects'] / seconds,
+            result['facts'] / seconds,
+            float(result['queries']) / max(result['objects'], 1),
+            result['max_rss'] / 1024.0))
+        sys.stdout.flush()
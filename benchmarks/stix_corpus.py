@@ -0,0 +1,383 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Generator for synthetic STIX packages.
+
+A package consists of
+
+- a header with a TLP marking in its ``Handling``,
+- a TTP with a kill chain (``Kill_Chains/Kill_Chain/Kill_Chain_Phase``),
+- M observables, cycling through the CybOX object types address, URI (with a
+  ``value_set``), domain name, file (with hashes), email message (with a
+  ``##comma##``-separated subject and a ``Raw_Header``) and artifact (with
+  a ``Raw_Artifact``),
+- N indicators, each of which references ``fanout`` observables by idref,
+  refers to a phase of the kill chain and carries a marking of its own;
+  every ``openioc_every``-th indicator contains an OpenIOC document as
+  test mechanism.
+
+All values are derived from the number of the indicator or observable,
+so that the same parameters always yield the same package and no two
+observables have the same content. The package is written piece by piece,
+so that packages with a million observables can be generated without
+holding them in memory.
+
+Run from the top-level directory of the repository::
+
+    python benchmarks/stix_corpus.py [-i <indicators>] [-o <observables>] [-f <fanout>] <output file>
+"""
+
+import sys
+import base64
+from optparse import OptionParser
+from StringIO import StringIO
+
+
+PACKAGE_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<stix:STIX_Package xmlns:stix="http://stix.mitre.org/stix-1"
+    xmlns:stixCommon="http://stix.mitre.org/common-1"
+    xmlns:indicator="http://stix.mitre.org/Indicator-2"
+    xmlns:ttp="http://stix.mitre.org/TTP-1"
+    xmlns:marking="http://data-marking.mitre.org/Marking-1"
+    xmlns:tlpMarking="http://data-marking.mitre.org/extensions/MarkingStructure#TLP-1"
+    xmlns:stix-openioc="http://stix.mitre.org/extensions/TestMechanism#OpenIOC2010-1"
+    xmlns:ioc="http://schemas.mandiant.com/2010/ioc"
+    xmlns:cybox="http://cybox.mitre.org/cybox-2"
+    xmlns:cyboxCommon="http://cybox.mitre.org/common-2"
+    xmlns:AddressObj="http://cybox.mitre.org/objects#AddressObject-2"
+    xmlns:URIObj="http://cybox.mitre.org/objects#URIObject-2"
+    xmlns:DomainNameObj="http://cybox.mitre.org/objects#DomainNameObject-1"
+    xmlns:FileObj="http://cybox.mitre.org/objects#FileObject-2"
+    xmlns:EmailMessageObj="http://cybox.mitre.org/objects#EmailMessageObject-2"
+    xmlns:ArtifactObj="http://cybox.mitre.org/objects#ArtifactObject-2"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xmlns:%(prefix)s="%(namespace)s"
+    id="%(prefix)s:Package-%(package)s" version="1.0.1">
+  <stix:STIX_Header>
+    <stix:Title>Synthetic package %(package)s</stix:Title>
+    <stix:Handling>
+      <marking:Marking>
+        <marking:Controlled_Structure>//node()</marking:Controlled_Structure>
+        <marking:Marking_Structure xsi:type="tlpMarking:TLPMarkingStructureType" color="AMBER"/>
+      </marking:Marking>
+    </stix:Handling>
+    <stix:Information_Source>
+      <stixCommon:Time>
+        <cyboxCommon:Produced_Time>%(produced_time)s</cyboxCommon:Produced_Time>
+      </stixCommon:Time>
+    </stix:Information_Source>
+  </stix:STIX_Header>
+"""
+
+PACKAGE_FOOTER = """</stix:STIX_Package>
+"""
+
+OBSERVABLES_HEADER = """  <stix:Observables cybox_major_version="2" cybox_minor_version="1">
+"""
+
+OBSERVABLES_FOOTER = """  </stix:Observables>
+"""
+
+OBSERVABLE_TEMPLATES = [
+    """    <cybox:Observable id="%(prefix)s:Observable-%(n)d">
+      <cybox:Object id="%(prefix)s:Address-%(n)d">
+        <cybox:Properties xsi:type="AddressObj:AddressObjectType" category="ipv4-addr">
+          <AddressObj:Address_Value condition="Equals">10.%(a)d.%(b)d.%(c)d</AddressObj:Address_Value>
+        </cybox:Properties>
+      </cybox:Object>
+    </cybox:Observable>
+""",
+    """    <cybox:Observable id="%(prefix)s:Observable-%(n)d">
+      <cybox:Object id="%(prefix)s:URI-%(n)d">
+        <cybox:Properties xsi:type="URIObj:URIObjectType" type="URL">
+          <URIObj:Value condition="IsInSet" datatype="AnyURI" value_set="host-%(n)d.example.com/index.html, host-%(n)d.example.com/login.html, cdn.host-%(n)d.example.com/kb.html"/>
+        </cybox:Properties>
+      </cybox:Object>
+    </cybox:Observable>
+""",
+    """    <cybox:Observable id="%(prefix)s:Observable-%(n)d">
+      <cybox:Object id="%(prefix)s:DomainName-%(n)d">
+        <cybox:Properties xsi:type="DomainNameObj:DomainNameObjectType" type="FQDN">
+          <DomainNameObj:Value condition="Equals">c2-%(n)d.example.org</DomainNameObj:Value>
+        </cybox:Properties>
+      </cybox:Object>
+    </cybox:Observable>
+""",
+    """    <cybox:Observable id="%(prefix)s:Observable-%(n)d">
+      <cybox:Object id="%(prefix)s:File-%(n)d">
+        <cybox:Properties xsi:type="FileObj:FileObjectType">
+          <FileObj:File_Name condition="Equals">dropper-%(n)d.exe</FileObj:File_Name>
+          <FileObj:Size_In_Bytes>%(size)d</FileObj:Size_In_Bytes>
+          <FileObj:Hashes>
+            <cyboxCommon:Hash>
+              <cyboxCommon:Type xsi:type="cyboxVocabs:HashNameVocab-1.0" xmlns:cyboxVocabs="http://cybox.mitre.org/default_vocabularies-2">MD5</cyboxCommon:Type>
+              <cyboxCommon:Simple_Hash_Value condition="Equals">%(md5)s</cyboxCommon:Simple_Hash_Value>
+            </cyboxCommon:Hash>
+          </FileObj:Hashes>
+        </cybox:Properties>
+      </cybox:Object>
+    </cybox:Observable>
+""",
+    """    <cybox:Observable id="%(prefix)s:Observable-%(n)d">
+      <cybox:Object id="%(prefix)s:EmailMessage-%(n)d">
+        <cybox:Properties xsi:type="EmailMessageObj:EmailMessageObjectType">
+          <EmailMessageObj:Header>
+            <EmailMessageObj:Subject condition="Equals">Invoice %(n)d##comma##Reminder %(n)d##comma##Final notice %(n)d</EmailMessageObj:Subject>
+          </EmailMessageObj:Header>
+          <EmailMessageObj:Raw_Header>%(raw_header)s</EmailMessageObj:Raw_Header>
+        </cybox:Properties>
+      </cybox:Object>
+    </cybox:Observable>
+""",
+    """    <cybox:Observable id="%(prefix)s:Observable-%(n)d">
+      <cybox:Object id="%(prefix)s:Artifact-%(n)d">
+        <cybox:Properties xsi:type="ArtifactObj:ArtifactObjectType" type="File">
+          <ArtifactObj:Raw_Artifact>%(raw_artifact)s</ArtifactObj:Raw_Artifact>
+        </cybox:Properties>
+      </cybox:Object>
+    </cybox:Observable>
+""",
+]
+
+TTPS_TEMPLATE = """  <stix:TTPs>
+    <stix:TTP xsi:type="ttp:TTPType" id="%(prefix)s:TTP-%(package)s">
+      <ttp:Title>Kill chain of package %(package)s</ttp:Title>
+    </stix:TTP>
+    <stix:Kill_Chains>
+      <stixCommon:Kill_Chain id="%(prefix)s:KillChain-%(package)s" name="Synthetic kill chain" number_of_phases="%(phases)d">
+%(kill_chain_phases)s      </stixCommon:Kill_Chain>
+    </stix:Kill_Chains>
+  </stix:TTPs>
+"""
+
+KILL_CHAIN_PHASE_TEMPLATE = """        <stixCommon:Kill_Chain_Phase phase_id="%(prefix)s:KillChainPhase-%(package)s-%(phase)d" name="%(name)s" ordinality="%(phase)d"/>
+"""
+
+KILL_CHAIN_PHASE_NAMES = ['Reconnaissance', 'Weaponization', 'Delivery', 'Exploitation',
+                          'Installation', 'Command and Control', 'Actions on Objectives']
+
+INDICATORS_HEADER = """  <stix:Indicators>
+"""
+
+INDICATORS_FOOTER = """  </stix:Indicators>
+"""
+
+INDICATOR_HEADER = """    <stix:Indicator xsi:type="indicator:IndicatorType" id="%(prefix)s:Indicator-%(n)d">
+      <indicator:Title>Synthetic indicator %(n)d</indicator:Title>
+"""
+
+INDICATOR_OBSERVABLE_TEMPLATE = """      <indicator:Observable idref="%(prefix)s:Observable-%(observable)d"/>
+"""
+
+INDICATOR_COMPOSITION_HEADER = """      <indicator:Composite_Indicator_Expression operator="OR">
+"""
+
+INDICATOR_COMPOSITION_MEMBER_TEMPLATE = """        <indicator:Indicator id="%(prefix)s:Indicator-%(n)d-%(member)d">
+          <indicator:Observable idref="%(prefix)s:Observable-%(observable)d"/>
+        </indicator:Indicator>
+"""
+
+INDICATOR_COMPOSITION_FOOTER = """      </indicator:Composite_Indicator_Expression>
+"""
+
+INDICATOR_OPENIOC_TEMPLATE = """      <indicator:Test_Mechanisms>
+        <indicator:Test_Mechanism xsi:type="stix-openioc:OpenIOC2010TestMechanismType" id="%(prefix)s:TestMechanism-%(n)d">
+          <ioc:ioc id="%(uuid)s" last-modified="%(produced_time)s">
+            <ioc:short_description>Synthetic IOC %(n)d</ioc:short_description>
+            <ioc:authored_by>benchmark</ioc:authored_by>
+            <ioc:authored_date>%(produced_time)s</ioc:authored_date>
+            <ioc:definition>
+              <ioc:Indicator operator="OR" id="%(uuid)s-1">
+                <ioc:IndicatorItem id="%(uuid)s-2" condition="is">
+                  <ioc:Context document="FileItem" search="FileItem/Md5sum" type="mir"/>
+                  <ioc:Content type="md5">%(md5)s</ioc:Content>
+                </ioc:IndicatorItem>
+                <ioc:IndicatorItem id="%(uuid)s-3" condition="contains">
+                  <ioc:Context document="FileItem" search="FileItem/FileName" type="mir"/>
+                  <ioc:Content type="string">dropper-%(n)d</ioc:Content>
+                </ioc:IndicatorItem>
+              </ioc:Indicator>
+            </ioc:definition>
+          </ioc:ioc>
+        </indicator:Test_Mechanism>
+      </indicator:Test_Mechanisms>
+"""
+
+INDICATOR_FOOTER = """      <indicator:Kill_Chain_Phases>
+        <stixCommon:Kill_Chain_Phase phase_id="%(prefix)s:KillChainPhase-%(package)s-%(phase)d" kill_chain_id="%(prefix)s:KillChain-%(package)s"/>
+      </indicator:Kill_Chain_Phases>
+      <indicator:Handling>
+        <marking:Marking>
+          <marking:Controlled_Structure>..</marking:Controlled_Structure>
+          <marking:Marking_Structure xsi:type="tlpMarking:TLPMarkingStructureType" color="%(color)s"/>
+        </marking:Marking>
+      </indicator:Handling>
+    </stix:Indicator>
+"""
+
+TLP_COLORS = ['WHITE', 'GREEN', 'AMBER', 'RED']
+
+
+def observable_values(n, prefix, raw_size):
+    """
+    Return the values for the templates of the n-th observable.
+    """
+    # A cheap, but well-distributed 32-character hex string.
+    md5 = ('%08x' % ((n * 2654435761) % (1 << 32))) * 4
+    values = {'n': n,
+              'prefix': prefix,
+              'a': (n >> 16) % 256,
+              'b': (n >> 8) % 256,
+              'c': n % 256,
+              'size': 1024 + n,
+              'md5': md5}
+    template_number = n % len(OBSERVABLE_TEMPLATES)
+    if template_number == 4:
+        line = "Received: from relay-%d.example.net by mx.example.com; " % n
+        values['raw_header'] = (line * (raw_size // len(line) + 1))[:raw_size]
+    elif template_number == 5:
+        payload = ("MZ%d" % n) * (raw_size // 2 + 1)
+        values['raw_artifact'] = base64.b64encode(payload[:raw_size * 3 // 4])
+    return values
+
+
+def write_package(stream,
+                  indicators=10,
+                  observables=10,
+                  fanout=1,
+                  openioc_every=10,
+                  raw_size=2048,
+                  package='1',
+                  prefix='example',
+                  namespace='http://example.com/',
+                  produced_time='2014-01-01T10:00:00Z'):
+    """
+    Write a synthetic STIX package to the given stream.
+
+    - ``indicators``, ``observables``: number of indicators and observables.
+    - ``fanout``: number of observables referenced by each indicator; with
+      a fanout larger than one, the references are placed in a composite
+      indicator expression.
+    - ``openioc_every``: every n-th indicator contains an embedded OpenIOC
+      document (0: none).
+    - ``raw_size``: size in bytes of the ``Raw_Header`` and ``Raw_Artifact`` values.
+    - ``package``: suffix of the identifiers of the package, the TTP and the
+      kill chain, such that several packages of a corpus can be told apart.
+    """
+
+    package_values = {'prefix': prefix,
+                      'namespace': namespace,
+                      'package': package,
+                      'produced_time': produced_time,
+                      'phases': len(KILL_CHAIN_PHASE_NAMES)}
+
+    stream.write(PACKAGE_HEADER % package_values)
+
+    if observables:
+        stream.write(OBSERVABLES_HEADER)
+        for n in range(observables):
+            stream.write(OBSERVABLE_TEMPLATES[n % len(OBSERVABLE_TEMPLATES)] % observable_values(n, prefix, raw_size))
+        stream.write(OBSERVABLES_FOOTER)
+
+    if indicators:
+        stream.write(TTPS_TEMPLATE % dict(package_values,
+                                          kill_chain_phases=''.join(
+                                              [KILL_CHAIN_PHASE_TEMPLATE % dict(package_values,
+                                                                                phase=phase + 1,
+                                                                                name=name)
+                                               for (phase, name) in enumerate(KILL_CHAIN_PHASE_NAMES)])))
+
+        stream.write(INDICATORS_HEADER)
+        for n in range(indicators):
+            values = dict(package_values,
+                          n=n,
+                          phase=n % len(KILL_CHAIN_PHASE_NAMES) + 1,
+                          color=TLP_COLORS[n % len(TLP_COLORS)],
+                          md5=observable_values(n, prefix, 0)['md5'],
+                          uuid='%08x-0000-4000-8000-%012x' % (n, n))
+            stream.write(INDICATOR_HEADER % values)
+
+            # The referenced observables are spread over all observables,
+            # such that most observables are referenced by several indicators
+            # when there are more indicators than observables.
+            referenced = []
+            if observables:
+                referenced = [(n * fanout + member) % observables for member in range(fanout)]
+            if len(referenced) == 1:
+                stream.write(INDICATOR_OBSERVABLE_TEMPLATE % dict(values, observable=referenced[0]))
+            elif referenced:
+                stream.write(INDICATOR_COMPOSITION_HEADER)
+                for (member, observable) in enumerate(referenced):
+                    stream.write(INDICATOR_COMPOSITION_MEMBER_TEMPLATE % dict(values,
+                                                                              member=member,
+                                                                              observable=observable))
+                stream.write(INDICATOR_COMPOSITION_FOOTER)
+
+            if openioc_every and n % openioc_every == 0:
+                stream.write(INDICATOR_OPENIOC_TEMPLATE % values)
+
+            stream.write(INDICATOR_FOOTER % values)
+        stream.write(INDICATORS_FOOTER)
+
+    stream.write(PACKAGE_FOOTER)
+
+
+def generate_package(*args, **kwargs):
+    """
+    Return a synthetic STIX package as string; see ``write_package`` for the parameters.
+    """
+    stream = StringIO()
+    write_package(stream, *args, **kwargs)
+    return stream.getvalue()
+
+
+if __name__ == '__main__':
+    parser = OptionParser(usage="%prog [options] <output file>")
+    parser.add_option('-i', '--indicators', type='int', dest='indicators', default=100,
+                      help="Number of indicators")
+    parser.add_option('-o', '--observables', type='int', dest='observables', default=100,
+                      help="Number of observables")
+    parser.add_option('-f', '--fanout', type='int', dest='fanout', default=1,
+                      help="Number of observables referenced by each indicator")
+    parser.add_option('--openioc-every', type='int', dest='openioc_every', default=10,
+                      help="Embed an OpenIOC test mechanism in every n-th indicator (0: none)")
+    parser.add_option('--raw-size', type='int', dest='raw_size', default=2048,
+                      help="Size of the Raw_Header and Raw_Artifact values in bytes")
+    parser.add_option('--package', dest='package', default='1',
+                      help="Suffix of the package identifier")
+    (options, args) = parser.parse_args()
+
+    if len(args) != 1:
+        parser.error("No output file specified")
+
+    if args[0] == '-':
+        output = sys.stdout
+    else:
+        output = open(args[0], 'w')
+
+    try:
+        write_package(output,
+                      indicators=options.indicators,
+                      observables=options.observables,
+                      fanout=options.fanout,
+                      openioc_every=options.openioc_every,
+                      raw_size=options.raw_size,
+                      package=options.package)
+    finally:
+        if output is not sys.stdout:
+            output.close()
@@ -19,3 +19,81 @@ __version__ = '0.2.0'
 
 
 RAW_DATA_TO_DB_FOR_LENGTH_LESS_THAN = 256
+
+# Block size used when reading files in chunks (e.g., for hashing
+# the content in the streaming import)
+
+STREAMING_READ_BLOCK_SIZE = 1024 * 1024
+
+# Maximum number of identifiers that are looked up or updated in a single
+# query when references are resolved in bulk (SQLite allows at most
+# 999 parameters per query)
+
+BULK_QUERY_CHUNK_SIZE = 500
+
+# Maximum number of results of the derivation of InfoObject types
+# from namespace information that are memoized
+
+IOBJECT_TYPE_MEMO_SIZE = 1024
+
+# Maximum number of fact classes (fact term, attribute and attribute keys
+# of the node) for which the chain of applicable fact handlers is memoized
+
+FACT_HANDLER_MEMO_SIZE = 4096
+
+# Number of threads that write large values to the file system in the
+# background and maximum number of writes that may be pending before the
+# import waits for them to complete
+
+LARGE_VALUE_WRITER_THREADS = 4
+
+LARGE_VALUE_WRITER_MAX_PENDING = 256
+
+# Number of threads that process deferred content (OpenIOC documents
+# embedded as test mechanisms) concurrently with the rest of the import;
+# with 0, deferred content is processed by the importing thread.
+
+DEFERRED_PROCESSOR_THREADS = 4
+
+# Number of attempts for processing a piece of deferred content in another
+# thread (an attempt fails if two threads create the same DINGOS object)
+
+DEFERRED_PROCESSOR_ATTEMPTS = 5
+
+# Number of attempts for importing an object within a savepoint (in
+# transactional mode) if the import fails with an IntegrityError, as is the
+# case if another process (e.g., a worker of a parallel import) has created
+# the same DINGOS object in the meantime
+
+SAVEPOINT_IMPORT_ATTEMPTS = 3
+
+# Number of threads of an ImportExecutor, i.e., number of imports that run
+# at once (each with a database connection of its own), and maximum number
+# of imports that may wait for a thread
+
+IMPORT_EXECUTOR_THREADS = 2
+
+IMPORT_EXECUTOR_MAX_QUEUED = 16
+
+# Number of objects after which the progress of an import is recorded in
+# a checkpoint (in transactional mode, the progress is recorded whenever
+# the transaction is committed instead)
+
+IMPORT_CHECKPOINT_INTERVAL = 1000
+
+# Directory of the on-disk cache of parsed documents (None: no cache) and
+# maximum total size of its entries (see mantis_stix_importer.parse_cache).
+# Both can be configured in the MANTIS settings.
+
+PARSE_CACHE_DIR = None
+
+PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Storage backend for large values that are written to the file system
+# (dotted path of the class and keyword arguments for its instantiation;
+# see mantis_stix_importer.storage). Both can be configured in the
+# MANTIS settings.
+
+LARGE_VALUE_STORAGE = 'mantis_stix_importer.storage.DingosBlobStorage'
+
+LARGE_VALUE_STORAGE_OPTIONS = {}
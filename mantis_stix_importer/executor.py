@@ -0,0 +1,252 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Imports in the background, for services that must not block while a
+document is imported (e.g., a web frontend that accepts uploads or a
+service that polls feeds)::
+
+    executor = ImportExecutor(STIX_Import())
+
+    handle = executor.submit(xml_content=upload, timeout=600, transactional=True)
+    ...
+    result = handle.result()
+
+``submit`` takes the arguments of ``STIX_Import.xml_import`` and returns an
+``ImportHandle`` right away; the import runs in a thread of the executor.
+The handle is used to wait for the ``ImportResult`` (with a timeout, if
+desired) or to cancel the import; a callback passed to ``submit`` is called
+with the handle once the import has ended, e.g., for handing the result
+over to the event loop of the service.
+
+The executor bounds the number of imports in flight: at most ``threads``
+imports run at once, each with a database connection of its own, and at
+most ``max_queued`` imports wait for a thread. If all of them are taken,
+``submit`` raises ``ImportQueueFull`` (or, with ``block=True``, waits), such
+that a burst of uploads cannot exhaust the connections of the database.
+
+Cancellation is cooperative: an import that has not started yet does not
+run at all; a running import stops before it imports its next object
+(see ``ImportContext.check_cancelled``). The same holds for an import that
+has not been completed within the ``timeout`` given to ``submit``. Only a
+transactional import (``transactional=True``) is rolled back completely when
+it is cancelled.
+"""
+
+import time
+import logging
+import threading
+import traceback
+
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+
+from django.db import close_old_connections
+
+from mantis_stix_importer.importer import ImportCancelled
+
+from mantis_stix_importer import IMPORT_EXECUTOR_THREADS, IMPORT_EXECUTOR_MAX_QUEUED
+
+logger = logging.getLogger(__name__)
+
+
+class ImportQueueFull(StandardError):
+    """
+    Raised by ``ImportExecutor.submit`` if the maximum number of imports
+    is in flight.
+    """
+    pass
+
+
+class ImportResult(object):
+    """
+    Result of an import run by an ``ImportExecutor``:
+
+    - name: name of the import (see ``ImportExecutor.submit``)
+    - skipped: True if the content had already been imported (see the import ledger)
+    - stats: the measurements of the import if it has been profiled (``profile=True``)
+    - queued_seconds: time between submission and start of the import
+    - wall_seconds: duration of the import
+    """
+
+    def __init__(self, name, skipped, stats, queued_seconds, wall_seconds):
+        self.name = name
+        self.skipped = skipped
+        self.stats = stats
+        self.queued_seconds = queued_seconds
+        self.wall_seconds = wall_seconds
+
+    def __repr__(self):
+        return "<ImportResult %s: %s in %.2fs>" % (self.name,
+                                                   'skipped' if self.skipped else 'imported',
+                                                   self.wall_seconds)
+
+
+class ImportHandle(object):
+    """
+    Handle for an import submitted to an ``ImportExecutor``.
+    """
+
+    def __init__(self, name, timeout=None, callback=None):
+        self.name = name
+        self.submitted = time.time()
+        self.deadline = self.submitted + timeout if timeout else None
+        self.callback = callback
+        self.cancel_event = threading.Event()
+        self.finished = threading.Event()
+        self.started = None
+        self.outcome = None
+        self.error = None
+
+    def cancel(self):
+        """
+        Request the cancellation of the import. Returns False if the import
+        has already ended.
+        """
+        if self.finished.is_set():
+            return False
+        self.cancel_event.set()
+        return True
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def running(self):
+        return self.started is not None and not self.finished.is_set()
+
+    def done(self):
+        return self.finished.is_set()
+
+    def result(self, timeout=None):
+        """
+        Wait for the end of the import and return its ``ImportResult``; if the
+        import failed (or has been cancelled), the error is raised. If the
+        import has not ended within the given timeout (in seconds),
+        ``multiprocessing.TimeoutError`` is raised; the import goes on.
+        """
+        if not self.finished.wait(timeout):
+            raise TimeoutError("Import of %s has not ended within %s seconds" % (self.name, timeout))
+        if self.error is not None:
+            raise self.error
+        return self.outcome
+
+    def finish(self, outcome=None, error=None):
+        self.outcome = outcome
+        self.error = error
+        self.finished.set()
+        if self.callback:
+            try:
+                self.callback(self)
+            except Exception:
+                logger.error("Callback for import of %s failed. Traceback: %s" % (self.name, traceback.format_exc()))
+
+
+class ImportExecutor(object):
+    """
+    Runs imports with the given ``STIX_Import`` instance in a bounded pool
+    of threads (see the module documentation).
+    """
+
+    def __init__(self, importer, threads=IMPORT_EXECUTOR_THREADS, max_queued=IMPORT_EXECUTOR_MAX_QUEUED):
+        self.importer = importer
+        self.threads = threads
+        self.max_queued = max_queued
+        self.slots = threading.BoundedSemaphore(threads + max_queued)
+        # Created on first use, as for the LargeValueWriter
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def get_pool(self):
+        if self.pool is None:
+            with self.lock:
+                if self.pool is None:
+                    self.pool = ThreadPool(self.threads)
+        return self.pool
+
+    def submit(self, name=None, timeout=None, block=False, callback=None, **kwargs):
+        """
+        Submit an import with the given arguments of ``xml_import`` and
+        return its ``ImportHandle``:
+
+        - name: name of the import for log messages and the result (default:
+          the file path or 'XML content')
+        - timeout: the import is cancelled if it has not been completed within
+          the given number of seconds after submission
+        - block: wait for a free slot rather than raising ``ImportQueueFull``
+          if the maximum number of imports is in flight
+        - callback: function that is called (in the thread of the import) with
+          the handle once the import has ended
+        """
+
+        if not self.slots.acquire(block):
+            raise ImportQueueFull("%s imports are in flight" % (self.threads + self.max_queued))
+
+        try:
+            handle = ImportHandle(name or kwargs.get('filepath') or 'XML content', timeout, callback)
+            self.get_pool().apply_async(self.run, (handle,), kwargs)
+        except:
+            self.slots.release()
+            raise
+
+        return handle
+
+    def run(self, handle, **kwargs):
+        outcome = None
+        error = None
+
+        handle.started = time.time()
+
+        try:
+            if handle.cancelled():
+                raise ImportCancelled("Import of %s has been cancelled before it started" % handle.name)
+
+            # As for a request: connections that have expired or failed are
+            # closed before and after the work is done.
+            close_old_connections()
+            try:
+                stats = self.importer.xml_import(cancel_event=handle.cancel_event,
+                                                 deadline=handle.deadline,
+                                                 **kwargs)
+            finally:
+                close_old_connections()
+
+            outcome = ImportResult(handle.name,
+                                   self.importer.context.skipped,
+                                   stats,
+                                   handle.started - handle.submitted,
+                                   time.time() - handle.started)
+        except ImportCancelled as e:
+            logger.warning("Import of %s: %s" % (handle.name, e))
+            error = e
+        except Exception as e:
+            logger.error("Import of %s failed. Traceback: %s" % (handle.name, traceback.format_exc()))
+            error = e
+        finally:
+            # The slot is free before the callback is called, such that
+            # the callback can submit another import.
+            self.slots.release()
+
+        handle.finish(outcome, error)
+
+    def close(self):
+        """
+        Wait for all submitted imports and stop the threads.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
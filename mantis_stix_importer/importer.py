@@ -17,11 +17,21 @@
 
 
 
+import os
 import re
+import sys
+import mmap
+import time
 import logging
+import traceback
+import threading
 import hashlib
+import json
 import pprint
-from collections import deque
+from collections import deque, OrderedDict
+from multiprocessing.pool import ThreadPool
+
+import libxml2
 
 from django.utils.dateparse import parse_datetime
 
@@ -29,7 +39,13 @@ from django.core.files.base import ContentFile
 
 from django.utils import timezone
 
+from django.conf import settings
+
+from django.db import connection, transaction, close_old_connections, IntegrityError
+from django.db.models.signals import post_save
+
 from dingos.core.xml_utils import extract_attributes
+from dingos.core.datastructures import DingoObjDict
 
 from dingos.core.decorators import print_arguments
 from dingos.core.utilities import search_by_re_list
@@ -38,10 +54,14 @@ import dingos
 
 from dingos import *
 
-from dingos.models import FactDataType, write_large_value
+from dingos.models import FactDataType, Marking2X, write_large_value, dingos_class_map
+
+from dingos.import_handling import EXIST_ID_AND_NEWER_TIMESTAMP, EXIST_ID_AND_OLDER_TIMESTAMP, \
+    EXIST_ID_AND_EXACT_TIMESTAMP
 
 from mantis_core.models import \
-    Identifier, FactValue
+    Identifier, FactValue, IdentifierNameSpace, InfoObject, InfoObjectType, \
+    InfoObjectFamily, Revision, DataTypeNameSpace
 
 from mantis_openioc_importer.importer import OpenIOC_Import
 
@@ -52,7 +72,18 @@ from mantis_core.import_handling import MantisImporter
 
 # Import configuration constants from __init__.py
 
-from mantis_stix_importer import RAW_DATA_TO_DB_FOR_LENGTH_LESS_THAN
+from mantis_stix_importer.models import ImportLedgerEntry, InfoObjectFingerprint, ImportCheckpoint
+
+from mantis_stix_importer.storage import get_large_value_storage
+
+from mantis_stix_importer.sources import open_import_source
+
+from mantis_stix_importer.parse_cache import get_parse_cache
+
+from mantis_stix_importer import __version__, RAW_DATA_TO_DB_FOR_LENGTH_LESS_THAN, STREAMING_READ_BLOCK_SIZE, \
+    BULK_QUERY_CHUNK_SIZE, IOBJECT_TYPE_MEMO_SIZE, FACT_HANDLER_MEMO_SIZE, LARGE_VALUE_WRITER_THREADS, \
+    LARGE_VALUE_WRITER_MAX_PENDING, DEFERRED_PROCESSOR_THREADS, DEFERRED_PROCESSOR_ATTEMPTS, \
+    SAVEPOINT_IMPORT_ATTEMPTS, IMPORT_CHECKPOINT_INTERVAL
 
 logger = logging.getLogger(__name__)
 
@@ -60,7 +91,907 @@ logger = logging.getLogger(__name__)
 pp = pprint.PrettyPrinter(indent=2)
 
 
-class STIX_Import:
+class ImportCancelled(StandardError):
+    """
+    Raised when an import has been cancelled or has not been completed
+    in time (see ``ImportContext.check_cancelled``).
+    """
+    pass
+
+
+def chunks(items, size):
+    """
+    Split a list into lists of at most the given size.
+    """
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class IdentifierCache(object):
+    """
+    Map from (namespace uri, uid) to Identifier that is filled on first use
+    by the reference handler and by ``iobject_import``.
+
+    Without the cache, each reference to another object leads to a call
+    of ``create_iobject`` (which makes sure that the referenced object or
+    a PLACEHOLDER for it exists) and a query for the Identifier. With the cache,
+    this is done only once per referenced object. Because a reference may carry
+    a timestamp for which a PLACEHOLDER revision has to be created, we also keep
+    track of the revisions known to exist.
+
+    By default, the cache lives for a single import; it can be kept for
+    a batch of imports (see ``xml_import``). The counters ``hits`` and
+    ``misses`` are kept for the lifetime of the cache object.
+    """
+
+    def __init__(self):
+        self.identifiers = {}
+        self.revisions = set()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.identifiers.clear()
+        self.revisions.clear()
+
+    def lookup(self, namespace_uri, uid, timestamp=None):
+        """
+        Return the Identifier for the given namespace uri and uid, or None
+        if the object (or, if a timestamp is given, the revision) has not
+        been seen yet.
+        """
+        identifier = self.identifiers.get((namespace_uri, uid), None)
+
+        if identifier is None or (timestamp and not (namespace_uri, uid, timestamp) in self.revisions):
+            self.misses += 1
+            return None
+
+        if isinstance(identifier, dingos_class_map['InfoObject']):
+            # We store InfoObjects for which we have not needed the identifier
+            # so far, because retrieving it may cost a query.
+            identifier = identifier.identifier
+            self.identifiers[(namespace_uri, uid)] = identifier
+
+        self.hits += 1
+        return identifier
+
+    def add(self, namespace_uri, uid, identifier, timestamp=None):
+        """
+        Record an Identifier (or an InfoObject from which to take it) and,
+        if given, the timestamp of an existing revision.
+        """
+        if not (namespace_uri, uid) in self.identifiers or isinstance(identifier, dingos_class_map['Identifier']):
+            self.identifiers[(namespace_uri, uid)] = identifier
+        if timestamp:
+            self.revisions.add((namespace_uri, uid, timestamp))
+
+
+class LRUMemo(object):
+    """
+    Memo for results of a function that keeps at most ``size`` entries:
+    when the memo is full, the least recently used entry is dropped.
+
+    The counters ``hits`` and ``misses`` are kept for the lifetime of
+    the memo object. The memo can be shared by threads.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, key):
+        """
+        Return the result stored for the key or None.
+        """
+        with self.lock:
+            try:
+                result = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            # Re-insert the entry such that it becomes the most recently used one
+            self.entries[key] = result
+            self.hits += 1
+            return result
+
+    def add(self, key, result):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = result
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+class FactHandlerDispatcher(object):
+    """
+    Single entry for DINGOS' 'special_ft_handler' hook that replaces the list
+    of (predicate, handler) pairs returned by ``fact_handler_list``.
+
+    DINGOS evaluates every predicate of the list for every fact. Most of our
+    predicates, however, only look at the fact term, the attribute and the
+    keys of the attribute information; for each such class of facts, we
+    evaluate the predicates once and memoize the chain of handlers that
+    apply. Predicates that look at the value of a fact (these must be listed in
+    ``value_predicates``) stay in the chain and are evaluated for each fact.
+
+    The handlers are called in the order of the list; as with DINGOS, the
+    chain ends as soon as a handler returns False/None.
+    """
+
+    def __init__(self, handler_list, value_predicates=None):
+        self.handler_list = handler_list
+        self.value_predicates = value_predicates or []
+        self.chains = LRUMemo(FACT_HANDLER_MEMO_SIZE)
+
+    def handler_chain(self, fact, attr_info):
+        key = (fact['term'], fact['attribute'], frozenset(attr_info.keys()))
+        chain = self.chains.lookup(key)
+        if chain is None:
+            chain = []
+            for (predicate, handler) in self.handler_list:
+                if predicate in self.value_predicates:
+                    chain.append((predicate, handler))
+                elif predicate(fact, attr_info):
+                    chain.append((None, handler))
+            self.chains.add(key, chain)
+        return chain
+
+    def __call__(self, enrichment, fact, attr_info, add_fact_kargs):
+        handler_return_value = True
+        for (predicate, handler) in self.handler_chain(fact, attr_info):
+            if predicate is None or predicate(fact, attr_info):
+                handler_return_value = handler(enrichment, fact, attr_info, add_fact_kargs)
+                if not handler_return_value:
+                    break
+        return handler_return_value
+
+    def special_ft_handler(self):
+        """
+        Return the handler list to be passed to DINGOS.
+        """
+        return [(lambda fact, attr_info: True, self)]
+
+
+class TransactionBatcher(object):
+    """
+    Transaction that is kept open across the import of the objects of
+    a package and committed every ``commit_interval`` objects (or, if the
+    interval is 0, once at the end of the import).
+
+    Each object is imported within a savepoint (see ``STIX_Import.import_in_savepoint``),
+    so that an object whose import fails can be rolled back without
+    rolling back the other objects of the batch.
+
+    The transaction is begun lazily, so that no empty transaction is
+    committed at the end of a batch. The time spent in commits
+    is counted in ``commit_seconds``. If given, ``before_commit`` is called
+    within the transaction right before it is committed (e.g., for recording
+    the progress of the import in the same transaction), and ``after_rollback``
+    is called after the transaction has been rolled back (e.g., for forgetting
+    cached rows that no longer exist).
+    """
+
+    def __init__(self, commit_interval=0, before_commit=None, after_rollback=None):
+        self.commit_interval = commit_interval
+        self.before_commit = before_commit
+        self.after_rollback = after_rollback
+        self.block = None
+        self.object_count = 0
+        self.commit_count = 0
+        self.commit_seconds = 0.0
+
+    def begin(self):
+        if self.block is None:
+            self.block = transaction.atomic()
+            self.block.__enter__()
+
+    def object_done(self):
+        self.object_count += 1
+        if self.commit_interval and self.object_count % self.commit_interval == 0:
+            self.commit()
+
+    def commit(self):
+        if self.block is not None:
+            if self.before_commit:
+                self.before_commit()
+            (block, self.block) = (self.block, None)
+            start = time.time()
+            block.__exit__(None, None, None)
+            self.commit_seconds += time.time() - start
+            self.commit_count += 1
+
+    def rollback(self, exc_type, exc_value, exc_traceback):
+        if self.block is not None:
+            (block, self.block) = (self.block, None)
+            try:
+                block.__exit__(exc_type, exc_value, exc_traceback)
+            finally:
+                if self.after_rollback:
+                    self.after_rollback()
+
+
+class ImportCheckpointer(object):
+    """
+    Progress of the import of content, recorded in checkpoints (model
+    ``ImportCheckpoint``) such that an import that has failed can be
+    resumed: importing the same content with the same default timestamp
+    (and the same markings etc., see ``STIX_Import.import_options_digest``)
+    again skips the objects whose import has been recorded.
+
+    Objects are identified by their position: the number of the top-level
+    component (the DOM import imports all objects as one component, the
+    streaming import each top-level component in turn), the queue of
+    ``import_objects`` ('import_first' for markings, 'pending' for all other
+    objects) and the position in the queue. The order of the objects is
+    the same for the same content.
+
+    In transactional mode, the checkpoint is written within the transaction
+    right before it is committed (see ``TransactionBatcher``), so it records
+    exactly the committed objects. Otherwise, it is written every ``interval``
+    objects; after a failure, at most that many objects are imported again
+    (which does not change anything, since they are imported with the same
+    timestamps). Embedded content handed over to other importers (OpenIOC)
+    is not covered; it is processed again.
+
+    Once the import has been completed, the checkpoint is removed.
+    """
+
+    QUEUES = ['import_first', 'pending']
+
+    def __init__(self, content_hash, default_timestamp, options_digest='', filename=None, resume=True,
+                 interval=IMPORT_CHECKPOINT_INTERVAL):
+        self.content_hash = content_hash
+        self.default_timestamp = default_timestamp
+        self.options_digest = options_digest
+        self.filename = (filename or '')[:255]
+        self.interval = interval
+        self.component = -1
+        self.queue = None
+        self.position = -1
+        self.objects_done = 0
+        self.skipped = 0
+        self.resume_after = None
+        self.completed = False
+
+        checkpoints = self.checkpoints()
+        self.recorded = checkpoints.exists()
+
+        if resume and self.recorded:
+            checkpoint = checkpoints.get()
+            self.resume_after = (checkpoint.component, self.QUEUES.index(checkpoint.queue), checkpoint.position)
+            logger.info("Resuming import of %s after object %s of queue '%s' of component %s" % (
+                filename or content_hash, checkpoint.position, checkpoint.queue, checkpoint.component))
+
+    def checkpoints(self):
+        return ImportCheckpoint.objects.filter(content_hash=self.content_hash,
+                                               default_timestamp=self.default_timestamp,
+                                               options_digest=self.options_digest)
+
+    def key(self):
+        return (self.component, self.QUEUES.index(self.queue), self.position)
+
+    def next_component(self):
+        self.component += 1
+        self.queue = None
+        self.position = -1
+
+    def next_object(self, queue):
+        """
+        Advance to the next object of the given queue. Returns True if the
+        import of the object has already been recorded (and is to be skipped).
+        """
+        if queue != self.queue:
+            self.queue = queue
+            self.position = -1
+        self.position += 1
+        if self.resume_after is not None and self.key() <= self.resume_after:
+            self.skipped += 1
+            return True
+        return False
+
+    def object_done(self, transactional=False):
+        self.objects_done += 1
+        if not transactional and self.interval and self.objects_done % self.interval == 0:
+            self.record()
+
+    def record(self):
+        """
+        Record the position of the current object.
+        """
+        if self.completed or self.queue is None or (self.resume_after is not None
+                                                    and self.key() <= self.resume_after):
+            return
+        values = {'component': self.component, 'queue': self.queue, 'position': self.position,
+                  'filename': self.filename}
+        if not (self.recorded and self.checkpoints().update(updated=timezone.now(), **values)):
+            ImportCheckpoint.objects.create(content_hash=self.content_hash,
+                                            default_timestamp=self.default_timestamp,
+                                            options_digest=self.options_digest,
+                                            **values)
+        self.recorded = True
+
+    def clear(self):
+        """
+        Remove the checkpoint once the import has been completed.
+        """
+        self.completed = True
+        if self.recorded:
+            self.checkpoints().delete()
+            self.recorded = False
+        if self.skipped:
+            logger.info("Resumed import of %s: %s objects had been imported before" % (
+                self.filename or self.content_hash, self.skipped))
+
+
+class LargeValueWriter(object):
+    """
+    Writer for large values (see ``cybox_RAW_ft_handler``) that are stored
+    in the file system: the hash of a value is computed right away, but
+    the value is written by a pool of background threads, so that the
+    import does not wait for the disk. Since values are addressed by the hash
+    of their content, a value that is already stored (or is being written)
+    is not written again.
+
+    The values are written with a storage backend (see
+    ``mantis_stix_importer.storage``), by default the configured one.
+    Values that go to the database are written right away with
+    ``write_large_value``, since database writes must happen within the
+    transaction of the import.
+
+    ``flush`` must be called before the import ends; it waits for all
+    pending writes and raises the first error that occurred. Pending writes
+    are kept per thread, so that imports running in different threads
+    can share the writer: ``flush`` waits for the writes of its thread only.
+    """
+
+    def __init__(self, threads=LARGE_VALUE_WRITER_THREADS, max_pending=LARGE_VALUE_WRITER_MAX_PENDING,
+                 storage=None):
+        self.threads = threads
+        self.max_pending = max_pending
+        # Storage and pool are created on first use: importer objects are
+        # created when the import command is loaded (and before workers are forked)
+        self.storage = storage
+        self.pool = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.written = 0
+        self.skipped = 0
+
+    @property
+    def pending(self):
+        if not hasattr(self.local, 'pending'):
+            self.local.pending = {}
+        return self.local.pending
+
+    def get_storage(self):
+        if self.storage is None:
+            with self.lock:
+                if self.storage is None:
+                    self.storage = get_large_value_storage()
+        return self.storage
+
+    def get_pool(self):
+        if self.pool is None:
+            with self.lock:
+                if self.pool is None:
+                    self.pool = ThreadPool(self.threads)
+        return self.pool
+
+    def write(self, value, storage_location=dingos.DINGOS_LARGE_VALUE_DESTINATION):
+        """
+        Write a value and return the pair (value hash, storage location)
+        just as ``write_large_value``.
+        """
+
+        if storage_location != dingos.DINGOS_FILE_SYSTEM:
+            return write_large_value(value, storage_location)
+
+        storage = self.get_storage()
+
+        value_hash = hashlib.sha256(value).hexdigest()
+
+        pending = self.pending
+
+        if value_hash in pending or storage.exists(value_hash, len(value)):
+            self.skipped += 1
+        else:
+            if self.threads < 1:
+                storage.save(value_hash, value)
+            else:
+                if len(pending) >= self.max_pending:
+                    self.flush()
+                pending[value_hash] = self.get_pool().apply_async(storage.save, (value_hash, value))
+            self.written += 1
+
+        storage.add_to_index(value_hash, len(value))
+
+        return (value_hash, dingos.DINGOS_FILE_SYSTEM)
+
+    def flush(self, raise_errors=True):
+        """
+        Wait for all pending writes (of the current thread).
+        """
+        (pending, self.local.pending) = (self.pending, {})
+
+        error = None
+        for result in pending.values():
+            try:
+                result.get()
+            except Exception as e:
+                logger.error("Writing a large value failed: %s" % e)
+                error = error or e
+
+        if error and raise_errors:
+            raise error
+
+
+def standalone_xml(node):
+    """
+    Serialize an element of a libxml2 document as a document of its own;
+    the namespace declarations of its ancestors that the element uses are
+    copied to its root.
+    """
+    document = libxml2.newDoc("1.0")
+    try:
+        root = node.docCopyNode(document, 1)
+        document.setRootElement(root)
+        document.reconciliateNs(root)
+        return document.serialize("UTF-8")
+    finally:
+        document.freeDoc()
+
+
+class DeferredProcessorPool(object):
+    """
+    Pool of threads that process deferred content, i.e., content that the
+    DINGOS XML importer has left unprocessed for another importer (such as
+    OpenIOC documents embedded as test mechanisms).
+
+    Each piece of content is serialized as standalone document when it is
+    submitted, so that it does not keep the document it was found in alive;
+    the thread that processes it parses it again. Each thread keeps one
+    instance per processor class for the duration of an import (see
+    ``begin``); the instances get a copy of the namespace dictionary of the
+    import, since the importing thread keeps adding to it.
+
+    Processing runs concurrently with the rest of the import only if the
+    content can be written through other database connections: not within
+    a transaction of the importing thread (the objects of the import would
+    not be visible to the other connections) and not with SQLite (which
+    allows a single writer only). Otherwise, and with ``threads`` set to 0,
+    content is processed by the importing thread.
+
+    Content processed by another thread is imported in a transaction of
+    its own (see ``process_concurrently``).
+
+    ``flush`` must be called before the import ends; it waits for all
+    pending content and raises the first error that occurred. Imports
+    running in different threads can share the pool.
+    """
+
+    def __init__(self, processors, threads=DEFERRED_PROCESSOR_THREADS):
+        self.processors = processors
+        self.threads = threads
+        # Created on first use, as for the LargeValueWriter
+        self.pool = None
+        self.lock = threading.Lock()
+        self.generations = 0
+        # The state of an import (see ``begin``) is kept per importing
+        # thread, the processor instances per processing thread.
+        self.local = threading.local()
+
+    def begin(self, namespace_dict, concurrent=True):
+        """
+        Start a new import in the current thread with the given namespace
+        dictionary: processor instances of earlier imports are not reused.
+        With ``concurrent=False``, all content of the import is processed by
+        the importing thread.
+        """
+        with self.lock:
+            self.generations += 1
+            self.local.generation = self.generations
+        self.local.namespace_dict = namespace_dict
+        self.local.allow_concurrent = concurrent
+        self.local.pending = []
+
+    def concurrent(self):
+        """
+        Can content be processed by other threads right now?
+        """
+        if self.threads < 1 or not getattr(self.local, 'allow_concurrent', True) or connection.in_atomic_block:
+            return False
+        # SQLite allows a single writer only (and an in-memory database
+        # is private to its connection anyway)
+        if connection.vendor == 'sqlite':
+            return False
+        return True
+
+    def get_processor(self, name, generation=None, namespace_dict=None):
+        """
+        Return the instance of the given processor for the current thread and
+        the import of the given generation (default: the import of the current thread).
+        """
+        if generation is None:
+            generation = getattr(self.local, 'generation', 0)
+            namespace_dict = getattr(self.local, 'namespace_dict', {})
+        if getattr(self.local, 'instance_generation', None) != generation:
+            self.local.instance_generation = generation
+            self.local.instances = {}
+        if not name in self.local.instances:
+            self.local.instances[name] = self.processors[name](namespace_dict=dict(namespace_dict))
+        return self.local.instances[name]
+
+    def process(self, name, xml, generation=None, namespace_dict=None, **kwargs):
+        document = libxml2.readMemory(xml, len(xml), None, None,
+                                      libxml2.XML_PARSE_NONET | libxml2.XML_PARSE_HUGE)
+        try:
+            processor = self.get_processor(name, generation, namespace_dict)
+            return processor.xml_import(xml_content=document.getRootElement(),
+                                        initialize_importer=False,
+                                        **kwargs)
+        finally:
+            document.freeDoc()
+
+    def process_concurrently(self, name, xml, generation, namespace_dict, **kwargs):
+        # The connection of this thread may have been unused for a long time
+        close_old_connections()
+
+        # DINGOS creates fact terms, data types etc. on first use without
+        # guarding against concurrent creation; if another thread has created
+        # the same row in the meantime, we roll back and try again (the row
+        # is found then).
+
+        attempt = 1
+        while True:
+            try:
+                with transaction.atomic():
+                    return self.process(name, xml, generation, namespace_dict, **kwargs)
+            except IntegrityError:
+                if attempt >= DEFERRED_PROCESSOR_ATTEMPTS:
+                    raise
+                logger.debug("Concurrent creation of DINGOS objects; retrying deferred content")
+                attempt += 1
+
+    def submit(self, name, node, run=None, **kwargs):
+        """
+        Process the given libxml2 node (or a node already serialized with
+        ``standalone_xml``) with the processor of the given name.
+        If the node is processed by the importing thread, the processing is
+        done via ``run(function, *args, **kwargs)``, if given (e.g., within
+        a savepoint).
+        """
+
+        if isinstance(node, basestring):
+            xml = node
+        else:
+            xml = standalone_xml(node)
+
+        if not self.concurrent():
+            if run:
+                return run(self.process, name, xml, **kwargs)
+            return self.process(name, xml, **kwargs)
+
+        if self.pool is None:
+            with self.lock:
+                if self.pool is None:
+                    self.pool = ThreadPool(self.threads)
+        # The processing threads do not see the state of the importing
+        # thread; generation and namespaces go along with the content.
+        self.local.pending.append(self.pool.apply_async(self.process_concurrently,
+                                                        (name, xml, self.local.generation,
+                                                         self.local.namespace_dict),
+                                                        kwargs))
+
+    def flush(self, raise_errors=True):
+        """
+        Wait for all pending content of the import of the current thread.
+        """
+        (pending, self.local.pending) = (getattr(self.local, 'pending', []), [])
+
+        error = None
+        for result in pending:
+            try:
+                result.get()
+            except Exception as e:
+                logger.error("Processing deferred content failed: %s" % e)
+                error = error or e
+
+        if error and raise_errors:
+            raise error
+
+
+class NullPhase(object):
+    """
+    Stand-in for the phases of an ``ImportProfiler`` when profiling is off.
+    """
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        pass
+
+NULL_PHASE = NullPhase()
+
+
+class ImportPhase(object):
+    """
+    Context manager for a phase of an import (see ``ImportProfiler.phase``).
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.enter(self.name)
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.profiler.exit()
+
+
+class ImportProfiler(object):
+    """
+    Measurements for the phases of an import: for each phase, wall-clock
+    and CPU time, the number of database queries, the number of objects
+    passed to ``iobject_import`` and the number of InfoObjects, links to facts
+    (``InfoObject2Fact``) and facts that have been created.
+
+    Phases do not overlap: while a phase is entered within another one, the
+    measurements go to the inner phase only. What is not covered by any phase
+    is reported as phase 'other'.
+
+    For counting the queries, the profiler switches on the debug cursor of
+    the database connection for the duration of the import. Unless Django
+    runs in debug mode, the log of queries is emptied after each phase,
+    so that it does not grow with the size of the import.
+    """
+
+    PHASES = ['ledger',        # hashing the content and checking the import ledger
+              'parse',         # building the DOM (of the document or, when streaming, of a component)
+                               # or loading the extraction result from the parse cache
+              'extract',       # extracting the embedded objects into DingoObjDicts (DINGOS XML importer)
+              'preresolve',    # resolving the references of the objects in bulk
+              'markings',      # importing the markings (import_first queue)
+              'objects',       # importing all other objects (pending queue)
+              'openioc',       # deferred processing of embedded OpenIOC content
+              'large_values',  # waiting for the background writes of large values
+              'commit']        # final commit of a transactional import
+
+    COUNTERS = ['objects', 'created_objects', 'facts', 'new_facts']
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.stack = []
+        self.mark = None
+        self.start = None
+        self.total = None
+        self.use_debug_cursor = None
+        self.clear_queries = False
+        self.thread = None
+
+    def begin(self):
+        self.use_debug_cursor = connection.use_debug_cursor
+        self.clear_queries = not (self.use_debug_cursor or settings.DEBUG)
+        connection.use_debug_cursor = True
+        # Objects saved by other threads (e.g., by concurrent imports) are not counted
+        self.thread = threading.current_thread()
+        post_save.connect(self.saved, dispatch_uid=self.dispatch_uid())
+        self.start = self.measure()
+        self.mark = self.start
+        self.stack = ['other']
+
+    def end(self):
+        self.switch()
+        self.total = (self.mark[0] - self.start[0],
+                      self.mark[1] - self.start[1],
+                      sum([phase['queries'] for phase in self.phases.values()]))
+        post_save.disconnect(dispatch_uid=self.dispatch_uid())
+        connection.use_debug_cursor = self.use_debug_cursor
+
+    def dispatch_uid(self):
+        return 'mantis_stix_importer.ImportProfiler.%x' % id(self)
+
+    def measure(self):
+        times = os.times()
+        return (time.time(), times[0] + times[1], len(connection.queries))
+
+    def get_phase(self, name):
+        if not name in self.phases:
+            self.phases[name] = {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'queries': 0}
+            for counter in self.COUNTERS:
+                self.phases[name][counter] = 0
+        return self.phases[name]
+
+    def switch(self):
+        # Charge the measurements since the last switch to the current phase
+        mark = self.measure()
+        phase = self.get_phase(self.stack[-1])
+        phase['wall_seconds'] += mark[0] - self.mark[0]
+        phase['cpu_seconds'] += mark[1] - self.mark[1]
+        phase['queries'] += mark[2] - self.mark[2]
+        if self.clear_queries:
+            del connection.queries[:]
+            mark = (mark[0], mark[1], 0)
+        self.mark = mark
+
+    def enter(self, name):
+        self.switch()
+        self.stack.append(name)
+        self.get_phase(name)['calls'] += 1
+
+    def exit(self):
+        self.switch()
+        self.stack.pop()
+
+    def phase(self, name):
+        return ImportPhase(self, name)
+
+    def count(self, counter, number=1):
+        self.get_phase(self.stack[-1])[counter] += number
+
+    def saved(self, sender, created=False, **kwargs):
+        if created and threading.current_thread() is self.thread:
+            model_name = sender._meta.object_name
+            if model_name == 'InfoObject':
+                self.count('created_objects')
+            elif model_name == 'InfoObject2Fact':
+                self.count('facts')
+            elif model_name == 'Fact':
+                self.count('new_facts')
+
+    def stats(self):
+        """
+        Return the measurements as dictionary with the totals (keys 'wall_seconds',
+        'cpu_seconds', 'queries') and the measurements per phase (key 'phases').
+        """
+        phases = OrderedDict()
+        for name in self.PHASES + ['other']:
+            if name in self.phases:
+                phases[name] = dict(self.phases[name])
+        return {'wall_seconds': self.total[0],
+                'cpu_seconds': self.total[1],
+                'queries': self.total[2],
+                'phases': phases}
+
+    @classmethod
+    def merge(cls, stats_list):
+        """
+        Sum up the statistics of several imports.
+        """
+        merged = {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'queries': 0, 'phases': OrderedDict()}
+        for name in cls.PHASES + ['other']:
+            for stats in stats_list:
+                if name in stats['phases']:
+                    phase = merged['phases'].setdefault(name, {})
+                    for (key, value) in stats['phases'][name].items():
+                        phase[key] = phase.get(key, 0) + value
+        for stats in stats_list:
+            for key in ['wall_seconds', 'cpu_seconds', 'queries']:
+                merged[key] += stats[key]
+        return merged
+
+
+def build_ns_parse_table(re_list, namespace_uris):
+    """
+    Return a dictionary that maps each of the given namespace uris to the result
+    of ``search_by_re_list`` with the given list of regular expressions.
+    """
+    table = {}
+    for namespace_uri in namespace_uris:
+        table[namespace_uri] = search_by_re_list(re_list, namespace_uri)
+    return table
+
+
+class ImportContext(object):
+    """
+    State of a single import (see ``STIX_Import.xml_import``): the namespace
+    mapping of the imported document, the default timestamp and default
+    identifier namespace, the caches that live for the import and the
+    transaction and profiler of the import, if any.
+
+    The importer keeps the context of the running import per thread
+    (see ``STIX_Import.context``), such that one importer can serve several
+    imports running concurrently in different threads: the hooks called
+    by DINGOS have fixed signatures, so they find the context there rather
+    than in an argument.
+    """
+
+    def __init__(self, default_timestamp, identifier_cache=None, default_identifier_ns_uri=None,
+                 cancel_event=None, deadline=None):
+
+        self.namespace_dict = {None: DINGOS_NAMESPACE_URI}
+
+        self.default_timestamp = default_timestamp
+
+        self.default_identifier_ns_uri = default_identifier_ns_uri
+
+        # Map from (namespace uri, uid) to identifiers of objects
+        # created or referenced during the import
+
+        if identifier_cache is None:
+            identifier_cache = IdentifierCache()
+        self.identifier_cache = identifier_cache
+
+        # Attributes of XML nodes as extracted by the embedding predicate;
+        # the cache is keyed by node and lives for the parsing of one document
+        # (or, in the streaming import, of one component).
+
+        self.attribute_cache = {}
+
+        # Map from timestamp strings to parsed timestamps
+
+        self.timestamp_cache = {}
+
+        # Transaction of the import in transactional mode
+
+        self.transaction_batcher = None
+
+        # Profiler of the import, if profiling has been requested
+
+        self.profiler = None
+
+        # Cancellation of the import: an event that is set when the import
+        # is to be cancelled and a deadline (in seconds since the epoch)
+
+        self.cancel_event = cancel_event
+        self.deadline = deadline
+
+        # Set if the import has been skipped (see the import ledger)
+
+        self.skipped = False
+
+        # Digest of the markings and the default identifier namespace of
+        # the import (see STIX_Import.import_options_digest)
+
+        self.options_digest = ''
+
+        # Progress of the import (see ImportCheckpointer), if the content
+        # can be identified by its hash
+
+        self.checkpointer = None
+
+        # In a dry run (dry_run is True), the objects are not imported but
+        # handed over to the function record_writer (see
+        # STIX_Import.emit_objects)
+
+        self.dry_run = False
+        self.record_writer = None
+
+        # SHA256 hash of the content (if known) and the cache of extraction
+        # results in which it is looked up (see STIX_Import.xml_dom_import)
+
+        self.content_hash = None
+        self.parse_cache = None
+
+        # Missing identifiers for which PLACEHOLDERs are to be created (map
+        # from (namespace uri, uid) to the timestamp of the reference) and the
+        # family, type and revisions of PLACEHOLDERs (see
+        # STIX_Import.preresolve_references)
+
+        self.pending_placeholders = {}
+        self.placeholder_types = None
+
+        # Objects (namespace uri, uid) defined in the document for which no
+        # identifier existed before the import, such that there is no earlier
+        # revision with the same content (see STIX_Import.preresolve_references)
+
+        self.new_identifiers = set()
+
+    def check_cancelled(self):
+        """
+        Raise ``ImportCancelled`` if the import has been cancelled or its
+        deadline has passed.
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ImportCancelled("Import has been cancelled")
+        if self.deadline is not None and time.time() > self.deadline:
+            raise ImportCancelled("Import has not been completed in time")
+
+
+class STIX_Import(object):
     """
     A class that implements a DINGOS importer for STIX and CybOX
 
@@ -116,266 +1047,1623 @@ class STIX_Import:
     ``mantis_core``. Again, hooking functions are used to configure the creation of InfoObjects
     from the generated dictionary representation.
 
-    """
+    """
+
+
+    def __init__(self, *args, **kwargs):
+
+        # The creation time stamp
+        self.create_timestamp = timezone.now()
+
+        # The state of the running import (see ImportContext) is kept
+        # per thread, as is the identifier cache, which may be kept for
+        # a batch of imports.
+
+        self.local = threading.local()
+
+        # Memo for results of derive_iobject_type
+
+        self.iobject_type_memo = LRUMemo(IOBJECT_TYPE_MEMO_SIZE)
+
+        # Dispatcher for the fact handlers (see fact_handler_list)
+
+        self.fact_handler_dispatcher = FactHandlerDispatcher(self.fact_handler_list(),
+                                                             value_predicates=[self.cybox_csv_predicate])
+
+        # Writer for large values (see cybox_RAW_ft_handler)
+
+        self.large_value_writer = LargeValueWriter()
+
+        # The time spent in (and number of) commits of all
+        # transactional imports so far
+
+        self.commit_seconds = 0.0
+        self.commit_count = 0
+        self.commit_lock = threading.Lock()
+
+        # Here, we list the processors for embedded non-STIX/CybOX content.
+        # Currently, only OpenIOC is treated.
+
+        self.processors = {'OpenIOC2010': OpenIOC_Import}
+
+        # Pool of threads that run these processors
+
+        self.deferred_processor_pool = DeferredProcessorPool(self.processors)
+
+    @property
+    def context(self):
+        """
+        The context of the import running in the current thread. Outside of
+        an import, this is the context of the last import of the thread or a
+        fresh one, e.g., for calling hooks directly.
+        """
+        context = getattr(self.local, 'context', None)
+        if context is None:
+            context = self.local.context = ImportContext(self.create_timestamp, self.thread_identifier_cache())
+        return context
+
+    def thread_identifier_cache(self):
+        identifier_cache = getattr(self.local, 'identifier_cache', None)
+        if identifier_cache is None:
+            identifier_cache = self.local.identifier_cache = IdentifierCache()
+        return identifier_cache
+
+    # Shortcuts to the state of the import running in the current thread
+
+    @property
+    def namespace_dict(self):
+        return self.context.namespace_dict
+
+    @namespace_dict.setter
+    def namespace_dict(self, namespace_dict):
+        self.context.namespace_dict = namespace_dict
+
+    @property
+    def default_timestamp(self):
+        return self.context.default_timestamp
+
+    @default_timestamp.setter
+    def default_timestamp(self, default_timestamp):
+        self.context.default_timestamp = default_timestamp
+
+    @property
+    def default_identifier_ns_uri(self):
+        return self.context.default_identifier_ns_uri
+
+    @default_identifier_ns_uri.setter
+    def default_identifier_ns_uri(self, default_identifier_ns_uri):
+        self.context.default_identifier_ns_uri = default_identifier_ns_uri
+
+    @property
+    def identifier_cache(self):
+        return self.context.identifier_cache
+
+    def xml_import(self,
+                   filepath="",
+                   xml_content=None,
+                   markings=None,
+                   identifier_ns_uri=None,
+                   source=None,
+                   **kwargs):
+        """
+         Import a STIX or CybOX xml  from file <filepath> or a string passed as ``xml_content``
+         or from an ``ImportSource`` passed as ``source`` (e.g., a member of a zip or
+         tar archive, see ``mantis_stix_importer.sources``). A file may be compressed
+         with gzip (``.gz``) or bzip2 (``.bz2``).
+
+         You can furhter provide:
+
+         - a list of InfoObjects as markings with which all generated Information Objects
+            will be associated (e.g., in order to provide provenance function)
+         - a default identifier namespace URI.
+
+         The following keyword arguments are read:
+
+         - default_timestamp: timestamp for objects for which the XML provides none
+         - streaming: if True, use the bounded-memory ``xml_stream_import``
+         - batch_identifier_cache: if True, keep the identifier cache of
+           the previous import (e.g., for a batch of files from the same feed)
+         - force: if True, import the content even if the import ledger
+           shows that it has been imported with the same default timestamp before
+           (and do not resume a failed import of the content, see ``ImportCheckpointer``)
+         - transactional: if True, import the content in a single transaction
+           (with a savepoint for each object: objects whose import fails are
+           skipped and logged)
+         - commit_every: in transactional mode, commit after each
+           <commit_every> objects rather than once at the end
+         - profile: if True, measure time, database queries and created objects
+           per phase of the import (see ``ImportProfiler``) and return the
+           measurements as dictionary (otherwise, None is returned)
+         - cancel_event, deadline: the import is cancelled (``ImportCancelled``
+           is raised) before the next object is imported once the event
+           (a ``threading.Event``) is set or the deadline (in seconds since
+           the epoch) has passed. Objects imported before remain unless the
+           import is transactional. See ``mantis_stix_importer.executor``.
+         - dry_run: if True, the objects extracted from the content are not
+           imported and the database is not accessed.
+         - record_writer: in a dry run, a function that is called with a
+           dictionary for each extracted object (see ``emit_objects``);
+           without it, the objects are discarded.
+         - parse_cache: directory of the cache of extraction results (default:
+           the setting ``MANTIS['PARSE_CACHE_DIR']``, if any); content that
+           is found there is not parsed again (see ``mantis_stix_importer.parse_cache``).
+
+         All other kwargs are not read -- they are present to allow the use of the
+         DingoImportCommand class for easy definition of commandline import commands
+         (the class passes all command line arguments to the xml_import function, so
+         without the **kwargs parameter, an error would occur.
+
+         The same importer may run imports in several threads at once: the state
+         of each import is kept in an ``ImportContext`` of its thread.
+         """
+
+        # Each import gets a fresh context, such that the same object can be
+        # reused for multiple imports (also concurrently, from several threads).
+        # Without a default timestamp, the creation time stamp of the importer
+        # is used (rather than the default timestamp of a previous import).
+
+        default_timestamp = self.create_timestamp
+
+        if 'default_timestamp' in kwargs and kwargs['default_timestamp']:
+
+            if isinstance(kwargs['default_timestamp'],basestring):
+                naive = parse_datetime(kwargs['default_timestamp'])
+            else:
+                naive = kwargs['default_timestamp']
+            if not timezone.is_aware(naive):
+                aware = timezone.make_aware(naive,timezone.utc)
+            else:
+                aware = naive
+            default_timestamp = aware
+
+        identifier_cache = self.thread_identifier_cache()
+
+        if not kwargs.get('batch_identifier_cache'):
+            identifier_cache.clear()
+
+        context = self.local.context = ImportContext(default_timestamp,
+                                                     identifier_cache=identifier_cache,
+                                                     default_identifier_ns_uri=identifier_ns_uri,
+                                                     cancel_event=kwargs.get('cancel_event'),
+                                                     deadline=kwargs.get('deadline'))
+
+        context.dry_run = bool(kwargs.get('dry_run'))
+        context.record_writer = kwargs.get('record_writer') or (lambda description: None)
+
+        context.parse_cache = get_parse_cache(kwargs.get('parse_cache'))
+
+        context.check_cancelled()
+
+        if not markings:
+            markings = []
+
+        context.options_digest = self.import_options_digest(markings, identifier_ns_uri)
+
+        if source is None and xml_content is None:
+            source = open_import_source(filepath)
+
+        profiler = None
+
+        if kwargs.get('profile'):
+            profiler = context.profiler = ImportProfiler()
+            profiler.begin()
+
+        try:
+            imported = self.import_content(filepath, xml_content, markings, source, **kwargs)
+            context.skipped = not imported
+        finally:
+            if profiler:
+                profiler.end()
+                context.profiler = None
+
+        if profiler:
+            stats = profiler.stats()
+            stats['source'] = source.name if source else filepath or 'XML content'
+            stats['skipped'] = not imported
+            return stats
+
+    def import_content(self, filepath, xml_content, markings, source, **kwargs):
+        """
+        Import the content passed to ``xml_import`` unless the import ledger
+        shows that it has already been imported. Returns False if the import
+        has been skipped.
+        """
+
+        context = self.context
+
+        # A compressed document is parsed right away, such that it is decompressed
+        # only once: the hashes of its content are computed while it is parsed.
+
+        document = None
+
+        if source is not None and not source.path and not kwargs.get('streaming'):
+            with self.profile_phase('parse'):
+                document = self.parse_source(source)
+
+        # A dry run only parses the content and extracts the objects (see
+        # emit_objects): import ledger, transactions and checkpoints are
+        # not needed.
+
+        if context.dry_run:
+            if kwargs.get('streaming'):
+                self.xml_stream_import(filepath=filepath,
+                                       xml_content=xml_content,
+                                       markings=markings,
+                                       source=source)
+            else:
+                self.xml_dom_import(filepath=filepath,
+                                    xml_content=xml_content,
+                                    markings=markings,
+                                    source=source,
+                                    document=document)
+            return True
+
+        # Importing the same content with the same default timestamp
+        # a second time does not change anything; we keep a ledger of
+        # imported content and skip such imports.
+
+        with self.profile_phase('ledger'):
+            content_hash = context.content_hash = self.content_hash(filepath, xml_content, source)
+
+            imported_before = (content_hash and not kwargs.get('force')
+                               and ImportLedgerEntry.objects.filter(content_hash=content_hash,
+                                                                    default_timestamp=context.default_timestamp,
+                                                                    options_digest=context.options_digest).exists())
+
+        if imported_before:
+            logger.info("Content of %s (sha256 %s) has already been imported with default timestamp %s: skipping" % (
+                source.name if source else 'XML content', content_hash, context.default_timestamp))
+            if document:
+                document.freeDoc()
+            return False
+
+        # The progress of the import is recorded such that the import can be
+        # resumed if it fails; a forced import starts from the beginning.
+
+        if content_hash:
+            context.checkpointer = ImportCheckpointer(content_hash, context.default_timestamp,
+                                                      options_digest=context.options_digest,
+                                                      filename=source.name if source else filepath,
+                                                      resume=not kwargs.get('force'))
+
+        # If the transaction is rolled back, the identifiers created in it no
+        # longer exist: the identifier cache, which may be kept for the next
+        # import (see ``batch_identifier_cache``), must forget them.
+
+        if kwargs.get('transactional'):
+            context.transaction_batcher = TransactionBatcher(kwargs.get('commit_every') or 0,
+                                                             before_commit=(context.checkpointer.record
+                                                                            if context.checkpointer else None),
+                                                             after_rollback=context.identifier_cache.clear)
+
+        # Deferred content is processed in the importing thread if it must be
+        # part of the transaction of the import or if it is to be profiled.
+
+        self.deferred_processor_pool.begin(context.namespace_dict,
+                                           concurrent=not (context.transaction_batcher or context.profiler))
+
+        try:
+            if kwargs.get('streaming'):
+                # Bounded-memory import: top-level components are imported
+                # as soon as they have been read.
+                self.xml_stream_import(filepath=filepath,
+                                       xml_content=xml_content,
+                                       markings=markings,
+                                       source=source)
+            else:
+                self.xml_dom_import(filepath=filepath,
+                                    xml_content=xml_content,
+                                    markings=markings,
+                                    source=source,
+                                    document=document)
+
+            # Deferred content and large values are processed in the background;
+            # the import is complete once they have been written.
+
+            with self.profile_phase('openioc'):
+                self.deferred_processor_pool.flush()
+
+            with self.profile_phase('large_values'):
+                self.large_value_writer.flush()
+
+            # The import is complete: the checkpoint is removed (in transactional
+            # mode, within the transaction).
+
+            if context.checkpointer:
+                context.checkpointer.clear()
+
+            if context.transaction_batcher:
+                with self.profile_phase('commit'):
+                    context.transaction_batcher.commit()
+        except:
+            self.deferred_processor_pool.flush(raise_errors=False)
+            self.large_value_writer.flush(raise_errors=False)
+            if context.transaction_batcher:
+                context.transaction_batcher.rollback(*sys.exc_info())
+            raise
+        finally:
+            if context.transaction_batcher:
+                with self.commit_lock:
+                    self.commit_seconds += context.transaction_batcher.commit_seconds
+                    self.commit_count += context.transaction_batcher.commit_count
+                context.transaction_batcher = None
+
+        # Content that could not be read a second time for checking the ledger
+        # has been hashed while it was imported.
+
+        self.record_import(content_hash or (source and source.sha256),
+                           source.name if source else filepath)
+
+        return True
+
+    def xml_dom_import(self,
+                       filepath=None,
+                       xml_content=None,
+                       markings=None,
+                       source=None,
+                       document=None):
+        """
+        Import a STIX or CybOX xml from file <filepath> or a string passed as ``xml_content``
+        (or from an ``ImportSource`` or an already parsed libxml2 ``document`` thereof)
+        by building the DOM of the whole document and extracting the embedded
+        objects from it.
+        """
+
+        if not markings:
+            markings = []
+
+        if source is None and xml_content is None:
+            source = open_import_source(filepath)
+
+        # Content whose extraction result is in the parse cache is not
+        # parsed again.
+
+        import_result = self.load_parse_result()
+
+        if import_result is not None:
+            if document is not None:
+                document.freeDoc()
+            # As returned by the DINGOS XML importer for content passed as string
+            import_result['file_content'] = xml_content
+            self.xml_dom_import_result(import_result, markings, source)
+            return
+
+        if document is None and source is not None:
+            with self.profile_phase('parse'):
+                document = self.parse_source(source)
+
+        try:
+            self.xml_dom_import_document(xml_content if document is None else document.getRootElement(),
+                                         markings,
+                                         source)
+        finally:
+            # The DINGOS XML importer does not free the documents it parses;
+            # we free those we have parsed ourselves once the unprocessed nodes
+            # (e.g., OpenIOC content) have been handed over to their importers.
+            if document is not None:
+                document.freeDoc()
+
+    def xml_dom_import_document(self, xml_content, markings, source=None):
+        """
+        Import the DOM of a STIX or CybOX document, passed as string or libxml2 node
+        ``xml_content``.
+        """
+
+        context = self.context
+
+        # Use the generic XML import customized for STIX/CybOX import
+        # to turn XML into DingoObjDicts
+
+        context.attribute_cache = {}
+
+        with self.profile_phase('extract'):
+            import_result = MantisImporter.xml_import(xml_content=xml_content,
+                                                      ns_mapping=context.namespace_dict,
+                                                      embedded_predicate=self.stix_embedding_pred,
+                                                      id_and_revision_extractor=self.id_and_revision_extractor)
+
+        # The document has been freed, so the cached nodes are stale.
+
+        context.attribute_cache = {}
+
+        if context.parse_cache is not None and context.content_hash:
+            with self.profile_phase('extract'):
+                self.save_parse_result(import_result)
+
+        self.xml_dom_import_result(import_result, markings, source)
+
+    def xml_dom_import_result(self, import_result, markings, source=None):
+        """
+        Import the objects that the DINGOS XML importer has extracted from
+        the DOM of a document (or that have been loaded from the parse cache).
+        """
+
+        context = self.context
+
+        # The MANTIS/DINGOS xml importer returns then the following structure::
+        #
+        #
+        #    {'id_and_rev_info': Id and revision info of top-level element of the form
+        #        {'id': ... , 'timestamp': ...}
+        #    'elt_name': Element name of top-level element
+        #    'dict_repr': Dictionary representation of XML, minus the embedded objects -- for
+        #                 those, an 'idref' reference has been generated
+        #    'embedded_objects': List of embedded objects, as dictionary
+        #                       {"id_and_revision_info": id and revision info of extracted object,
+        #                        "elt_name": Element name,
+        #                        "dict_repr" :  dictionary representation of XML of embedded object
+        #                       }
+        #    'unprocessed' : List of unprocessed embedded objects (as libxml2 Node object)
+        #                    (e.g. for handover to other importer; serialized if the
+        #                    result is cached, see save_parse_result)
+        #    'file_content': Content of imported file (or, if content was passed instead of a file name,
+        #                                                                                         the original content)}
+
+
+        # Extract information from import result
+
+        top_level_id_and_rev_info = import_result['id_and_rev_info']
+        top_level_elt_name = import_result['elt_name']
+        top_level_elt_dict = import_result['dict_repr']
+        file_content = import_result['file_content']
+        embedded_objects = import_result['embedded_objects']
+        unprocessed_list = import_result['unprocessed']
+
+
+        if not 'id' in top_level_id_and_rev_info or not top_level_id_and_rev_info['id']:
+            if context.default_identifier_ns_uri:
+                # Top-level element had no identifier. If a default namespace has been provided,
+                # then an identifier is generated
+                top_level_id_and_rev_info['id_ns'] = context.default_identifier_ns_uri
+                if isinstance(file_content, basestring):
+                    top_level_id_and_rev_info['id_uid'] = hashlib.md5(file_content).hexdigest()
+                else:
+                    if not source.md5:
+                        source.read_through()
+                    top_level_id_and_rev_info['id_uid'] = source.md5
+                logger.info("Top level element had no identifier: "
+                            "identifier %s has been generated " % top_level_id_and_rev_info['id_uid'])
+
+            else:
+                logger.warning("Top level element had no identifier. "
+                    "No identifier was generated, because no default namespace had been provided "
+                    "(you can provide a namespace with the '-n' commandline parameter")
+
+        # We now have the top-level object, the list of embedded objects,
+        # and possibly a list of hitherto unprocessed XML nodes.
+        # As we shall see below, we have configured the DINGOS
+        # XML  importer such that it extracts marking structures
+        # as separate objects and tags them with a label
+        # 'import_first'. So, what we need to do is to go through
+        # the embedded objects and collect all markings (along with
+        # information, in which STIX_Package each marking was defined).
+        # This allows us to first create all marking objects and
+        # then mark the subsequently created objects with the
+        # appropriate markings.
+        # Note, that currently,
+        # - we only extract and treat markings defined in the header of STIX_Package
+        # - we do not care about the XPATH-expression and treat every marking as if
+        #   it was defined for the whole STIX-Package
+
+        self.import_objects(embedded_objects,
+                            unprocessed_list,
+                            markings,
+                            {},
+                            top_level_object=(top_level_id_and_rev_info,
+                                              top_level_elt_name,
+                                              top_level_elt_dict))
+
+    def load_parse_result(self):
+        """
+        Return the extraction result for the content of the current import
+        from the parse cache (adding the namespaces of the content to the
+        namespace dictionary), or None if it is not cached.
+        """
+
+        context = self.context
+
+        if context.parse_cache is None or not context.content_hash:
+            return None
+
+        with self.profile_phase('parse'):
+            entry = context.parse_cache.load(context.content_hash)
+
+        if entry is None:
+            return None
+
+        logger.debug("Extraction result for content with sha256 %s found in parse cache" % context.content_hash)
+
+        context.namespace_dict.update(entry['namespace_dict'])
+
+        return entry['import_result']
+
+    def save_parse_result(self, import_result):
+        """
+        Store the extraction result for the content of the current import
+        in the parse cache, before anything in it is changed by the import.
+        """
+
+        context = self.context
+
+        # The unprocessed nodes belong to the document, which is freed after
+        # the import; they are cached -- and handed over to their processors
+        # (see DeferredProcessorPool.submit) -- as standalone documents.
+
+        import_result['unprocessed'] = [(id_and_rev_info, typeinfo, standalone_xml(xml_node))
+                                        for (id_and_rev_info, typeinfo, xml_node) in import_result['unprocessed']]
+
+        entry = {'import_result': dict(import_result, file_content=None),
+                 'namespace_dict': dict(context.namespace_dict)}
+
+        context.parse_cache.save(context.content_hash, entry)
+
+    def content_hash(self, filepath, xml_content, source=None):
+        """
+        Return the SHA256 hash of the content to be imported (or None
+        if the content is given as parsed XML or if it has not been read yet
+        and cannot be read twice, as is the case for members of compressed
+        tar archives).
+        """
+        if xml_content is not None:
+            if isinstance(xml_content, basestring):
+                if isinstance(xml_content, unicode):
+                    xml_content = xml_content.encode('utf-8')
+                return hashlib.sha256(xml_content).hexdigest()
+            return None
+
+        if source is None:
+            source = open_import_source(filepath)
+
+        if not source.sha256 and source.rewindable:
+            source.read_through()
+
+        return source.sha256
+
+    def profile_phase(self, name):
+        """
+        Return a context manager that charges the enclosed part of the import
+        to the given phase of the profiler (if profiling is on).
+        """
+        context = self.context
+
+        if context.profiler is None:
+            return NULL_PHASE
+        return context.profiler.phase(name)
+
+    def parse_source(self, source):
+        """
+        Parse the document of an ``ImportSource`` into a libxml2 document
+        (in recovery mode, just as the DINGOS XML importer parses files).
+
+        A plain file is memory-mapped and parsed in place rather than read
+        into a string; a compressed document is fed to a push parser block by block
+        while it is decompressed.
+        """
+
+        options = libxml2.XML_PARSE_RECOVER | libxml2.XML_PARSE_HUGE
+
+        if source.path:
+            if not source.size:
+                raise StandardError("%s is empty" % source.name)
+            with open(source.path, 'rb') as content_file:
+                content_map = mmap.mmap(content_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                document = libxml2.readMemory(content_map, len(content_map), source.name, None, options)
+            finally:
+                content_map.close()
+        else:
+            stream = source.open()
+            try:
+                parser = libxml2.createPushParser(None, '', 0, source.name)
+                parser.ctxtUseOptions(options)
+                for block in iter(lambda: stream.read(STREAMING_READ_BLOCK_SIZE), b''):
+                    parser.parseChunk(block, len(block), 0)
+                parser.parseChunk('', 0, 1)
+                document = parser.doc()
+            finally:
+                stream.close()
+
+        if document is None or document.getRootElement() is None:
+            if document is not None:
+                document.freeDoc()
+            raise StandardError("Could not parse %s" % source.name)
+
+        return document
+
+    def record_import(self, content_hash, filepath):
+        """
+        Record the successful import of content in the import ledger.
+        """
+        if content_hash:
+            ImportLedgerEntry.objects.get_or_create(content_hash=content_hash,
+                                                    default_timestamp=self.context.default_timestamp,
+                                                    options_digest=self.context.options_digest,
+                                                    defaults={'filename': (filepath or '')[:255]})
+
+    def import_options_digest(self, markings, identifier_ns_uri):
+        """
+        Return a digest of the arguments of an import other than the content and
+        the default timestamp that change its result: the markings and the default
+        identifier namespace. Content imported with other markings or another
+        namespace before is imported again (and a failed import of it is not
+        resumed). The digest is empty if there are neither.
+
+        Markings are represented by their content (type and facts) rather
+        than by their identity: the command ``mantis_stix_import`` creates a new
+        marking object with a generated identifier from ``--marking_json``
+        for each run, but for the same command line, its content is the same.
+        """
+        if not markings and not identifier_ns_uri:
+            return ''
+
+        InfoObject2Fact = dingos_class_map['InfoObject2Fact']
+
+        marking_contents = dict((marking.pk, [marking.iobject_type.name]) for marking in markings)
+
+        for marking_fact in InfoObject2Fact.objects.filter(iobject__in=marking_contents.keys()).values_list(
+                'iobject_id', 'node_id__name', 'fact__fact_term__term', 'fact__fact_term__attribute',
+                'fact__fact_values__value'):
+            marking_contents[marking_fact[0]].append(marking_fact[1:])
+
+        options = {'markings': sorted([content[0]] + sorted(content[1:]) for content in marking_contents.values()),
+                   'identifier_ns_uri': identifier_ns_uri or ''}
+        return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def import_objects(self,
+                       embedded_objects,
+                       unprocessed_list,
+                       markings,
+                       marking_dict,
+                       top_level_object=None):
+        """
+        Create InfoObjects for the embedded objects (and, if given, the top-level
+        object) extracted by the DINGOS XML importer and hand over the unprocessed
+        nodes to the responsible importers.
+
+        - markings is the list of markings passed to ``xml_import``
+        - marking_dict maps identifiers of STIX Packages to the marking objects
+          defined in their header; it is filled with the markings found among the
+          embedded objects and may be passed to several calls (the streaming
+          import calls this function for each top-level component of a package).
+        - top_level_object is a triple (id_and_rev_info, elt_name, elt_dict)
+        """
+
+        context = self.context
+
+        if context.dry_run:
+            self.emit_objects(embedded_objects, unprocessed_list, top_level_object)
+            return
+
+        checkpointer = context.checkpointer
+
+        if checkpointer:
+            checkpointer.next_component()
+
+        # We use queues rather than lists, since we have no need
+        # to access elements somewhere in the list, but rather
+        # always pop from the end
+
+        import_first_queue = deque()
+
+        pending_queue = deque()
+
+        # Before creating any facts, we resolve all references contained
+        # in the objects in one go.
+
+        objects = [(embedded_object['id_and_rev_info'],
+                    embedded_object['elt_name'],
+                    embedded_object['dict_repr']) for embedded_object in embedded_objects]
+        if top_level_object:
+            objects.append(top_level_object)
+
+        if context.transaction_batcher:
+            context.transaction_batcher.begin()
+
+        with self.profile_phase('preresolve'):
+            self.preresolve_references(objects)
+
+        if top_level_object:
+            # The top-level object is certainly no marking, so we
+            # put it on the pending queue
+
+            pending_queue.append(top_level_object)
+
+        while embedded_objects:
+            # We go through the embedded objects and look for the 'import_first' label
+            embedded_object = embedded_objects.pop()
+            id_and_rev_info = embedded_object['id_and_rev_info']
+            elt_name = embedded_object['elt_name']
+            elt_dict = embedded_object['dict_repr']
+            if 'import_first' in id_and_rev_info:
+                import_first_queue.append((id_and_rev_info, elt_name, elt_dict))
+            else:
+                pending_queue.append((id_and_rev_info, elt_name, elt_dict))
+
+
+        with self.profile_phase('markings'):
+            while import_first_queue:
+                # We go through the import_first queue, import all markings,
+                # and collect information about the STIX_Package in which the marking
+                # was defined in the marking_dict (some organizations use a format
+                # in which several STIX Packages are bundled into a single XML file).
+
+                (id_and_rev_info, elt_name, elt_dict) = import_first_queue.pop()
+
+                result = None
+
+                if checkpointer and checkpointer.next_object('import_first'):
+                    # The marking has been imported by an earlier import of the
+                    # content that failed later on: we only need the InfoObject.
+                    result = self.reload_iobject(id_and_rev_info)
+
+                if not result:
+                    result = self.import_in_savepoint(id_and_rev_info['id'],
+                                                      self.iobject_import,
+                                                      id_and_rev_info,
+                                                      elt_name,
+                                                      elt_dict)
+                    if checkpointer:
+                        checkpointer.object_done(transactional=bool(context.transaction_batcher))
+
+                if not result:
+                    continue
+
+                (info_obj, existed) = result
+
+                # id_and_rev_info can carries additional information other than the identifier
+                # and timestamp that has been extracted: the MANTIS XML importer carries
+                # along information inherited from ancestor objects: this allows us
+                # to propagate information down to children, grandchildren etc. As we
+                # see below, we use this mechanism to propagate information about
+                # the STIX_Package in which an object was defined.
+
+                if id_and_rev_info['inherited']['embedding_STIX_Package'] in marking_dict:
+                    marking_dict[id_and_rev_info['inherited']['embedding_STIX_Package']].append(info_obj)
+                else:
+                    marking_dict[id_and_rev_info['inherited']['embedding_STIX_Package']] = [info_obj]
+
+
+        with self.profile_phase('objects'):
+            while pending_queue:
+                # Now we start the import of the remaining embedded objects (plus the top-level object)
+
+                (id_and_rev_info, elt_name, elt_dict) = pending_queue.pop()
+
+                if checkpointer and checkpointer.next_object('pending'):
+                    # Imported by an earlier import of the content that failed later on
+                    continue
+
+                if 'embedding_STIX_Package' in id_and_rev_info:
+                    embedding_STIX_Package = id_and_rev_info['embedding_STIX_Package']
+                else:
+                    embedding_STIX_Package = id_and_rev_info.get('inherited',{}).get('embedding_STIX_Package')
+
+                logger.debug("%s embedded in %s" % (id_and_rev_info['id'], embedding_STIX_Package))
+
+
+                if elt_name in ['Kill_Chain','Kill_Chain_Phase']:
+                    # We chose not to attach markings to Kill_Chain information
+                    object_markings = []
+                else:
+                    # We mark the object with markings passed to the xml_import command
+                    # and markings defined in the STIX_Package in which the object was defined.
+
+                    object_markings = markings + marking_dict.get(embedding_STIX_Package,[])
+
+                self.import_in_savepoint(id_and_rev_info['id'],
+                                         self.iobject_import,
+                                         id_and_rev_info,
+                                         elt_name,
+                                         elt_dict,
+                                         markings=object_markings)
+
+                if checkpointer:
+                    checkpointer.object_done(transactional=bool(context.transaction_batcher))
+
+        # As we shall see below, we have configured the xml_importer such that
+        # it recognizes OpenIOC structures embedded as test mechanism and
+        # leaves them unprocessed. These unprocessed elements we now hand
+        # over to the MANTIS OpenIOC importer -- via the pool of deferred
+        # processors, which processes them concurrently if possible
+        # (see DeferredProcessorPool); ``import_content`` waits for them.
+
+        with self.profile_phase('openioc'):
+            for unprocessed_elt in unprocessed_list:
+                (id_and_rev_info,typeinfo,xml_node) = unprocessed_elt
+                processor_name = id_and_rev_info['defer_processing']['processor']
+
+
+                if 'embedding_STIX_Package' in id_and_rev_info:
+                    embedding_STIX_Package = id_and_rev_info['embedding_STIX_Package']
+                else:
+                    embedding_STIX_Package = id_and_rev_info.get('inherited',{}).get('embedding_STIX_Package')
+
+                logger.debug("%s embedded in %s" % (id_and_rev_info['id'], embedding_STIX_Package))
+
+                object_markings = markings + marking_dict.get(embedding_STIX_Package,[])
+
+                if processor_name in self.processors:
+
+                    self.deferred_processor_pool.submit(
+                        processor_name,
+                        xml_node,
+                        run=(lambda description: lambda function, *args, **kwargs:
+                             self.import_in_savepoint(description, function, *args, **kwargs))(id_and_rev_info['id']),
+                        markings=object_markings,
+                        identifier_ns_uri=context.namespace_dict[id_and_rev_info['id'].split(':')[0]])
+                else:
+                    logger.error("Did not find a processor for %s" % processor_name)
+
+    def emit_objects(self, embedded_objects, unprocessed_list, top_level_object=None):
+        """
+        In a dry run, hand the objects extracted by the DINGOS XML importer
+        over to the ``record_writer`` function of the import rather than importing
+        them. For each object, the function receives a dictionary with
+
+        - 'id': identifier (qualified name), 'id_ns' and 'id_uid' for a generated
+          identifier, 'timestamp' (ISO 8601) and 'package' (identifier of the
+          embedding STIX_Package), as far as known
+        - 'elt_name': element name
+        - 'import_first': True for markings
+        - 'type_info': type information as derived by ``derive_iobject_type``
+        - 'dict_repr': dictionary representation of the object
+
+        Content left for other importers is reported with the name of the
+        'processor' instead of type information and dictionary representation.
+        """
+
+        context = self.context
+
+        objects = [(embedded_object['id_and_rev_info'],
+                    embedded_object['elt_name'],
+                    embedded_object['dict_repr']) for embedded_object in embedded_objects]
+        if top_level_object:
+            objects.append(top_level_object)
+
+        def describe(id_and_rev_info, elt_name):
+            description = {'id': id_and_rev_info.get('id'),
+                           'elt_name': elt_name,
+                           'import_first': 'import_first' in id_and_rev_info}
+            for key in ['id_ns', 'id_uid']:
+                if key in id_and_rev_info:
+                    description[key] = id_and_rev_info[key]
+            if id_and_rev_info.get('timestamp'):
+                description['timestamp'] = id_and_rev_info['timestamp'].isoformat()
+            package = id_and_rev_info.get('embedding_STIX_Package',
+                                          id_and_rev_info.get('inherited', {}).get('embedding_STIX_Package'))
+            if package:
+                description['package'] = package
+            return description
+
+        for (id_and_rev_info, elt_name, elt_dict) in objects:
+            description = describe(id_and_rev_info, elt_name)
+            description['type_info'] = self.iobject_type_info(elt_name, elt_dict)
+            description['dict_repr'] = elt_dict
+            context.record_writer(description)
+
+        for (id_and_rev_info, typeinfo, xml_node) in unprocessed_list:
+            description = describe(id_and_rev_info, xml_node.name)
+            description['processor'] = id_and_rev_info['defer_processing']['processor']
+            context.record_writer(description)
+
+    def reload_iobject(self, id_and_rev_info):
+        """
+        Return the pair (InfoObject, existed) for an object that has been
+        imported before (with the timestamp given in ``id_and_rev_info``
+        or the default timestamp), or None if there is no such object.
+        """
+
+        if 'id_ns' in id_and_rev_info:
+            namespace_uri = id_and_rev_info['id_ns']
+            uid = id_and_rev_info['id_uid']
+        elif id_and_rev_info.get('id'):
+            (namespace, namespace_uri, uid) = self.split_qname(id_and_rev_info['id'])
+        else:
+            return None
+
+        timestamp = id_and_rev_info.get('timestamp', None) or self.context.default_timestamp
+
+        info_obj = InfoObject.objects.filter(identifier__namespace__uri=namespace_uri,
+                                             identifier__uid=uid,
+                                             timestamp=timestamp).first()
+        if info_obj is None:
+            return None
+
+        return (info_obj, EXIST_ID_AND_EXACT_TIMESTAMP)
+
+    def import_in_savepoint(self, description, function, *args, **kwargs):
+        """
+        Call the given function that imports an object. In transactional mode,
+        the function is called within a savepoint: if the import fails,
+        the error is logged and the changes made by the function are rolled back,
+        but the import of the other objects continues (an import that fails
+        with an IntegrityError is tried again, see ``SAVEPOINT_IMPORT_ATTEMPTS``).
+        Returns the result of the function (or None, if the import failed).
+        """
+
+        context = self.context
+
+        # A cancelled import stops here (also in transactional mode, where
+        # the error must not be taken for a failure of the object)
+
+        context.check_cancelled()
+
+        if not context.transaction_batcher:
+            return function(*args, **kwargs)
+
+        context.transaction_batcher.begin()
+
+        attempt = 1
+        while True:
+            try:
+                with transaction.atomic():
+                    result = function(*args, **kwargs)
+                break
+            except Exception as e:
+                # Identifiers created within the savepoint no longer exist
+                context.identifier_cache.clear()
+                # DINGOS creates fact terms, data types etc. on first use; if
+                # another process has created the same row in the meantime,
+                # the row is found in a new savepoint.
+                if isinstance(e, IntegrityError) and attempt < SAVEPOINT_IMPORT_ATTEMPTS:
+                    logger.debug("Concurrent creation of DINGOS objects; importing %s again" % description)
+                    attempt += 1
+                    continue
+                logger.error("Import of %s failed and has been rolled back. Traceback: %s" % (
+                    description, traceback.format_exc()))
+                return None
+
+        context.transaction_batcher.object_done()
+
+        return result
+
+
+    def collect_references(self, elt_dict, references, path=(), top_level=True):
+        """
+        Collect the references to other objects contained in the dictionary
+        representation of an object: for each reference, a pair of
+        qualified name and timestamp (or None) is added to the set ``references``.
+
+        We only collect references for which the reference handler will
+        be called during fact creation (see ``fact_handler_list``), i.e.,
+        idrefs on leaf nodes and Related_Object nodes (see
+        ``force_nonleaf_fact_predicate``) as well as phase_id and
+        kill_chain_id attributes below the top level.
+        """
+
+        child_keys = [key for key in elt_dict.keys() if not key.startswith('@') and key != '_value']
+
+        if '@idref' in elt_dict:
+            if elt_dict['@idref'] and (not child_keys or 'Related_Object' in '/'.join(path)):
+                references.add((elt_dict['@idref'], elt_dict.get('@@timestamp', None)))
+        elif not top_level:
+            for key in ['@phase_id', '@kill_chain_id']:
+                if elt_dict.get(key, None):
+                    references.add((elt_dict[key], elt_dict.get('@@timestamp', None)))
+
+        for key in child_keys:
+            value = elt_dict[key]
+            if not isinstance(value, list):
+                value = [value]
+            for child in value:
+                if isinstance(child, dict):
+                    self.collect_references(child, references, path=path + (key,), top_level=False)
+
+    def preresolve_references(self, objects):
+        """
+        Resolve the references contained in the given objects (a list of
+        triples (id_and_rev_info, elt_name, elt_dict)) in bulk and record
+        the result in the identifier cache, such that the reference handler
+        does not need to touch the database for them.
+
+        Without this pre-pass, the reference handler calls ``create_iobject``
+        for each referenced object, which takes about a dozen queries if
+        a PLACEHOLDER has to be created. Here, we fetch the existing
+        identifiers with one query; the missing identifiers and PLACEHOLDER
+        objects are created with one statement each (per chunk of
+        BULK_QUERY_CHUNK_SIZE), once the first object that references one
+        of them is imported (see ``create_pending_placeholders``).
+
+        A PLACEHOLDER created for an object that is defined among the given
+        objects is overwritten when the object is imported. If the reference
+        carries a timestamp other than the object's, however, the PLACEHOLDER
+        would remain as additional revision; we leave such references to
+        the reference handler, just as the cases that are not straightforward
+        (a revision of an existing object is referenced, or references to the
+        same object carry different timestamps).
+
+        The defined objects without identifier are recorded in the import
+        context as well (``new_identifiers``).
+        """
+
+        context = self.context
+
+        references = set()
+
+        for (id_and_rev_info, elt_name, elt_dict) in objects:
+            self.collect_references(elt_dict, references)
+
+        # Map from (namespace uri, uid) to the timestamp of objects
+        # defined among the given objects
+
+        defined = {}
+
+        for (id_and_rev_info, elt_name, elt_dict) in objects:
+            if 'id_ns' in id_and_rev_info:
+                key = (id_and_rev_info['id_ns'], id_and_rev_info['id_uid'])
+            elif id_and_rev_info.get('id', None):
+                (namespace, namespace_uri, uid) = self.split_qname(id_and_rev_info['id'])
+                key = (namespace_uri, uid)
+            else:
+                continue
+            defined[key] = id_and_rev_info.get('timestamp', None) or context.default_timestamp
+
+        # Map from (namespace uri, uid) to the set of timestamps with which the
+        # object is referenced
+
+        referenced = {}
+
+        for (qname, timestamp) in references:
+            (namespace, namespace_uri, uid) = self.split_qname(qname)
+            referenced.setdefault((namespace_uri, uid), set()).add(timestamp)
+
+        for (key, timestamp) in defined.items():
+            if key in referenced and set([ts or context.default_timestamp for ts in referenced[key]]) != set([timestamp]):
+                del referenced[key]
+
+        referenced_keys = [key for key in referenced.keys()
+                           if not key in context.identifier_cache.identifiers]
+
+        # The identifiers of the defined objects are fetched with the same
+        # query: for objects without identifier, ``iobject_import`` need not
+        # look for an earlier revision with unchanged content.
+
+        defined_keys = [key for key in defined.keys()
+                        if not key in context.identifier_cache.identifiers]
+
+        if not referenced_keys and not defined_keys:
+            context.new_identifiers = set()
+            return
+
+        existing = self.fetch_identifiers(list(set(referenced_keys) | set(defined_keys)))
+
+        context.new_identifiers = set(key for key in defined_keys if not key in existing)
+
+        if not referenced_keys:
+            return
+
+        # Existing objects referenced without timestamp or with the timestamp
+        # of an existing revision can go directly into the cache.
+
+        timestamped_pks = [existing[key].pk for key in referenced_keys
+                           if key in existing and [ts for ts in referenced[key] if ts]]
+
+        revisions = set()
+
+        for pk_chunk in chunks(timestamped_pks, BULK_QUERY_CHUNK_SIZE):
+            revisions.update(InfoObject.objects.filter(identifier__in=pk_chunk).values_list('identifier_id',
+                                                                                           'timestamp'))
+
+        missing_keys = []
+
+        for key in referenced_keys:
+            (namespace_uri, uid) = key
+            if key in existing:
+                identifier = existing[key]
+                if not identifier.latest_id:
+                    continue
+                for timestamp in referenced[key]:
+                    if not timestamp or (identifier.pk, timestamp) in revisions:
+                        context.identifier_cache.add(namespace_uri, uid, identifier, timestamp)
+            elif len(referenced[key]) == 1:
+                missing_keys.append(key)
+
+        # The PLACEHOLDERs are created along with the first object that
+        # references one of them, so that they are part of the same savepoint
+        # (or batch) as that object: if its import fails, they are rolled back
+        # with it; an import that fails before (or without) that object
+        # leaves none behind.
+
+        for key in missing_keys:
+            context.pending_placeholders[key] = list(referenced[key])[0]
+
+        if missing_keys and context.placeholder_types is None:
+            context.placeholder_types = self.placeholder_types()
+
+    def create_pending_placeholders(self, elt_dict):
+        """
+        Create the PLACEHOLDERs determined by ``preresolve_references`` once
+        the given object references one of them: all PLACEHOLDERs of the
+        document are created in one go, so that their number does not
+        determine the number of statements. Before the first object that
+        references a missing identifier is imported, no PLACEHOLDER is created.
+        """
+
+        context = self.context
 
+        references = set()
 
-    def __init__(self, *args, **kwargs):
+        self.collect_references(elt_dict, references)
 
-        # The creation time stamp
-        self.create_timestamp = timezone.now()
+        for (qname, timestamp) in references:
+            (namespace, namespace_uri, uid) = self.split_qname(qname)
+            if (namespace_uri, uid) in context.pending_placeholders:
+                break
+        else:
+            return
 
-        self.default_timestamp = self.create_timestamp
+        keys = sorted(context.pending_placeholders.keys())
 
-        # The creation time stamp
+        try:
+            with transaction.atomic():
+                self.create_placeholders(keys, context.pending_placeholders)
+        except IntegrityError:
+            # Another process has created one of the identifiers in the meantime
+            logger.debug("Identifiers for PLACEHOLDERs have been created concurrently")
 
+        # If the import of the object fails after all (or the PLACEHOLDERs could
+        # not be created), the reference handler takes care of the references
+        # to these identifiers in the objects imported later on.
 
-        self.namespace_dict = {None: DINGOS_NAMESPACE_URI}
+        for key in keys:
+            del context.pending_placeholders[key]
 
-        self.default_identifier_ns_uri = None
+    def placeholder_types(self):
+        """
+        Return the family, type and revisions of PLACEHOLDER objects (as
+        determined by ``create_iobject`` with the default arguments from the
+        reference handler).
+        """
 
+        iobject_type_namespace, created = DataTypeNameSpace.objects.get_or_create(uri=DINGOS_NAMESPACE_URI)
+        iobject_family, created = InfoObjectFamily.objects.get_or_create(name=DINGOS_IOBJECT_FAMILY_NAME)
+        iobject_family_revision, created = Revision.objects.get_or_create(name=DINGOS_REVISION_NAME)
+        iobject_type, created = InfoObjectType.objects.get_or_create(name=DINGOS_PLACEHOLDER_TYPE_NAME,
+                                                                     iobject_family=iobject_family,
+                                                                     namespace=iobject_type_namespace)
+        iobject_type_revision, created = Revision.objects.get_or_create(name="")
 
+        return {'iobject_family': iobject_family,
+                'iobject_family_revision': iobject_family_revision,
+                'iobject_type': iobject_type,
+                'iobject_type_revision': iobject_type_revision}
 
-        # Here, we list the processors for embedded non-STIX/CybOX content.
-        # Currently, only OpenIOC is treated.
+    def fetch_identifiers(self, keys):
+        """
+        Retrieve the existing identifiers for a list of (namespace uri, uid) pairs
+        with one query (per BULK_QUERY_CHUNK_SIZE identifiers) and return a
+        dictionary from (namespace uri, uid) to identifier.
+        """
 
-        self.processors = {'OpenIOC2010': OpenIOC_Import}
+        result = {}
 
+        for key_chunk in chunks(keys, BULK_QUERY_CHUNK_SIZE):
+            namespace_uris = set(namespace_uri for (namespace_uri, uid) in key_chunk)
+            uids = set(uid for (namespace_uri, uid) in key_chunk)
+            wanted = set(key_chunk)
+            for identifier in Identifier.objects.filter(uid__in=uids,
+                                                        namespace__uri__in=namespace_uris).select_related('namespace'):
+                key = (identifier.namespace.uri, identifier.uid)
+                if key in wanted:
+                    result[key] = identifier
 
+        return result
 
-    def xml_import(self,
-                   filepath="",
-                   xml_content=None,
-                   markings=None,
-                   identifier_ns_uri=None,
-                   **kwargs):
+    def create_placeholders(self, keys, timestamps):
+        """
+        Create identifiers and PLACEHOLDER objects for a list of (namespace uri, uid)
+        pairs that do not exist yet, with the same results as calls of ``create_iobject``
+        with the default arguments from the reference handler. ``timestamps`` maps each pair
+        to the timestamp with which it is referenced (or None).
         """
-         Import a STIX or CybOX xml  from file <filepath> or a string passed as ``xml_content``
 
-         You can furhter provide:
+        context = self.context
 
-         - a list of InfoObjects as markings with which all generated Information Objects
-            will be associated (e.g., in order to provide provenance function)
-         - a default identifier namespace URI.
+        # The namespaces are fetched (and the missing ones created) in bulk
 
-         The kwargs are not read -- they are present to allow the use of the
-         DingoImportCommand class for easy definition of commandline import commands
-         (the class passes all command line arguments to the xml_import function, so
-         without the **kwargs parameter, an error would occur.
-         """
+        namespace_uris = set(namespace_uri for (namespace_uri, uid) in keys)
 
-        # Clear internal state such that same object can be reused for
-        # multiple imports.
+        id_namespaces = dict((namespace.uri, namespace)
+                             for namespace in IdentifierNameSpace.objects.filter(uri__in=namespace_uris))
 
+        if len(id_namespaces) < len(namespace_uris):
+            dingos_class_map['IdentifierNameSpace'].objects.bulk_create(
+                [dingos_class_map['IdentifierNameSpace'](uri=namespace_uri)
+                 for namespace_uri in namespace_uris if not namespace_uri in id_namespaces])
+            id_namespaces = dict((namespace.uri, namespace)
+                                 for namespace in IdentifierNameSpace.objects.filter(uri__in=namespace_uris))
 
-        if 'default_timestamp' in kwargs and kwargs['default_timestamp']:
+        # Django refuses to bulk-create instances of proxy models, so we
+        # use the DINGOS models here.
 
-            if isinstance(kwargs['default_timestamp'],basestring):
-                naive = parse_datetime(kwargs['default_timestamp'])
-            else:
-                naive = kwargs['default_timestamp']
-            if not timezone.is_aware(naive):
-                aware = timezone.make_aware(naive,timezone.utc)
-            else:
-                aware = naive
-            self.default_timestamp = aware
+        dingos_class_map['Identifier'].objects.bulk_create([dingos_class_map['Identifier'](uid=uid,
+                                                                                          namespace=id_namespaces[namespace_uri],
+                                                                                          latest=None)
+                                                            for (namespace_uri, uid) in keys])
 
+        identifiers = self.fetch_identifiers(keys)
 
-        self.namespace_dict = {None: DINGOS_NAMESPACE_URI}
+        if context.placeholder_types is None:
+            context.placeholder_types = self.placeholder_types()
+
+        placeholders = []
+
+        for key in keys:
+            placeholders.append(dingos_class_map['InfoObject'](identifier=identifiers[key],
+                                                               timestamp=timestamps[key] or context.default_timestamp,
+                                                               create_timestamp=context.default_timestamp,
+                                                               **context.placeholder_types))
+
+        # All PLACEHOLDERs are named alike: we derive the name once
+        # for an object without facts.
+
+        name = placeholders[0].extract_name()[:254]
+        for placeholder in placeholders:
+            placeholder.name = name
 
-        self.default_identifier_ns_uri = None
+        dingos_class_map['InfoObject'].objects.bulk_create(placeholders)
 
-        self.default_identifier_ns_uri = identifier_ns_uri
+        if context.profiler:
+            # Bulk creation sends no post_save signals
+            context.profiler.count('created_objects', len(placeholders))
+
+        # Now, we set the pointer to the latest revision for the newly created
+        # identifiers: as in ``create_iobject``, this is the PLACEHOLDER, which
+        # is the only revision of each identifier. The ORM cannot express an
+        # update from a subquery, so we use one statement per chunk in SQL.
+
+        identifier_table = connection.ops.quote_name(Identifier._meta.db_table)
+        identifier_pk_column = connection.ops.quote_name(Identifier._meta.pk.column)
+        latest_column = connection.ops.quote_name(Identifier._meta.get_field('latest').column)
+        iobject_table = connection.ops.quote_name(InfoObject._meta.db_table)
+        iobject_pk_column = connection.ops.quote_name(InfoObject._meta.pk.column)
+        identifier_column = connection.ops.quote_name(InfoObject._meta.get_field('identifier').column)
+
+        cursor = connection.cursor()
+
+        for identifier_chunk in chunks([identifier.pk for identifier in identifiers.values()], BULK_QUERY_CHUNK_SIZE):
+            cursor.execute("UPDATE %s SET %s = (SELECT MAX(%s.%s) FROM %s WHERE %s.%s = %s.%s) WHERE %s IN (%s)"
+                           % (identifier_table, latest_column,
+                              iobject_table, iobject_pk_column, iobject_table,
+                              iobject_table, identifier_column, identifier_table, identifier_pk_column,
+                              identifier_pk_column, ', '.join(['%s'] * len(identifier_chunk))),
+                           identifier_chunk)
+
+        for key in keys:
+            (namespace_uri, uid) = key
+            context.identifier_cache.add(namespace_uri, uid, identifiers[key], timestamps[key])
+
+    def xml_stream_import(self,
+                          filepath=None,
+                          xml_content=None,
+                          markings=None,
+                          source=None):
+        """
+        Import a STIX or CybOX xml from file <filepath> or a string passed as ``xml_content``
+        (or from an ``ImportSource``) without building the DOM of the whole document.
+
+        The document is read with the libxml2 text reader. Each top-level component
+        of the document -- i.e., each child of a container element such as
+        ``Indicators`` or ``Observables`` and each other child of the top-level
+        element such as ``STIX_Header`` -- is expanded as soon as its subtree
+        has been read, handed to the DINGOS XML importer and imported right away.
+        When the reader moves on, it frees the subtree, so peak memory depends on
+        the size of the largest component rather than on the size of the file.
+        The top-level object is created last from its attributes and the references
+        to the extracted components.
+
+        Please note:
+
+        - Markings defined in the STIX_Header are attached to those components that
+          follow the header (the STIX schema requires the header to come first).
+        - Identifiers that are generated for objects without identifier nested in
+          a component without identifier differ from those generated by the
+          DOM-based import.
+        - Compressed documents are read through a Python stream, for which
+          libxml2 does not lift its limit on the size of single text nodes (10 MB).
+        """
+
+        context = self.context
 
         if not markings:
             markings = []
 
+        if source is None and xml_content is None:
+            source = open_import_source(filepath)
 
+        stream = None
 
+        if xml_content:
+            reader = libxml2.readerForMemory(xml_content, len(xml_content), None, None, libxml2.XML_PARSE_HUGE)
+        elif source.path:
+            reader = libxml2.readerForFile(source.path, None, libxml2.XML_PARSE_HUGE)
+        else:
+            stream = source.open()
+            input_buffer = libxml2.inputBuffer(stream)
+            reader = input_buffer.newTextReader(source.name)
 
+        name = source.name if source else 'XML content'
 
-        # Use the generic XML import customized for STIX/CybOX import
-        # to turn XML into DingoObjDicts
+        ret = reader.Read()
+        while ret == 1 and reader.NodeType() != libxml2.XML_READER_TYPE_ELEMENT:
+            ret = reader.Read()
 
-        import_result = MantisImporter.xml_import(xml_fname=filepath,
-                                                  xml_content=xml_content,
-                                                  ns_mapping=self.namespace_dict,
-                                                  embedded_predicate=self.stix_embedding_pred,
-                                                  id_and_revision_extractor=self.id_and_revision_extractor)
+        if ret != 1:
+            raise StandardError("Could not read top-level element of %s" % name)
 
+        # The top-level node stays alive until the reader reaches the end of the document,
+        # but its children are only present while the reader is within them.
 
+        root = reader.CurrentNode()
 
+        # Extract namespace information (if any), just as the DINGOS XML importer does
 
+        ns_def = root.nsDefs()
+        while ns_def:
+            context.namespace_dict[ns_def.name] = ns_def.content
+            ns_def = ns_def.next
 
-        # The MANTIS/DINGOS xml importer returns then the following structure::
-        #
-        #
-        #    {'id_and_rev_info': Id and revision info of top-level element of the form
-        #        {'id': ... , 'timestamp': ...}
-        #    'elt_name': Element name of top-level element
-        #    'dict_repr': Dictionary representation of XML, minus the embedded objects -- for
-        #                 those, an 'idref' reference has been generated
-        #    'embedded_objects': List of embedded objects, as dictionary
-        #                       {"id_and_revision_info": id and revision info of extracted object,
-        #                        "elt_name": Element name,
-        #                        "dict_repr" :  dictionary representation of XML of embedded object
-        #                       }
-        #    'unprocessed' : List of unprocessed embedded objects (as libxml2 Node object)
-        #                    (e.g. for handover to other importer
-        #    'file_content': Content of imported file (or, if content was passed instead of a file name,
-        #                                                                                         the original content)}
+        top_level_elt_name = root.name
+        top_level_elt_dict = extract_attributes(root, prefix_key_char='@', dict_constructor=DingoObjDict)
+        try:
+            top_level_elt_dict['@@ns'] = root.ns().name
+        except:
+            pass
 
+        top_level_id_and_rev_info = self.id_and_revision_extractor(root)
 
-        # Extract information from import result
+        marking_dict = {}
 
-        top_level_id_and_rev_info = import_result['id_and_rev_info']
-        top_level_elt_name = import_result['elt_name']
-        top_level_elt_dict = import_result['dict_repr']
-        file_content = import_result['file_content']
-        embedded_objects = import_result['embedded_objects']
-        unprocessed_list = import_result['unprocessed']
+        # The container element (e.g., 'Indicators') whose children we are currently
+        # reading and the dictionary into which the references to the children go
 
+        container = None
+        container_dict = None
 
-        if not 'id' in top_level_id_and_rev_info or not top_level_id_and_rev_info['id']:
-            if self.default_identifier_ns_uri:
-                # Top-level element had no identifier. If a default namespace has been provided,
-                # then an identifier is generated
-                top_level_id_and_rev_info['id_ns'] = self.default_identifier_ns_uri
-                top_level_id_and_rev_info['id_uid'] = hashlib.md5(file_content).hexdigest()
-                logger.info("Top level element had no identifier: "
-                            "identifier %s has been generated " % top_level_id_and_rev_info['id_uid'])
+        component_count = 0
 
-            else:
-                logger.warning("Top level element had no identifier. "
-                    "No identifier was generated, because no default namespace had been provided "
-                    "(you can provide a namespace with the '-n' commandline parameter")
+        ret = reader.Read()
 
-        # We now have the top-level object, the list of embedded objects,
-        # and possibly a list of hitherto unprocessed XML nodes.
-        # As we shall see below, we have configured the DINGOS
-        # XML  importer such that it extracts marking structures
-        # as separate objects and tags them with a label
-        # 'import_first'. So, what we need to do is to go through
-        # the embedded objects and collect all markings (along with
-        # information, in which STIX_Package each marking was defined).
-        # This allows us to first create all marking objects and
-        # then mark the subsequently created objects with the
-        # appropriate markings.
-        # Note, that currently,
-        # - we only extract and treat markings defined in the header of STIX_Package
-        # - we do not care about the XPATH-expression and treat every marking as if
-        #   it was defined for the whole STIX-Package
+        while ret == 1:
 
-        marking_dict = {}
+            # The reader frees nodes once it has moved past them; since the address
+            # of a freed node may be reused, the attribute cache (which is keyed by node)
+            # must not survive a step of the reader.
 
-        # We use queues rather than lists, since we have no need
-        # to access elements somewhere in the list, but rather
-        # always pop from the end
+            if context.attribute_cache:
+                context.attribute_cache = {}
 
-        import_first_queue = deque()
+            if reader.NodeType() == libxml2.XML_READER_TYPE_ELEMENT and reader.Depth() == 1:
 
-        pending_queue = deque()
+                node = reader.CurrentNode()
 
-        # The top-level object is certainly no marking, so we
-        # put it on the pending queue
+                if (reader.IsEmptyElement() or node.name == 'STIX_Header'
+                    or self.stix_embedding_pred(root, node, context.namespace_dict)):
 
-        pending_queue.append((top_level_id_and_rev_info, top_level_elt_name, top_level_elt_dict))
+                    with self.profile_phase('parse'):
+                        node = reader.Expand()
 
-        while embedded_objects:
-            # We go through the embedded objects and look for the 'import_first' label
-            embedded_object = embedded_objects.pop()
-            id_and_rev_info = embedded_object['id_and_rev_info']
-            elt_name = embedded_object['elt_name']
-            elt_dict = embedded_object['dict_repr']
-            if 'import_first' in id_and_rev_info:
-                import_first_queue.append((id_and_rev_info, elt_name, elt_dict))
-            else:
-                pending_queue.append((id_and_rev_info, elt_name, elt_dict))
+                    if node.name == 'STIX_Header':
+                        # Now we can read the timestamp from the header
+                        top_level_id_and_rev_info = self.id_and_revision_extractor(root)
 
+                    (elt_name, component_dict) = self.import_stream_component(root,
+                                                                             node,
+                                                                             top_level_id_and_rev_info,
+                                                                             component_count,
+                                                                             markings,
+                                                                             marking_dict)
+                    self.add_stream_component(top_level_elt_dict, elt_name, component_dict)
+                    component_count += 1
 
-        while import_first_queue:
-            # We go through the import_first queue, import all markings,
-            # and collect information about the STIX_Package in which the marking
-            # was defined in the marking_dict (some organizations use a format
-            # in which several STIX Packages are bundled into a single XML file).
+                    container = None
+                    node = None
+                    ret = reader.Next()
+                    continue
 
-            (id_and_rev_info, elt_name, elt_dict) = import_first_queue.pop()
+                else:
+                    # We have found a container: we descend into it and
+                    # treat each child as component
 
+                    container = node
+                    container_dict = extract_attributes(container, prefix_key_char='@', dict_constructor=DingoObjDict)
+                    try:
+                        container_dict['@@ns'] = container.ns().name
+                    except:
+                        pass
+                    self.add_stream_component(top_level_elt_dict, container.name, container_dict)
 
-            (info_obj, existed) = self.iobject_import(id_and_rev_info,
-                                                      elt_name,
-                                                      elt_dict)
+            elif (reader.NodeType() == libxml2.XML_READER_TYPE_ELEMENT and reader.Depth() == 2
+                  and container is not None):
 
-            # id_and_rev_info can carries additional information other than the identifier
-            # and timestamp that has been extracted: the MANTIS XML importer carries
-            # along information inherited from ancestor objects: this allows us
-            # to propagate information down to children, grandchildren etc. As we
-            # see below, we use this mechanism to propagate information about
-            # the STIX_Package in which an object was defined.
+                with self.profile_phase('parse'):
+                    node = reader.Expand()
 
-            if id_and_rev_info['inherited']['embedding_STIX_Package'] in marking_dict:
-                marking_dict[id_and_rev_info['inherited']['embedding_STIX_Package']].append(info_obj)
-            else:
-                marking_dict[id_and_rev_info['inherited']['embedding_STIX_Package']] = [info_obj]
+                (elt_name, component_dict) = self.import_stream_component(container,
+                                                                         node,
+                                                                         top_level_id_and_rev_info,
+                                                                         component_count,
+                                                                         markings,
+                                                                         marking_dict)
+                self.add_stream_component(container_dict, elt_name, component_dict)
+                component_count += 1
+
+                node = None
+                ret = reader.Next()
+                continue
 
+            ret = reader.Read()
 
-        while pending_queue:
-            # Now we start the import of the remaining embedded objects (plus the top-level object)
+        if ret != 0:
+            raise StandardError("Error while reading %s" % name)
 
-            (id_and_rev_info, elt_name, elt_dict) = pending_queue.pop()
+        container = None
+        root = None
+        context.attribute_cache = {}
 
-            if 'embedding_STIX_Package' in id_and_rev_info:
-                embedding_STIX_Package = id_and_rev_info['embedding_STIX_Package']
+        if stream:
+            stream.close()
+
+        if not 'id' in top_level_id_and_rev_info or not top_level_id_and_rev_info['id']:
+            if context.default_identifier_ns_uri:
+                # Top-level element had no identifier. If a default namespace has been provided,
+                # then an identifier is generated from the hash of the content, just as for
+                # the DOM-based import.
+                if xml_content:
+                    content_md5 = hashlib.md5(xml_content).hexdigest()
+                else:
+                    if not source.md5:
+                        source.read_through()
+                    content_md5 = source.md5
+                top_level_id_and_rev_info['id_ns'] = context.default_identifier_ns_uri
+                top_level_id_and_rev_info['id_uid'] = content_md5
+                logger.info("Top level element had no identifier: "
+                            "identifier %s has been generated " % top_level_id_and_rev_info['id_uid'])
             else:
-                embedding_STIX_Package = id_and_rev_info.get('inherited',{}).get('embedding_STIX_Package')
+                logger.warning("Top level element had no identifier. "
+                    "No identifier was generated, because no default namespace had been provided "
+                    "(you can provide a namespace with the '-n' commandline parameter")
 
-            logger.debug("%s embedded in %s" % (id_and_rev_info['id'], embedding_STIX_Package))
+        self.import_objects([],
+                            [],
+                            markings,
+                            marking_dict,
+                            top_level_object=(top_level_id_and_rev_info,
+                                              top_level_elt_name,
+                                              top_level_elt_dict))
+
+
+    def import_stream_component(self,
+                                parent,
+                                node,
+                                top_level_id_and_rev_info,
+                                component_count,
+                                markings,
+                                marking_dict):
+        """
+        Import a top-level component read by ``xml_stream_import``, i.e., an
+        expanded subtree that is still attached to its ancestors.
 
+        If the component is an embedded object (as decided by ``stix_embedding_pred``),
+        it is imported together with the objects embedded in it and a reference
+        to it is returned; otherwise, the objects embedded in it are imported
+        and its dictionary representation is returned such that it can be
+        inlined into the top-level object.
 
-            if elt_name in ['Kill_Chain','Kill_Chain_Phase']:
-                # We chose not to attach markings to Kill_Chain information
-                object_markings = []
-            else:
-                # We mark the object with markings passed to the xml_import command
-                # and markings defined in the STIX_Package in which the object was defined.
+        Returns a pair (element name, dictionary).
+        """
 
-                object_markings = markings + marking_dict.get(embedding_STIX_Package,[])
+        context = self.context
 
-            self.iobject_import(id_and_rev_info,
-                                elt_name,
-                                elt_dict,
-                                markings=object_markings)
+        package_info = dict((key, value) for (key, value) in top_level_id_and_rev_info.items()
+                            if key in ['id', 'timestamp', 'embedding_STIX_Package'])
 
-        # As we shall see below, we have configured the xml_importer such that
-        # it recognizes OpenIOC structures embedded as test mechanism and
-        # leaves them unprocessed. These unprocessed elements we now hand
-        # over to the MANTIS OpenIOC importer.
+        embedded_ns = self.stix_embedding_pred(parent, node, context.namespace_dict)
 
-        for unprocessed_elt in unprocessed_list:
-            (id_and_rev_info,typeinfo,xml_node) = unprocessed_elt
-            processor_class = self.processors.get(id_and_rev_info['defer_processing']['processor'],None)
+        extracted = bool(embedded_ns)
 
+        if extracted:
+            # The component is an embedded object; we treat its id and revision
+            # info just as the DINGOS XML importer does for embedded content.
 
-            if 'embedding_STIX_Package' in id_and_rev_info:
-                embedding_STIX_Package = id_and_rev_info['embedding_STIX_Package']
+            if type(embedded_ns) == type({}):
+                id_and_rev_info = embedded_ns.get('id_and_revision_info',
+                                                  self.id_and_revision_extractor(node))
+                embedded_ns = embedded_ns.get('embedded_ns', None)
             else:
-                embedding_STIX_Package = id_and_rev_info.get('inherited',{}).get('embedding_STIX_Package')
+                id_and_rev_info = self.id_and_revision_extractor(node)
+
+            if not id_and_rev_info.get('id', None) and package_info.get('id', None):
+                (namespace, uid) = package_info['id'].split(':', 1)
+                id_and_rev_info['id'] = "%s:stream%s-in-%s" % (namespace, component_count, uid)
+                id_and_rev_info['id_inherited'] = True
+
+            if not id_and_rev_info.get('timestamp', None) and package_info.get('timestamp', None):
+                id_and_rev_info['timestamp'] = package_info['timestamp']
+                id_and_rev_info['ts_inherited'] = True
+
+            if (id_and_rev_info.get('id', None) and not ':' in id_and_rev_info['id']
+                and package_info.get('id', None) and ':' in package_info['id']):
+                id_and_rev_info['id'] = "%s:%s" % (package_info['id'].split(':')[0], id_and_rev_info['id'])
+                id_and_rev_info['ns_inherited'] = True
 
-            logger.debug("%s embedded in %s" % (id_and_rev_info['id'], embedding_STIX_Package))
+            id_and_rev_info['inherited'] = package_info.copy()
 
-            object_markings = markings + marking_dict.get(embedding_STIX_Package,[])
+            if embedded_ns == True:
+                embedded_ns = None
 
-            if processor_class:
+            reference_dict = extract_attributes(node, prefix_key_char='@', dict_constructor=DingoObjDict)
+            reference_dict['@idref'] = id_and_rev_info.get('id', None)
+            reference_dict['@@timestamp'] = id_and_rev_info.get('timestamp', None)
+            try:
+                reference_dict['@@ns'] = node.ns().name
+            except:
+                reference_dict['@@ns'] = None
+            reference_dict['@@embedded_type_info'] = embedded_ns
 
-                processor = processor_class(namespace_dict=self.namespace_dict)
+            if not (node.children or node.content or 'extract_empty_embedded' in id_and_rev_info):
+                # Only a reference (see the DINGOS XML importer): nothing to import
+                return (node.name, reference_dict)
 
-                processor.xml_import(self,
-                                     xml_content=xml_node,
-                                     markings=object_markings,
-                                     identifier_ns_uri=self.namespace_dict[id_and_rev_info['id'].split(':')[0]],
-                                     initialize_importer=False
-                )
+        else:
+            id_and_rev_info = package_info.copy()
+            if node.name != 'STIX_Header' and package_info.get('id', None):
+                # Each component is handed to a separate run of the DINGOS XML importer,
+                # which numbers the identifiers it generates for embedded objects without
+                # identifier per run. We therefore qualify the identifier from which these
+                # are derived with the position of the component. Objects in the header
+                # get the same identifiers as in the DOM-based import.
+                (namespace, uid) = package_info['id'].split(':', 1)
+                id_and_rev_info['id'] = "%s:stream%s-in-%s" % (namespace, component_count, uid)
+
+        def id_and_revision_extractor(xml_elt):
+            # The component's own id and revision info has been determined above
+            if xml_elt == node:
+                return id_and_rev_info.copy()
+            return self.id_and_revision_extractor(xml_elt)
+
+        with self.profile_phase('extract'):
+            import_result = MantisImporter.xml_import(xml_content=node,
+                                                      ns_mapping=context.namespace_dict,
+                                                      embedded_predicate=self.stix_embedding_pred,
+                                                      id_and_revision_extractor=id_and_revision_extractor)
+
+        elt_name = import_result['elt_name']
+        elt_dict = import_result['dict_repr']
+
+        # Deferred content (embedded OpenIOC) is handed over right away,
+        # before the reader frees the nodes.
+
+        if extracted:
+            if embedded_ns:
+                elt_dict['@@embedded_type_info'] = embedded_ns
+
+            self.import_objects(import_result['embedded_objects'],
+                                import_result['unprocessed'],
+                                markings,
+                                marking_dict,
+                                top_level_object=(import_result['id_and_rev_info'], elt_name, elt_dict))
+            return (node.name, reference_dict)
+        else:
+            self.import_objects(import_result['embedded_objects'],
+                                import_result['unprocessed'],
+                                markings,
+                                marking_dict)
+            return (elt_name, elt_dict)
+
+    def add_stream_component(self, elt_dict, elt_name, component_dict):
+        """
+        Add the dictionary (or reference) of a component to the dictionary
+        of the element containing it; several components of the same name
+        are collected in a list, as in the DINGOS XML importer.
+        """
+        if elt_name in elt_dict:
+            if type(elt_dict[elt_name]) == type([]):
+                elt_dict[elt_name].append(component_dict)
             else:
-                logger.error("Did not find a processor for %s" % id_and_rev_info['defer_processing']['processor'])
+                elt_dict[elt_name] = [elt_dict[elt_name], component_dict]
+        else:
+            elt_dict[elt_name] = component_dict
 
 
     # So, that was the main routine. Now we turn to the hooking functions used
@@ -391,6 +2679,52 @@ class STIX_Import:
         re.compile(
         "(?P<iotype_ns>http://(?P<family>(?P<family_tag>[^.]+)\.mitre.org)/([^#]+#)?(?P<type>.+?))((-|(_v))(?P<revision>.*))?$")]
 
+    # The namespace uris used by STIX and CybOX are few; for the common ones,
+    # we apply the regular expression above once and for all. Other
+    # namespace uris are treated by ``parse_ns_uri`` as before.
+
+    KNOWN_NS_URIS = [
+        'http://stix.mitre.org/stix-1',
+        'http://stix.mitre.org/common-1',
+        'http://stix.mitre.org/default_vocabularies-1',
+        'http://stix.mitre.org/Indicator-2',
+        'http://stix.mitre.org/TTP-1',
+        'http://stix.mitre.org/Incident-1',
+        'http://stix.mitre.org/ThreatActor-1',
+        'http://stix.mitre.org/Campaign-1',
+        'http://stix.mitre.org/CourseOfAction-1',
+        'http://stix.mitre.org/ExploitTarget-1',
+        'http://data-marking.mitre.org/Marking-1',
+        'http://data-marking.mitre.org/extensions/MarkingStructure#TLP-1',
+        'http://stix.mitre.org/extensions/AP#CAPEC2.5-1',
+        'http://stix.mitre.org/extensions/TestMechanism#OpenIOC2010-1',
+        'http://stix.mitre.org/extensions/TestMechanism#Snort-1',
+        'http://stix.mitre.org/extensions/TestMechanism#YARA-1',
+        'http://cybox.mitre.org/cybox-2',
+        'http://cybox.mitre.org/common-2',
+        'http://cybox.mitre.org/default_vocabularies-2',
+        'http://cybox.mitre.org/objects#AddressObject-2',
+        'http://cybox.mitre.org/objects#ArtifactObject-2',
+        'http://cybox.mitre.org/objects#DNSQueryObject-2',
+        'http://cybox.mitre.org/objects#DomainNameObject-1',
+        'http://cybox.mitre.org/objects#EmailMessageObject-2',
+        'http://cybox.mitre.org/objects#FileObject-2',
+        'http://cybox.mitre.org/objects#HostnameObject-1',
+        'http://cybox.mitre.org/objects#HTTPSessionObject-2',
+        'http://cybox.mitre.org/objects#LinkObject-1',
+        'http://cybox.mitre.org/objects#MutexObject-2',
+        'http://cybox.mitre.org/objects#NetworkConnectionObject-2',
+        'http://cybox.mitre.org/objects#PortObject-2',
+        'http://cybox.mitre.org/objects#ProcessObject-2',
+        'http://cybox.mitre.org/objects#SocketAddressObject-1',
+        'http://cybox.mitre.org/objects#URIObject-2',
+        'http://cybox.mitre.org/objects#WhoisObject-2',
+        'http://cybox.mitre.org/objects#WinExecutableFileObject-2',
+        'http://cybox.mitre.org/objects#WinRegistryKeyObject-2',
+    ]
+
+    NS_PARSE_TABLE = build_ns_parse_table(RE_LIST_NS_TYPE_FROM_NS_URL, KNOWN_NS_URIS)
+
     # In Cybox 1.x, the object properties were encompassed in an element called "Defined_Object". In the interest
     # of equal fact terms for equal things, we rename occurrences of "Defined_Object" to "Properties" upon
     # import. Thus, most fact terms will look the same for Cybox 1.x and Cybox 2.x
@@ -438,11 +2772,11 @@ class STIX_Import:
 
 
         if xml_elt.properties:
-            attributes = extract_attributes(xml_elt, prefix_key_char='@')
+            attributes = self.cached_attributes(xml_elt)
             # Extract identifier:
-            if '@id' in attributes:
-                result['id'] = attributes['@id']
-            elif '@object_reference' in attributes:
+            if 'id' in attributes:
+                result['id'] = attributes['id']
+            elif 'object_reference' in attributes:
                 # 'object_reference' is used as follows::
                 #
                 #     (...)
@@ -451,10 +2785,10 @@ class STIX_Import:
                 #              object_reference="cybox:object-3cf6a958-5c3f-11e2-a06c-0050569761d3"/>
                 #     </EmailMessageObj:Attachments>
                 #     (...)
-                result['id'] = attributes['@object_reference']
+                result['id'] = attributes['object_reference']
 
-            elif '@phase_id' in attributes:
-                result['id'] = attributes['@phase_id']
+            elif 'phase_id' in attributes:
+                result['id'] = attributes['phase_id']
                 result['extract_empty_embedded'] = True
 
 
@@ -475,36 +2809,97 @@ class STIX_Import:
 
             result['embedding_STIX_Package'] = result['id']
 
-            #setContextNode(node)
-            #ctxt = xml_elt.xpathNewContext()
-            timestamp_text = xml_elt.xpathEval("./*[contains(name(),'STIX_Header')]/*[contains(name(),'Information_Source')]"
-                                      "/*[contains(name(),'Time')]/*[contains(name(),'Produced_Time')]/text()") #[id=%s]/Information_Source" % result['id'])
-            #ctxt.xpathFreeContext()
-
-
-            if timestamp_text:
-                timestamp_string = timestamp_text[0].getContent().strip()
-                naive = parse_datetime(timestamp_string)
-                if naive:
-                    # Make sure that information regarding the timezone is
-                    # included in the time stamp. If it is not, we chose
-                    # utc as default timezone: if we assume that the same
-                    # producer of OpenIOC data always uses the same timezone
-                    # for filling in the 'last-modified' attribute, then
-                    # this serves the main purpose of time stamps for our
-                    # means: we can find out the latest revision of a
-                    # given piece of data.
-                    if not timezone.is_aware(naive):
-                        aware = timezone.make_aware(naive,timezone.utc)
+            # We read the timestamp from STIX_Header/Information_Source/Time/Produced_Time.
+            # Rather than evaluating an XPath expression with 'contains(name(), ...)'
+            # predicates, we walk down the children along that path.
+
+            timestamp_string = self.produced_time_text(xml_elt)
+
+            if timestamp_string is not None:
+                result['timestamp'] = self.parse_timestamp(timestamp_string)
+
+        return result
+
+    # Path from a STIX_Package to the element carrying the production time
+    # of the package; as with the XPath expression that was used before, we
+    # compare the names by containment (e.g., 'STIX_Header' also finds an element
+    # of an extended schema named 'Extended_STIX_Header').
+
+    PRODUCED_TIME_PATH = ('STIX_Header', 'Information_Source', 'Time', 'Produced_Time')
+
+    def produced_time_text(self, xml_elt):
+        """
+        Return the (stripped) text of the first Produced_Time element found below
+        the given STIX_Package element or None.
+        """
+
+        def find_text(node, path):
+            child = node.children
+            while child is not None:
+                if child.type == 'element' and path[0] in child.name:
+                    if len(path) == 1:
+                        text = child.children
+                        while text is not None:
+                            if text.type in ['text', 'cdata']:
+                                return text.getContent().strip()
+                            text = text.next
                     else:
-                        aware = naive
-                    result['timestamp']= aware
+                        found = find_text(child, path[1:])
+                        if found is not None:
+                            return found
+                child = child.next
+            return None
+
+        return find_text(xml_elt, self.PRODUCED_TIME_PATH)
+
+    def parse_timestamp(self, timestamp_string):
+        """
+        Parse a timestamp; the result is memoized, since the same timestamp
+        is usually encountered several times during an import.
+
+        Make sure that information regarding the timezone is
+        included in the time stamp. If it is not, we chose
+        utc as default timezone: if we assume that the same
+        producer of OpenIOC data always uses the same timezone
+        for filling in the 'last-modified' attribute, then
+        this serves the main purpose of time stamps for our
+        means: we can find out the latest revision of a
+        given piece of data.
+        """
+        context = self.context
+
+        if timestamp_string in context.timestamp_cache:
+            return context.timestamp_cache[timestamp_string]
 
+        aware = None
+        naive = parse_datetime(timestamp_string)
+        if naive:
+            if not timezone.is_aware(naive):
+                aware = timezone.make_aware(naive,timezone.utc)
+            else:
+                aware = naive
 
+        context.timestamp_cache[timestamp_string] = aware
+        return aware
 
+    # Names of elements that ``stix_embedding_pred`` may extract even if they
+    # carry neither an 'id' nor an 'object_reference' attribute
 
+    EMBEDDABLE_ELEMENT_NAMES = frozenset(['Kill_Chain_Phase', 'Marking', 'Object'])
 
-        return result
+    def cached_attributes(self, node):
+        """
+        Return the attributes of an XML node (as extracted by ``extract_attributes``
+        without key prefix), using the attribute cache.
+        """
+        context = self.context
+
+        try:
+            return context.attribute_cache[node]
+        except KeyError:
+            attributes = extract_attributes(node, prefix_key_char='')
+            context.attribute_cache[node] = attributes
+            return attributes
 
     def stix_embedding_pred(self, parent, child, ns_mapping):
         """
@@ -551,8 +2946,12 @@ class STIX_Import:
             type_info = None
 
             while grandchild is not None:
+                if grandchild.type != 'element':
+                    # Text nodes and comments carry no namespace
+                    grandchild = grandchild.next
+                    continue
                 try:
-                    grandchild_attrs = extract_attributes(grandchild, prefix_key_char='')
+                    grandchild_attrs = self.cached_attributes(grandchild)
                     if 'xsi:type' in grandchild_attrs and grandchild.name=='Properties':
                         type_info = grandchild_attrs['xsi:type'].split(':')[0]
                     else:
@@ -569,9 +2968,18 @@ class STIX_Import:
                 logger.debug("Embedding, but did not find type info")
                 return True
 
-        child_attributes = extract_attributes(child, prefix_key_char='')
+        # Most children cannot be embedded objects: only children with certain
+        # names, with an 'id' or 'object_reference' attribute, or below a
+        # test mechanism may be extracted (see below). We reject all others
+        # before building any attribute dictionaries.
 
-        parent_attrs = extract_attributes(parent, prefix_key_char='')
+        if not (parent.name == 'Test_Mechanism'
+                or child.name in self.EMBEDDABLE_ELEMENT_NAMES
+                or child.hasProp('id')
+                or child.hasProp('object_reference')):
+            return False
+
+        child_attributes = self.cached_attributes(child)
 
 
         # We start with some special cases. If we find
@@ -581,6 +2989,7 @@ class STIX_Import:
         # return the child element unprocessed.
 
         if parent.name=='Test_Mechanism':
+            parent_attrs = self.cached_attributes(parent)
             if 'xsi:type' in parent_attrs:
                 if 'OpenIOC2010TestMechanismType' in parent_attrs['xsi:type']:
                     # We have an embedded OpenIOC document.
@@ -742,8 +3151,8 @@ class STIX_Import:
         if len(raw_value) >= RAW_DATA_TO_DB_FOR_LENGTH_LESS_THAN:
             # rewrite the argument for the creation of the fact: there are
             # no values to be added to the database
-            (value_hash,storage_location) = write_large_value(raw_value,
-                                                              dingos.DINGOS_LARGE_VALUE_DESTINATION)
+            (value_hash,storage_location) = self.large_value_writer.write(raw_value,
+                                                                          dingos.DINGOS_LARGE_VALUE_DESTINATION)
 
             add_fact_kargs['values'] = [(value_hash,storage_location)]
 
@@ -767,6 +3176,8 @@ class STIX_Import:
         a reference to an object.
         """
 
+        context = self.context
+
         logger.debug("XXX Found reference with %s" % attr_info)
 
         if 'idref' in attr_info:
@@ -792,14 +3203,20 @@ class STIX_Import:
         #if not timestamp:
         #    timestamp = self.create_timestamp
 
-        (target_mantis_obj, existed) = MantisImporter.create_iobject(
-            uid=uid,
-            identifier_ns_uri=namespace_uri,
-            timestamp=timestamp,
-            create_timestamp=self.default_timestamp)
+        identifier = context.identifier_cache.lookup(namespace_uri, uid, timestamp)
+
+        if identifier is None:
+            (target_mantis_obj, existed) = MantisImporter.create_iobject(
+                uid=uid,
+                identifier_ns_uri=namespace_uri,
+                timestamp=timestamp,
+                create_timestamp=context.default_timestamp)
 
-        logger.debug("Creation of Placeholder for %s %s returned %s" % (namespace_uri, uid, existed))
-        add_fact_kargs['value_iobject_id'] = Identifier.objects.get(uid=uid, namespace__uri=namespace_uri)
+            logger.debug("Creation of Placeholder for %s %s returned %s" % (namespace_uri, uid, existed))
+            identifier = Identifier.objects.get(uid=uid, namespace__uri=namespace_uri)
+            context.identifier_cache.add(namespace_uri, uid, identifier, timestamp)
+
+        add_fact_kargs['value_iobject_id'] = identifier
 
         return True
 
@@ -821,7 +3238,14 @@ class STIX_Import:
 
         """
 
-        value_list = attr_info['value_set'][fact['node_id']].split(",")
+        # DINGOS passes the attributes of the fact's node as flat dictionary;
+        # older versions passed a dictionary per attribute, keyed by node id.
+
+        value_set = attr_info['value_set']
+        if isinstance(value_set, dict):
+            value_set = value_set[fact['node_id']]
+
+        value_list = value_set.split(",")
         value_list = map(lambda x: x.strip(), value_list)
 
         add_fact_kargs['values'] = value_list
@@ -888,7 +3312,7 @@ class STIX_Import:
         #   'add_fact_kargs' and thus change the fact that will be created.
         try:
             ns_slug,value = fact['value'].split(':',1)
-            namespace_uri = self.namespace_dict.get(ns_slug,None)
+            namespace_uri = self.context.namespace_dict.get(ns_slug,None)
             if namespace_uri:
                 add_fact_kargs['fact_dt_namespace_uri'] = namespace_uri
                 add_fact_kargs['fact_dt_namespace_name'] = ns_slug
@@ -1094,6 +3518,14 @@ class STIX_Import:
 
 
     def fact_handler_list(self):
+        """
+        List of (predicate, handler) pairs for the facts to be created.
+
+        The list is compiled into a FactHandlerDispatcher when the importer is
+        initialized; predicates that look at the value of the fact must be
+        passed to the dispatcher as value predicates (currently, only
+        ``cybox_csv_predicate`` does so).
+        """
         return [
             # We write the content of elements with "Raw" in the fact term to disk
             # rather than storing them in the database.
@@ -1211,39 +3643,78 @@ class STIX_Import:
         Separate the namespace from the identifier in a qualified name and lookup the namespace URI associated
         with the given namespace.
         """
+        context = self.context
+
         if ':' in cybox_id:
             (namespace, uid) = cybox_id.split(':', 1)
         else:
             namespace = None
             uid = cybox_id
 
-        if namespace and namespace in self.namespace_dict:
-            namespace_uri = self.namespace_dict[namespace]
+        if namespace and namespace in context.namespace_dict:
+            namespace_uri = context.namespace_dict[namespace]
         else:
             logger.warning("Could not retrieve namespace for identifier %s" % (cybox_id))
             # TODO: Introduce configurable URI
             namespace_uri = None
 
         if not namespace_uri:
-            if self.default_identifier_ns_uri:
-                namespace_uri = self.default_identifier_ns_uri
+            if context.default_identifier_ns_uri:
+                namespace_uri = context.default_identifier_ns_uri
             else:
                 namespace_uri = "%s/%s" % (DINGOS_MISSING_ID_NAMESPACE_URI_PREFIX, namespace)
 
         return (namespace, namespace_uri, uid)
 
+    def parse_ns_uri(self, namespace_uri):
+        """
+        Extract family, type and revision information from a STIX/CybOX namespace uri
+        (see RE_LIST_NS_TYPE_FROM_NS_URL); returns None for other namespace uris.
+        """
+        if namespace_uri in self.NS_PARSE_TABLE:
+            return self.NS_PARSE_TABLE[namespace_uri]
+        return search_by_re_list(self.RE_LIST_NS_TYPE_FROM_NS_URL, namespace_uri)
+
     def derive_iobject_type(self, embedding_ns, embedded_ns, elt_name):
         """
         Derive type of information object stemming from an embedded element
         based on namespace information of embedding element, the embedded
         element itself, and the name of the element.
 
+        The function is called for each imported object and for each reference,
+        but with few distinct arguments; we therefore memoize the results. Since
+        the result depends on the namespace uris of the namespaces as
+        declared in the document being imported, these are part of the key.
+        """
+
+        context = self.context
+
+        memo_key = (embedding_ns,
+                    embedded_ns,
+                    elt_name,
+                    context.namespace_dict.get(embedding_ns, ""),
+                    context.namespace_dict.get(embedded_ns, ""),
+                    context.namespace_dict.get('stix', ""),
+                    context.namespace_dict.get('cybox', ""))
+
+        result = self.iobject_type_memo.lookup(memo_key)
+
+        if result is None:
+            result = self._derive_iobject_type(embedding_ns, embedded_ns, elt_name)
+            self.iobject_type_memo.add(memo_key, result)
+
+        return result.copy()
+
+    def _derive_iobject_type(self, embedding_ns, embedded_ns, elt_name):
+        """
+        Derive type of information object (without memoization, see above)
         """
 
+        context = self.context
 
         # Extract namespace-information
 
-        ns_info = search_by_re_list(self.RE_LIST_NS_TYPE_FROM_NS_URL, self.namespace_dict.get(embedding_ns, ""))
+        ns_info = self.parse_ns_uri(context.namespace_dict.get(embedding_ns, ""))
 
         if not ns_info:
             ns_info = {}
@@ -1268,8 +3739,7 @@ class STIX_Import:
         family_info = {}
 
         if ns_info.get('family_tag',None) in ['stix', 'cybox']:
-            family_info = search_by_re_list(self.RE_LIST_NS_TYPE_FROM_NS_URL,
-                                            self.namespace_dict.get(ns_info['family_tag'], ""))
+            family_info = self.parse_ns_uri(context.namespace_dict.get(ns_info['family_tag'], ""))
             if family_info:
                 iobject_family_revision_name = family_info["revision"]
             else:
@@ -1286,8 +3756,8 @@ class STIX_Import:
         #    <cybox:Properties xsi:type="AddrObj:AddressObjectType" category="ipv4-addr">
         #
         if embedded_ns:
-            namespace_uri = self.namespace_dict.get(embedded_ns, "")
-            type_info = search_by_re_list(self.RE_LIST_NS_TYPE_FROM_NS_URL, namespace_uri)
+            namespace_uri = context.namespace_dict.get(embedded_ns, "")
+            type_info = self.parse_ns_uri(namespace_uri)
             if not type_info:
                 type_info = {}
             if type_info and type_info.get('type',None) in ['common', 'cybox', 'stix']:
@@ -1336,24 +3806,13 @@ class STIX_Import:
 
         """
 
-        iobject_type_ns = None
+        context = self.context
 
-        # Derive the namespace information
-        if ('@xsi:type' in obj_dict or
-                    '@@embedded_type_info' in obj_dict or
-                    '@xsi:type' in obj_dict.get('Properties', {}) or
-                    '@xsi:type' in obj_dict.get('Defined_Object', {}) ):
-            if '@xsi:type' in obj_dict:
-                iobject_type_ns = obj_dict['@xsi:type'].split(':')[0]
-            elif '@xsi:type' in obj_dict.get('Properties', {}):
-                iobject_type_ns = obj_dict['Properties']['@xsi:type'].split(':')[0]
-            elif '@xsi:type' in obj_dict.get('Defined_Object', {}):
-                iobject_type_ns = obj_dict['Defined_Object']['@xsi:type'].split(':')[0]
-            else:
-                iobject_type_ns = obj_dict['@@embedded_type_info']
+        if context.profiler:
+            context.profiler.count('objects')
 
         # Find out what the type of the Information Object to be created should be
-        type_info = self.derive_iobject_type(obj_dict['@@ns'], iobject_type_ns, elt_name)
+        type_info = self.iobject_type_info(elt_name, obj_dict)
 
         if (not 'id' in id_and_rev_info or not id_and_rev_info['id']) and (not 'id_ns' in id_and_rev_info):
             logger.info("Object of type %s without id information encountered, skipping" % elt_name)
@@ -1366,7 +3825,30 @@ class STIX_Import:
 
         object_timestamp = id_and_rev_info.get('timestamp',None)
         if not object_timestamp:
-            object_timestamp = self.default_timestamp
+            object_timestamp = context.default_timestamp
+
+        if context.pending_placeholders:
+            # The object itself needs no PLACEHOLDER anymore
+            context.pending_placeholders.pop((namespace_uri, uid), None)
+            self.create_pending_placeholders(obj_dict)
+
+        # If a revision of the object with exactly the same content exists,
+        # the new revision receives the facts of that revision. For an object
+        # that had no identifier before the import, there is no such revision
+        # (a further revision of the object in the same import is looked up
+        # as usual, though).
+
+        fingerprint = None
+
+        if (namespace_uri, uid) in context.new_identifiers:
+            context.new_identifiers.discard((namespace_uri, uid))
+        else:
+            fingerprint = self.object_fingerprint(elt_name, obj_dict, type_info)
+
+            result = self.import_unchanged_revision(namespace_uri, uid, object_timestamp, fingerprint,
+                                                    markings=markings)
+            if result:
+                return result
 
         (info_obj, existed) = MantisImporter.create_iobject(iobject_family_name=type_info['iobject_family_name'],
                                                             iobject_family_revision_name=type_info[
@@ -1383,15 +3865,214 @@ class STIX_Import:
                                                             create_timestamp=self.create_timestamp,
                                                             markings=markings,
                                                             config_hooks={
-                                                            'special_ft_handler': self.fact_handler_list(),
+                                                            'special_ft_handler': self.fact_handler_dispatcher.special_ft_handler(),
                                                             'datatype_extractor': self.cybox_datatype_extractor,
                                                             'attr_ignore_predicate': self.attr_ignore_predicate,
                                                             'force_nonleaf_fact_predicate': self.force_nonleaf_fact_predicate},
-                                                            namespace_dict=self.namespace_dict,
+                                                            namespace_dict=context.namespace_dict,
         )
 
+        context.identifier_cache.add(namespace_uri, uid, info_obj, object_timestamp)
+
+        if existed != EXIST_ID_AND_EXACT_TIMESTAMP:
+            # The facts of the object have been written (or overwritten, if
+            # the object was a PLACEHOLDER); the fingerprint is stored for
+            # the next import of the object.
+            if fingerprint is None:
+                fingerprint = self.object_fingerprint(elt_name, obj_dict, type_info)
+            if not InfoObjectFingerprint.objects.filter(iobject=info_obj).update(fingerprint=fingerprint):
+                InfoObjectFingerprint.objects.create(iobject=info_obj, fingerprint=fingerprint)
+
         return (info_obj, existed)
 
+    def iobject_type_info(self, elt_name, obj_dict):
+        """
+        Derive the type information of the InfoObject for an element
+        (see ``derive_iobject_type``).
+        """
+
+        iobject_type_ns = None
+
+        # Derive the namespace information
+        if ('@xsi:type' in obj_dict or
+                    '@@embedded_type_info' in obj_dict or
+                    '@xsi:type' in obj_dict.get('Properties', {}) or
+                    '@xsi:type' in obj_dict.get('Defined_Object', {}) ):
+            if '@xsi:type' in obj_dict:
+                iobject_type_ns = obj_dict['@xsi:type'].split(':')[0]
+            elif '@xsi:type' in obj_dict.get('Properties', {}):
+                iobject_type_ns = obj_dict['Properties']['@xsi:type'].split(':')[0]
+            elif '@xsi:type' in obj_dict.get('Defined_Object', {}):
+                iobject_type_ns = obj_dict['Defined_Object']['@xsi:type'].split(':')[0]
+            else:
+                iobject_type_ns = obj_dict['@@embedded_type_info']
+
+        return self.derive_iobject_type(obj_dict['@@ns'], iobject_type_ns, elt_name)
+
+    def object_fingerprint(self, elt_name, obj_dict, type_info):
+        """
+        Return a SHA256 fingerprint of the content of an object, i.e., of
+        everything that determines the facts derived from it: the element
+        name, the derived type information and the dictionary representation
+        (including the timestamps of references).
+
+        Namespace prefixes are replaced by the namespace uris they stand for.
+        Since facts copied from an earlier revision (see
+        ``import_unchanged_revision``) keep what has been recorded for the
+        prefixes of that revision, the mapping of the prefixes used in the
+        object to uris is part of the fingerprint, too. So is the version of
+        the importer, because it determines how facts are derived.
+        """
+
+        context = self.context
+
+        used_prefixes = set()
+
+        def normalize_prefix(prefix):
+            if prefix in context.namespace_dict:
+                used_prefixes.add(prefix)
+                return context.namespace_dict[prefix]
+            return prefix
+
+        def normalize_qname(value):
+            if isinstance(value, basestring) and ':' in value:
+                (prefix, name) = value.split(':', 1)
+                if prefix in context.namespace_dict:
+                    return "{%s}%s" % (normalize_prefix(prefix), name)
+            return value
+
+        def normalize(value):
+            if isinstance(value, dict):
+                result = []
+                for (key, sub_value) in value.items():
+                    if key in ['@@ns', '@@embedded_type_info']:
+                        sub_value = normalize_prefix(sub_value)
+                    elif key.startswith('@'):
+                        key = normalize_qname(key)
+                        sub_value = normalize_qname(sub_value)
+                    result.append([key, normalize(sub_value)])
+                return result
+            elif isinstance(value, (list, tuple)):
+                return [normalize(element) for element in value]
+            return value
+
+        normalized = normalize(obj_dict)
+
+        content = json.dumps([__version__,
+                              elt_name,
+                              sorted(type_info.items()),
+                              normalized,
+                              sorted((prefix, context.namespace_dict[prefix]) for prefix in used_prefixes)],
+                             default=unicode)
+
+        return hashlib.sha256(content).hexdigest()
+
+    def import_unchanged_revision(self, namespace_uri, uid, timestamp, fingerprint, markings=None):
+        """
+        If a revision of the given object with the given fingerprint exists
+        (and no revision with the given timestamp), create the revision
+        with the given timestamp by copying the type information and
+        the links to the facts from the existing revision: the FactTerms,
+        Facts, FactValues and NodeIDs are known to exist, so there is no need
+        to derive them from the dictionary representation again.
+
+        Returns the result of ``create_iobject`` for the new revision or None,
+        if there is no such revision (or its links to the facts cannot be copied).
+        """
+
+        context = self.context
+
+        existing_fingerprints = InfoObjectFingerprint.objects.filter(
+            fingerprint=fingerprint,
+            iobject__identifier__uid=uid,
+            iobject__identifier__namespace__uri=namespace_uri).select_related(
+            'iobject__identifier__latest').order_by('-iobject__timestamp')[:1]
+
+        if not existing_fingerprints:
+            return None
+
+        source = existing_fingerprints[0].iobject
+        identifier = source.identifier
+
+        if InfoObject.objects.filter(identifier=identifier, timestamp=timestamp).exists():
+            # Revisions with the given timestamp are treated by ``create_iobject``
+            return None
+
+        # Facts that are attributes of other facts refer to the link of the
+        # attributed fact, so we have to create the links of attributed facts
+        # first and map the links of the existing revision to the new links
+        # via the node identifiers. The order is determined before the new
+        # revision is created: if it cannot be determined, the facts of the
+        # object are derived from its content.
+
+        InfoObject2Fact = dingos_class_map['InfoObject2Fact']
+
+        pending = list(InfoObject2Fact.objects.filter(iobject=source).order_by('pk').values_list(
+            'pk', 'fact_id', 'node_id_id', 'namespace_map_id', 'attributed_fact_id'))
+
+        node_of_link = dict((pk, node_id) for (pk, fact_id, node_id, namespace_map_id, attributed_id) in pending)
+
+        ordered_nodes = set()
+
+        link_batches = []
+
+        while pending:
+            ready = [link for link in pending if link[4] is None or node_of_link.get(link[4]) in ordered_nodes]
+            if not ready:
+                logger.warning("Could not copy facts of %s:%s: cyclic attribution" % (namespace_uri, uid))
+                return None
+            link_batches.append(ready)
+            ordered_nodes.update(link[2] for link in ready)
+            ready_pks = set(link[0] for link in ready)
+            pending = [link for link in pending if not link[0] in ready_pks]
+
+        iobject = InfoObject.objects.create(identifier=identifier,
+                                            timestamp=timestamp,
+                                            create_timestamp=self.create_timestamp,
+                                            iobject_type_id=source.iobject_type_id,
+                                            iobject_type_revision_id=source.iobject_type_revision_id,
+                                            iobject_family_id=source.iobject_family_id,
+                                            iobject_family_revision_id=source.iobject_family_revision_id,
+                                            name=source.name)
+
+        logger.info("Creating %s:%s with timestamp %s from unchanged revision with timestamp %s" % (
+            namespace_uri, uid, timestamp, source.timestamp))
+
+        copied_links = {}
+
+        for ready in link_batches:
+            InfoObject2Fact.objects.bulk_create([InfoObject2Fact(iobject_id=iobject.pk,
+                                                                 fact_id=fact_id,
+                                                                 node_id_id=node_id,
+                                                                 namespace_map_id=namespace_map_id,
+                                                                 attributed_fact_id=copied_links[
+                                                                     node_of_link[attributed_id]]
+                                                                 if attributed_id else None)
+                                                 for (pk, fact_id, node_id, namespace_map_id, attributed_id) in ready])
+            if context.profiler:
+                context.profiler.count('facts', len(ready))
+            copied_links = dict(InfoObject2Fact.objects.filter(iobject=iobject).values_list('node_id_id', 'pk'))
+
+        # We adjust the back pointer in the identifier table to the latest revision
+
+        if identifier.latest is None or identifier.latest.timestamp < timestamp:
+            identifier.latest = iobject
+            identifier.save()
+            existed = EXIST_ID_AND_OLDER_TIMESTAMP
+        else:
+            existed = EXIST_ID_AND_NEWER_TIMESTAMP
+
+        if markings:
+            for marking in markings:
+                Marking2X.objects.create(marked=iobject,
+                                         marking=marking)
+
+        InfoObjectFingerprint.objects.create(iobject=iobject, fingerprint=fingerprint)
+
+        context.identifier_cache.add(namespace_uri, uid, identifier, timestamp)
+
+        return (iobject, existed)
+
 
 
 
@@ -0,0 +1,129 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import sys
+import json
+import time
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError, OutputWrapper
+
+from mantis_stix_importer.snapshots import SNAPSHOT_METHODS, snapshot_models, take_snapshot, snapshot_delta
+
+
+class Command(BaseCommand):
+    """
+    Take a snapshot of the number of rows per model or compare snapshots,
+    e.g., for auditing what an import has added to the database::
+
+        python manage.py mantis_stix_db_snapshot -o before.json
+        python manage.py mantis_stix_import ...
+        python manage.py mantis_stix_db_snapshot --compare before.json
+
+    Without ``--compare``, the snapshot is written as JSON to the file given
+    with ``-o`` (or to stdout). With ``--compare``, the differences between
+    the given snapshot and the current state (or a second snapshot file given
+    as argument) are printed. The snapshot is taken with one query per model
+    (see ``mantis_stix_importer.snapshots``); with ``--method max_id``, the
+    queries remain cheap even for very large tables.
+    """
+
+    args = '[snapshot file]'
+    help = 'Takes and compares snapshots of the number of rows per DINGOS model'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--method',
+                    action='store',
+                    dest='method',
+                    default='count',
+                    help="""Snapshot method: 'count' (number of rows) or 'max_id'
+                    (largest primary key; counts inserted rows only)."""),
+        make_option('-o', '--output',
+                    action='store',
+                    dest='output',
+                    default=None,
+                    help="""File to which the snapshot is written (default: stdout)."""),
+        make_option('--compare',
+                    action='store',
+                    dest='compare',
+                    default=None,
+                    help="""Snapshot file to compare with the current state or with the
+                    snapshot file given as argument."""),
+        make_option('--importer-models',
+                    action='store_true',
+                    dest='importer_models',
+                    default=False,
+                    help="""Also cover the models of the STIX importer (import ledger, checkpoints,
+                    fingerprints, index of large values)."""),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        # Django replaces stdout when running the command via 'execute';
+        # we set it here such that 'handle' can also be called directly.
+        self.stdout = OutputWrapper(sys.stdout)
+
+    def handle(self, *args, **options):
+
+        if options.get('compare'):
+            before = self.read_snapshot(options['compare'])
+            if args:
+                after = self.read_snapshot(args[0])
+                if after['method'] != before['method']:
+                    raise CommandError("Snapshots have been taken with different methods")
+            else:
+                after = self.snapshot(before['method'], before['importer_models'])
+
+            delta = snapshot_delta(sorted(before['numbers'].items()), sorted(after['numbers'].items()))
+
+            self.stdout.write("Changes between %s and %s (method %s):" % (options['compare'],
+                                                                         args[0] if args else 'now',
+                                                                         before['method']))
+            for (model_name, difference) in delta:
+                self.stdout.write("%30s %+d" % (model_name, difference))
+            if not delta:
+                self.stdout.write("No changes")
+            return
+
+        if args:
+            raise CommandError("A snapshot file can only be given with --compare")
+
+        if not options.get('method') in SNAPSHOT_METHODS:
+            raise CommandError("Unknown snapshot method %s" % options.get('method'))
+
+        snapshot = json.dumps(self.snapshot(options['method'], options.get('importer_models')),
+                              indent=2, sort_keys=True, separators=(',', ': '))
+
+        if options.get('output'):
+            with open(options['output'], 'w') as output:
+                output.write(snapshot + "\n")
+        else:
+            self.stdout.write(snapshot)
+
+    def snapshot(self, method, importer_models):
+        return {'method': method,
+                'importer_models': bool(importer_models),
+                'taken': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'numbers': dict(take_snapshot(method, snapshot_models(importer_models)))}
+
+    def read_snapshot(self, file_name):
+        try:
+            with open(file_name) as snapshot_file:
+                return json.load(snapshot_file)
+        except (IOError, ValueError) as e:
+            raise CommandError("Could not read snapshot %s: %s" % (file_name, e))
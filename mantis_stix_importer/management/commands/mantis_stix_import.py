@@ -16,16 +16,216 @@
 #
 
 
+import os
+import sys
+import glob
+import time
+import json
+import hashlib
+import logging
+import traceback
+import multiprocessing
+
+import libxml2
+
+from django.core.management.base import OutputWrapper
+from django.db import connection, IntegrityError
+
 from dingos.importer import DingoImportCommand
-from mantis_stix_importer.importer import STIX_Import
+from dingos.models import InfoObject
+from mantis_stix_importer.importer import STIX_Import, ImportProfiler
+from mantis_stix_importer.sources import iter_import_sources, is_archive, open_import_source
 from optparse import make_option
 
+logger = logging.getLogger(__name__)
+
+# In parallel mode (``--jobs N``), each worker process owns its own
+# STIX_Import instance; it is created by the pool initializer below.
+
+# Workers that import objects sharing fact terms, data types etc. may
+# race each other when these are created; the loser of such a race sees
+# an IntegrityError. In transactional mode, the importer tries the object
+# again in a new savepoint (see STIX_Import.import_in_savepoint). Otherwise,
+# the worker imports the file again: by then, the contested rows exist, and
+# the objects imported before are found (or skipped, see ImportCheckpointer).
+# Files are not wrapped in a transaction of their own, so that commits,
+# checkpoints and deferred processing work as in a sequential import.
+
+PARALLEL_IMPORT_ATTEMPTS = 3
+
+_worker_importer = None
+
+
+def _init_worker():
+    """
+    Initializer for the worker processes of a parallel import.
+    """
+    global _worker_importer
+
+    # The database connection inherited from the parent process must not
+    # be shared between processes: by closing it, we force Django to open
+    # a fresh connection for this worker upon the first query.
+
+    connection.close()
+
+    _worker_importer = STIX_Import()
+
+
+def _import_file_group(job):
+    """
+    Import a group of files in a worker process. All files in a group
+    carry the same top-level identifier; they are imported one after
+    another, so that two revisions of the same package are never
+    imported at the same time.
+
+    Returns a list of tuples (worker pid, name of import unit, size, seconds, success,
+    number of lookups saved by the identifier cache, profile or None), with one import unit
+    per document (i.e., per member of an archive).
+    """
+
+    (filenames, marking_pks, options) = job
+
+    markings = []
+    if marking_pks:
+        marking_map = InfoObject.objects.in_bulk(marking_pks)
+        markings = [marking_map[pk] for pk in marking_pks if pk in marking_map]
+
+    results = []
+
+    for filename in filenames:
+        try:
+            for source in iter_import_sources(filename):
+                logger.info("Starting import of %s" % source.name)
+                cache_hits = _worker_importer.identifier_cache.hits
+                start = time.time()
+                success = False
+                profile = None
+                for attempt in range(PARALLEL_IMPORT_ATTEMPTS):
+                    if attempt:
+                        # Identifiers resolved in the failed attempt may have
+                        # been rolled back.
+                        _worker_importer.identifier_cache.clear()
+                    try:
+                        profile = _worker_importer.xml_import(source=source,
+                                                              markings=markings,
+                                                              **options)
+                        success = True
+                        break
+                    except IntegrityError:
+                        logger.warning("Concurrent creation of database entries while importing %s "
+                                       "(attempt %d of %d)" % (source.name, attempt + 1, PARALLEL_IMPORT_ATTEMPTS))
+                    except:
+                        logger.error("Something went wrong when importing %s. Traceback: %s" % (source.name,
+                                                                                               traceback.format_exc()))
+                        break
+
+                results.append((os.getpid(), source.name, source.size, time.time() - start, success,
+                                _worker_importer.identifier_cache.hits - cache_hits, profile))
+        except:
+            logger.error("Could not read %s. Traceback: %s" % (filename, traceback.format_exc()))
+            results.append((os.getpid(), filename, os.path.getsize(filename), 0.0, False, 0, None))
+
+        if options.get('destination_path'):
+            try:
+                dest_path = os.path.join(options.get('destination_path'), os.path.basename(filename))
+                logger.info("Moving %s to %s" % (os.path.basename(filename), dest_path))
+                os.rename(filename, dest_path)
+            except Exception:
+                logger.exception("Could not move file %s:" % (filename))
+
+    return results
+
+
+def top_level_identifier(filename):
+    """
+    Determine the identifier of the top-level element of an XML file
+    without parsing the whole file: we read with the libxml2 text reader
+    up to the first element and return its 'id' attribute as pair
+    (namespace uri, uid).
+
+    If the top-level element carries no identifier, the importer derives
+    one from the MD5 hash of the file content, so in that case we
+    return the hash. We do the same for archives, which contain
+    several documents.
+    """
+
+    if not is_archive(filename):
+        source = open_import_source(filename)
+
+        if source.path:
+            reader = libxml2.newTextReaderFilename(filename)
+        else:
+            stream = source.open()
+            input_buffer = libxml2.inputBuffer(stream)
+            reader = input_buffer.newTextReader(filename)
+
+        if reader:
+            while reader.Read() == 1:
+                if reader.NodeType() == libxml2.XML_READER_TYPE_ELEMENT:
+                    qname = reader.GetAttribute('id')
+                    if qname:
+                        if ':' in qname:
+                            (namespace, uid) = qname.split(':', 1)
+                            return (reader.LookupNamespace(namespace) or namespace, uid)
+                        return (None, qname)
+                    break
+
+    md5 = hashlib.md5()
+    with open(filename, 'rb') as content_file:
+        for block in iter(lambda: content_file.read(1024 * 1024), b''):
+            md5.update(block)
+    return ('md5', md5.hexdigest())
+
+
+def schedule_import_jobs(filenames):
+    """
+    Group the given files by the identifier of their top-level element
+    and order the groups largest-first (by the sum of file sizes), so that
+    long-running imports are started early and the load on the worker
+    pool is balanced.
+
+    Returns a list of filename lists.
+    """
+
+    groups = {}
+
+    for filename in filenames:
+        groups.setdefault(top_level_identifier(filename), []).append(filename)
+
+    sized_groups = []
+
+    for group in groups.values():
+        group.sort()
+        sized_groups.append((sum(map(os.path.getsize, group)), group))
+
+    sized_groups.sort(key=lambda x: x[0], reverse=True)
+
+    return [group for (size, group) in sized_groups]
 
 
 class Command(DingoImportCommand):
     """
     This class implements the command for importing a OpenIOC XML
     files into DINGO.
+
+    Files may be compressed with gzip (``.gz``) or bzip2 (``.bz2``);
+    zip and tar archives (``.zip``, ``.tar``, ``.tar.gz``, ``.tgz``, ...)
+    are imported without extracting them, each member being an import
+    unit of its own. With ``--verbosity 2``, the command ends with a summary
+    of all import units and of the identifier cache; otherwise, sequential
+    imports write nothing to stdout (as the DINGOS import command).
+
+    With ``--jobs N``, the files are distributed among N worker processes,
+    each with its own database connection and STIX_Import instance; the
+    command then always ends with the summary of the import units and
+    of the workers. Note that SQLite serializes all writers, so this mode
+    only pays off with a database server such as PostgreSQL.
+
+    With ``--dry-run``, the files are only parsed and the objects extracted
+    (see ``STIX_Import.emit_objects``); the objects are written as JSON lines
+    (with the name of the import unit as 'unit') to stdout. Together with
+    ``--profile``, this measures the cost of parsing and extraction without
+    the database.
     """
 
     option_list = DingoImportCommand.option_list + (
@@ -34,6 +234,64 @@ class Command(DingoImportCommand):
                     dest='default_timestamp',
                     default=None,
                     help="""Set default timestamp."""),
+        make_option('-j', '--jobs',
+                    action='store',
+                    type='int',
+                    dest='jobs',
+                    default=1,
+                    help="""Number of worker processes among which the files are distributed."""),
+        make_option('--streaming',
+                    action='store_true',
+                    dest='streaming',
+                    default=False,
+                    help="""Import large files with bounded memory: top-level components
+                    are imported as soon as they have been read."""),
+        make_option('--batch-identifier-cache',
+                    action='store_true',
+                    dest='batch_identifier_cache',
+                    default=False,
+                    help="""Keep the cache of resolved identifiers across all files of this run
+                    rather than starting each file with an empty cache."""),
+        make_option('--force',
+                    action='store_true',
+                    dest='force',
+                    default=False,
+                    help="""Import files even if the import ledger shows that the same content
+                    has already been imported with the same default timestamp; an import
+                    that failed before is not resumed but started from the beginning."""),
+        make_option('--transaction',
+                    action='store_true',
+                    dest='transactional',
+                    default=False,
+                    help="""Import each file in a single transaction; objects whose import
+                    fails are skipped."""),
+        make_option('--commit-every',
+                    action='store',
+                    type='int',
+                    dest='commit_every',
+                    default=0,
+                    help="""With --transaction: commit after each N objects rather than
+                    once per file."""),
+        make_option('--profile',
+                    action='store_true',
+                    dest='profile',
+                    default=False,
+                    help="""Measure time, database queries and created objects per phase
+                    of the import and print them as table."""),
+        make_option('--dry-run',
+                    action='store_true',
+                    dest='dry_run',
+                    default=False,
+                    help="""Only parse the files and extract the objects, without accessing
+                    the database: for each object, a line with identifier, type information and
+                    dictionary representation is written as JSON to stdout (the summary goes
+                    to stderr)."""),
+        make_option('--parse-cache',
+                    action='store',
+                    dest='parse_cache',
+                    default=None,
+                    help="""Directory of the cache of parsed documents: documents found there are
+                    not parsed again (default: the setting MANTIS['PARSE_CACHE_DIR'], if any)."""),
     )
 
 
@@ -41,3 +299,274 @@ class Command(DingoImportCommand):
 
     help = 'Imports STIX XML files of specified paths into DINGO'
 
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        # Django replaces stdout when running the command via 'execute';
+        # we set it here such that 'handle' can also be called directly.
+        self.stdout = OutputWrapper(sys.stdout)
+        self.stderr = OutputWrapper(sys.stderr)
+
+    def handle(self, *args, **options):
+
+        jobs = options.get('jobs') or 1
+
+        verbose = int(options.get('verbosity') or 1) >= 2
+
+        # A dry run must not create the marking for the import
+        markings = [] if options.get('dry_run') else self.collect_markings(args, options)
+
+        filenames = []
+        for arg in args:
+            found = glob.glob(arg)
+            if not found:
+                logger.warning("No file(s) %s for import found!" % arg)
+            filenames.extend(found)
+
+        if not filenames:
+            logger.warning("No files for import specified!")
+            return
+
+        if options.get('dry_run'):
+            self.dry_run(filenames, options)
+            return
+
+        if jobs <= 1:
+            cache_hits = self.Importer.identifier_cache.hits
+            cache_misses = self.Importer.identifier_cache.misses
+            commit_seconds = self.Importer.commit_seconds
+            commit_count = self.Importer.commit_count
+
+            start = time.time()
+
+            results = []
+            for filename in filenames:
+                results.extend(self.import_file(filename, markings, options))
+
+            if verbose:
+                self.write_unit_summary(results, time.time() - start)
+
+            if options.get('profile'):
+                self.write_profile(results)
+
+            if verbose:
+                self.stdout.write("Identifier cache saved %d of %d reference lookups" % (
+                    self.Importer.identifier_cache.hits - cache_hits,
+                    self.Importer.identifier_cache.hits - cache_hits
+                    + self.Importer.identifier_cache.misses - cache_misses))
+
+            if options.get('transactional'):
+                self.stdout.write("Spent %.2f of %.2f seconds in %d commits" % (
+                    self.Importer.commit_seconds - commit_seconds,
+                    time.time() - start,
+                    self.Importer.commit_count - commit_count))
+            return
+
+        worker_options = dict((key, value) for (key, value) in options.items()
+                              if not key in ['marking_ids', 'jobs'])
+
+        job_list = [(group, [m.pk for m in markings], worker_options)
+                    for group in schedule_import_jobs(filenames)]
+
+        # The forked workers must not inherit the open database connection.
+
+        connection.close()
+
+        pool = multiprocessing.Pool(processes=jobs, initializer=_init_worker)
+
+        start = time.time()
+        results = []
+        try:
+            for group_result in pool.imap_unordered(_import_file_group, job_list):
+                results.extend(group_result)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+        self.write_unit_summary(results, time.time() - start)
+        self.write_worker_summary(results, time.time() - start)
+
+        if options.get('profile'):
+            self.write_profile(results)
+
+    def collect_markings(self, args, options):
+        """
+        Return the markings with which all imported objects are marked:
+        the marking created from ``--marking_json`` and the existing
+        markings given with ``--Marking_ID``.
+        """
+
+        markings = []
+
+        marking = self.create_import_marking(args, options)
+        if marking:
+            markings.append(marking)
+
+        for marking_id in options.get('marking_ids') or []:
+            try:
+                ns, uid = marking_id.split(':')
+                markings.append(InfoObject.objects.exclude(latest_of=None).get(identifier__uid=uid,
+                                                                               identifier__namespace__uri=ns))
+            except:
+                logger.warning('Could not find marking object %s in system' % marking_id)
+
+        return markings
+
+    def import_file(self, filename, markings, options):
+        """
+        Import the documents contained in a file: a single document for
+        a (possibly compressed) XML file, one document per member for an archive.
+
+        Returns a list of tuples (pid, name of import unit, size, seconds, success,
+        number of lookups saved by the identifier cache, profile or None), one per document.
+        """
+
+        results = []
+
+        try:
+            for source in iter_import_sources(filename):
+                logger.info("Starting import of %s" % source.name)
+                cache_hits = self.Importer.identifier_cache.hits
+                start = time.time()
+                success = False
+                profile = None
+                import_options = options
+                if options.get('dry_run'):
+                    import_options = dict(options, record_writer=self.record_writer(source.name))
+                try:
+                    profile = self.Importer.xml_import(source=source,
+                                                       markings=markings,
+                                                       **import_options)
+                    success = True
+                except:
+                    logger.error("Something went wrong when importing %s. Traceback: %s" % (source.name,
+                                                                                           traceback.format_exc()))
+                results.append((os.getpid(), source.name, source.size, time.time() - start, success,
+                                self.Importer.identifier_cache.hits - cache_hits, profile))
+        except:
+            logger.error("Could not read %s. Traceback: %s" % (filename, traceback.format_exc()))
+            results.append((os.getpid(), filename, os.path.getsize(filename), 0.0, False, 0, None))
+
+        if options.get('destination_path') and not options.get('dry_run'):
+            try:
+                dest_path = os.path.join(options.get('destination_path'), os.path.basename(filename))
+                logger.info("Moving %s to %s" % (os.path.basename(filename), dest_path))
+                os.rename(filename, dest_path)
+            except Exception:
+                logger.exception("Could not move file %s:" % (filename))
+
+        return results
+
+    def dry_run(self, filenames, options):
+        """
+        Parse the files (in this process) and write the extracted objects
+        as JSON lines to stdout; the summary goes to stderr.
+        """
+
+        (self.records, self.stdout) = (self.stdout, self.stderr)
+
+        try:
+            start = time.time()
+
+            results = []
+            for filename in filenames:
+                results.extend(self.import_file(filename, [], options))
+
+            self.write_unit_summary(results, time.time() - start)
+
+            if options.get('profile'):
+                self.write_profile(results)
+        finally:
+            self.stdout = self.records
+
+    def record_writer(self, unit):
+        """
+        Return a function that writes the objects of a dry run (see
+        ``STIX_Import.emit_objects``) as JSON lines.
+        """
+
+        def write_record(record):
+            record['unit'] = unit
+            self.records.write(json.dumps(record, default=unicode, sort_keys=True))
+
+        return write_record
+
+    def write_unit_summary(self, results, elapsed):
+        """
+        Print size, duration and outcome of each import unit (i.e., each
+        file or member of an archive).
+        """
+
+        self.stdout.write("%-60s %12s %10s %8s" % ('import unit', 'bytes', 'seconds', 'status'))
+
+        for (pid, name, size, seconds, success, cache_hits, profile) in results:
+            self.stdout.write("%-60s %12d %10.2f %8s" % (name, size or 0, seconds, 'ok' if success else 'failed'))
+
+        self.stdout.write("Imported %d of %d units (%d bytes) in %.1f seconds" % (
+            len([result for result in results if result[4]]),
+            len(results),
+            sum([result[2] or 0 for result in results]),
+            elapsed))
+
+    def write_worker_summary(self, results, elapsed):
+        """
+        Print the number of import units, failures, bytes and throughput per worker.
+        """
+
+        worker_stats = {}
+
+        for (pid, name, size, seconds, success, cache_hits, profile) in results:
+            stats = worker_stats.setdefault(pid, {'units': 0, 'failed': 0, 'bytes': 0, 'seconds': 0.0,
+                                                  'cache_hits': 0})
+            stats['units'] += 1
+            stats['cache_hits'] += cache_hits
+            stats['bytes'] += size or 0
+            stats['seconds'] += seconds
+            if not success:
+                stats['failed'] += 1
+
+        self.stdout.write("%8s %8s %8s %12s %10s %10s %10s %12s" % ('worker', 'units', 'failed', 'bytes',
+                                                                      'seconds', 'units/s', 'KB/s',
+                                                                      'id lookups saved'))
+        for pid in sorted(worker_stats.keys()):
+            stats = worker_stats[pid]
+            seconds = stats['seconds'] or 1e-6
+            self.stdout.write("%8s %8d %8d %12d %10.1f %10.2f %10.1f %12d" % (pid,
+                                                                             stats['units'],
+                                                                             stats['failed'],
+                                                                             stats['bytes'],
+                                                                             stats['seconds'],
+                                                                             stats['units'] / seconds,
+                                                                             stats['bytes'] / 1024.0 / seconds,
+                                                                             stats['cache_hits']))
+        self.stdout.write("Imported %d units with %d workers in %.1f seconds" % (len(results),
+                                                                                 len(worker_stats),
+                                                                                 elapsed))
+
+    def write_profile(self, results):
+        """
+        Print the measurements per phase, summed up over all import units
+        (see ``ImportProfiler``).
+        """
+
+        profile = ImportProfiler.merge([result[6] for result in results if result[6]])
+
+        self.stdout.write("%-12s %6s %10s %10s %8s %8s %8s %8s %8s" % ('phase', 'calls', 'wall s', 'cpu s',
+                                                                       'queries', 'objects', 'created',
+                                                                       'facts', 'new facts'))
+        for (name, phase) in profile['phases'].items():
+            self.stdout.write("%-12s %6d %10.3f %10.3f %8d %8d %8d %8d %8d" % (name,
+                                                                               phase['calls'],
+                                                                               phase['wall_seconds'],
+                                                                               phase['cpu_seconds'],
+                                                                               phase['queries'],
+                                                                               phase['objects'],
+                                                                               phase['created_objects'],
+                                                                               phase['facts'],
+                                                                               phase['new_facts']))
+        self.stdout.write("%-12s %6s %10.3f %10.3f %8d" % ('total', '',
+                                                             profile['wall_seconds'],
+                                                             profile['cpu_seconds'],
+                                                             profile['queries']))
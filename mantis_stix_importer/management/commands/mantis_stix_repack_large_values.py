@@ -0,0 +1,138 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import sys
+import hashlib
+import logging
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, OutputWrapper
+
+import dingos
+
+from mantis_stix_importer import LARGE_VALUE_STORAGE_OPTIONS
+from mantis_stix_importer.storage import ShardedFileSystemStorage, RE_BLOB_FILE_NAME
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Repack the large values stored by DINGOS as flat, uncompressed files
+    ``<hash>.blob`` into the sharded and compressed layout of
+    ``ShardedFileSystemStorage``.
+
+    The options of the target storage are taken from the setting
+    ``MANTIS['LARGE_VALUE_STORAGE_OPTIONS']`` and can be overridden with
+    ``--root`` and ``--compression``. The content of each file is checked against
+    the hash in its name; files that fail the check are left untouched.
+    After the repacking, configure
+    ``MANTIS['LARGE_VALUE_STORAGE'] = 'mantis_stix_importer.storage.ShardedFileSystemStorage'``
+    such that the importer writes new values in the same layout.
+
+    The flat files are kept unless ``--delete`` is given: DINGOS itself
+    reads large values from the flat layout only, so they must stay in place
+    until the setting has been switched (running the command again with
+    ``--delete`` then removes them, since values that have been repacked
+    already are not written again).
+    """
+
+    args = ''
+    help = 'Repack large values stored as flat files into a sharded and compressed layout'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--source',
+                    action='store',
+                    dest='source',
+                    default=None,
+                    help="""Directory with the flat files (default: the DINGOS BLOB_ROOT)."""),
+        make_option('--root',
+                    action='store',
+                    dest='root',
+                    default=None,
+                    help="""Root directory of the sharded storage."""),
+        make_option('--compression',
+                    action='store',
+                    dest='compression',
+                    default=None,
+                    help="""Compression: 'zlib', 'lzma' or 'none'."""),
+        make_option('--delete',
+                    action='store_true',
+                    dest='delete',
+                    default=False,
+                    help="""Delete the flat files after they have been repacked (only after
+                    MANTIS['LARGE_VALUE_STORAGE'] has been switched to the sharded storage)."""),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        # Django replaces stdout when running the command via 'execute';
+        # we set it here such that 'handle' can also be called directly.
+        self.stdout = OutputWrapper(sys.stdout)
+
+    def handle(self, *args, **options):
+
+        source = options.get('source') or dingos.DINGOS_BLOB_ROOT
+
+        if not source or not os.path.isdir(source):
+            raise CommandError("Directory %s with large values not found" % source)
+
+        storage_options = dict(LARGE_VALUE_STORAGE_OPTIONS)
+        if settings.configured and 'MANTIS' in dir(settings):
+            storage_options.update(settings.MANTIS.get('LARGE_VALUE_STORAGE_OPTIONS', {}))
+        if options.get('root'):
+            storage_options['root'] = options['root']
+        if options.get('compression'):
+            storage_options['compression'] = None if options['compression'] == 'none' else options['compression']
+        storage_options.setdefault('root', source)
+
+        storage = ShardedFileSystemStorage(**storage_options)
+
+        counts = {'repacked': 0, 'failed': 0, 'bytes': 0, 'stored_bytes': 0}
+
+        for file_name in os.listdir(source):
+            match = RE_BLOB_FILE_NAME.match(file_name)
+            if not match:
+                continue
+
+            value_hash = match.group('value_hash')
+            path = os.path.join(source, file_name)
+
+            with open(path, 'rb') as blob_file:
+                value = blob_file.read()
+
+            if hashlib.sha256(value).hexdigest() != value_hash:
+                logger.warning("Content of %s does not match its hash: skipping" % path)
+                counts['failed'] += 1
+                continue
+
+            if not storage.exists(value_hash, len(value)):
+                storage.save(value_hash, value)
+            storage.add_to_index(value_hash, len(value))
+
+            counts['repacked'] += 1
+            counts['bytes'] += len(value)
+            counts['stored_bytes'] += os.path.getsize(storage.find(value_hash)[0])
+
+            if options.get('delete'):
+                os.unlink(path)
+
+        self.stdout.write("Repacked %(repacked)d values (%(bytes)d bytes, %(stored_bytes)d bytes stored); "
+                          "%(failed)d files failed the hash check" % counts)
@@ -0,0 +1,276 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import os
+import json
+import time
+import signal
+import logging
+import tempfile
+
+from optparse import make_option
+
+from django.core.management.base import CommandError
+from django.db import close_old_connections
+
+from mantis_stix_importer.management.commands.mantis_stix_import import Command as ImportCommand
+
+logger = logging.getLogger(__name__)
+
+
+class Command(ImportCommand):
+    """
+    Resident import command: the command watches one or more spool
+    directories and imports each file that appears in them with the
+    same ``STIX_Import`` instance. Thus, Django and the importer are set up
+    only once, and the caches of the importer (InfoObject types, fact handler
+    chains, ...) stay warm from one file to the next.
+
+    Files are imported oldest first. A file is only picked up once it has not
+    been modified for ``--settle-time`` seconds; files whose name starts
+    with '.' are ignored, so that a producer can write to a hidden file and
+    rename it when it is complete. After the import, each file is moved to
+    the directory given with ``--destination_path`` (default: subdirectory
+    ``done`` of its spool directory) or, if the import of any document
+    in it failed, to the directory given with ``--failed-path`` (default:
+    subdirectory ``failed``).
+
+    For each file, the command reports the time spent on its import, its
+    latency (time from its last modification to the end of its import) and
+    the number of files still waiting in the spool directories. With
+    ``--status-file``, these figures are also written as JSON to the given
+    file after each import.
+
+    The command runs until it receives SIGINT or SIGTERM (the current import
+    is finished first) or, with ``--once``, until the spool directories are
+    empty. All options of ``mantis_stix_import`` except ``--jobs`` apply.
+    """
+
+    args = 'spool-directory spool-directory ...'
+
+    help = 'Watches spool directories and imports the STIX XML files that appear in them into DINGO'
+
+    option_list = ImportCommand.option_list + (
+        make_option('--failed-path',
+                    action='store',
+                    dest='failed_path',
+                    default=None,
+                    help="""Directory to which files whose import failed are moved
+                    (default: subdirectory 'failed' of the spool directory)."""),
+        make_option('--poll-interval',
+                    action='store',
+                    type='float',
+                    dest='poll_interval',
+                    default=2.0,
+                    help="""Seconds to wait before looking for new files when the spool
+                    directories are empty."""),
+        make_option('--settle-time',
+                    action='store',
+                    type='float',
+                    dest='settle_time',
+                    default=1.0,
+                    help="""Only import files that have not been modified for this
+                    number of seconds."""),
+        make_option('--status-file',
+                    action='store',
+                    dest='status_file',
+                    default=None,
+                    help="""File to which queue depth and latencies are written as JSON
+                    after each import."""),
+        make_option('--once',
+                    action='store_true',
+                    dest='once',
+                    default=False,
+                    help="""Import the files currently in the spool directories and exit."""),
+    )
+
+    def handle(self, *args, **options):
+
+        if not args:
+            raise CommandError("No spool directories specified")
+
+        spool_dirs = []
+        for arg in args:
+            if not os.path.isdir(arg):
+                raise CommandError("Spool directory %s not found" % arg)
+            spool_dirs.append(os.path.abspath(arg))
+
+        markings = self.collect_markings(args, options)
+
+        import_options = dict((key, value) for (key, value) in options.items()
+                              if not key in ['marking_ids', 'jobs', 'destination_path', 'failed_path',
+                                             'poll_interval', 'settle_time', 'status_file', 'once'])
+
+        self.stopping = False
+
+        self.unmovable = set()
+
+        if not options.get('once'):
+            for signal_number in [signal.SIGINT, signal.SIGTERM]:
+                signal.signal(signal_number, self.stop)
+
+        self.status = {'started': time.time(),
+                       'queue_depth': 0,
+                       'imported': 0,
+                       'failed': 0,
+                       'last_file': None,
+                       'last_seconds': None,
+                       'last_latency': None,
+                       'mean_latency': None,
+                       'max_latency': None}
+
+        logger.info("Watching spool directories %s" % ', '.join(spool_dirs))
+
+        while not self.stopping:
+
+            pending = self.pending_files(spool_dirs, options.get('settle_time') or 0)
+
+            self.status['queue_depth'] = len(pending)
+
+            if not pending:
+                if options.get('once'):
+                    break
+                time.sleep(options.get('poll_interval') or 0)
+                continue
+
+            for (index, (mtime, path, spool_dir)) in enumerate(pending):
+                if self.stopping:
+                    break
+                self.status['queue_depth'] = len(pending) - index - 1
+                self.process_file(path, spool_dir, mtime, markings, import_options, options)
+
+        self.write_status(options.get('status_file'))
+
+        self.stdout.write("Imported %(imported)d files, %(failed)d failed" % self.status)
+
+    def stop(self, signal_number, frame):
+        logger.info("Received signal %d: stopping after the current import" % signal_number)
+        self.stopping = True
+
+    def pending_files(self, spool_dirs, settle_time):
+        """
+        Return the files waiting for import as list of triples
+        (modification time, path, spool directory), oldest first.
+        """
+
+        now = time.time()
+        pending = []
+
+        for spool_dir in spool_dirs:
+            for file_name in os.listdir(spool_dir):
+                if file_name.startswith('.'):
+                    continue
+                path = os.path.join(spool_dir, file_name)
+                if path in self.unmovable:
+                    continue
+                try:
+                    if not os.path.isfile(path):
+                        continue
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    # The file has been removed in the meantime
+                    continue
+                if now - mtime < settle_time:
+                    continue
+                pending.append((mtime, path, spool_dir))
+
+        pending.sort()
+
+        return pending
+
+    def process_file(self, path, spool_dir, mtime, markings, import_options, options):
+        """
+        Import a file from a spool directory and move it to the directory
+        for done or failed files.
+        """
+
+        # The database connection may have timed out while we were waiting
+        # for files.
+
+        close_old_connections()
+
+        start = time.time()
+
+        results = self.import_file(path, markings, import_options)
+
+        end = time.time()
+
+        success = bool(results) and all([result[4] for result in results])
+
+        if success:
+            target_dir = options.get('destination_path') or os.path.join(spool_dir, 'done')
+            self.status['imported'] += 1
+        else:
+            target_dir = options.get('failed_path') or os.path.join(spool_dir, 'failed')
+            self.status['failed'] += 1
+
+        self.move_file(path, target_dir)
+
+        latency = end - mtime
+        count = self.status['imported'] + self.status['failed']
+
+        self.status['last_file'] = path
+        self.status['last_seconds'] = end - start
+        self.status['last_latency'] = latency
+        self.status['mean_latency'] = ((self.status['mean_latency'] or 0) * (count - 1) + latency) / count
+        self.status['max_latency'] = max(self.status['max_latency'] or 0, latency)
+
+        self.stdout.write("%s %s: %d units in %.2f seconds, latency %.2f seconds, queue depth %d" % (
+            'Imported' if success else 'Failed to import',
+            path,
+            len(results),
+            end - start,
+            latency,
+            self.status['queue_depth']))
+
+        self.write_status(options.get('status_file'))
+
+    def move_file(self, path, target_dir):
+        """
+        Move a file to the given directory; an existing file of the same
+        name is not overwritten.
+        """
+
+        try:
+            if not os.path.isdir(target_dir):
+                os.makedirs(target_dir)
+            target = os.path.join(target_dir, os.path.basename(path))
+            if os.path.exists(target):
+                target = "%s.%d" % (target, int(time.time() * 1000))
+            os.rename(path, target)
+        except Exception:
+            # We must not import the file again and again
+            logger.exception("Could not move file %s to %s; ignoring it from now on" % (path, target_dir))
+            self.unmovable.add(path)
+
+    def write_status(self, status_file):
+        """
+        Write the status of the command as JSON to the given file (replacing
+        the file atomically, such that readers never see a partial status).
+        """
+
+        if not status_file:
+            return
+
+        status = dict(self.status)
+        status['updated'] = time.time()
+
+        (handle, temp_path) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(status_file)),
+                                               prefix='.status')
+        with os.fdopen(handle, 'w') as temp_file:
+            json.dump(status, temp_file, indent=2, sort_keys=True)
+        os.rename(temp_path, status_file)
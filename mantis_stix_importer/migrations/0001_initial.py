@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'ImportLedgerEntry'
+        db.create_table(u'mantis_stix_importer_importledgerentry', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('content_hash', self.gf('django.db.models.fields.CharField')(max_length=64)),
+            ('default_timestamp', self.gf('django.db.models.fields.DateTimeField')()),
+            ('import_timestamp', self.gf('django.db.models.fields.DateTimeField')(auto_now_add=True, blank=True)),
+            ('filename', self.gf('django.db.models.fields.CharField')(max_length=255, blank=True)),
+        ))
+        db.send_create_signal(u'mantis_stix_importer', ['ImportLedgerEntry'])
+
+        # Adding unique constraint on 'ImportLedgerEntry', fields ['content_hash', 'default_timestamp']
+        db.create_unique(u'mantis_stix_importer_importledgerentry', ['content_hash', 'default_timestamp'])
+
+
+    def backwards(self, orm):
+        # Removing unique constraint on 'ImportLedgerEntry', fields ['content_hash', 'default_timestamp']
+        db.delete_unique(u'mantis_stix_importer_importledgerentry', ['content_hash', 'default_timestamp'])
+
+        # Deleting model 'ImportLedgerEntry'
+        db.delete_table(u'mantis_stix_importer_importledgerentry')
+
+
+    models = {
+        u'mantis_stix_importer.importledgerentry': {
+            'Meta': {'unique_together': "(('content_hash', 'default_timestamp'),)", 'object_name': 'ImportLedgerEntry'},
+            'content_hash': ('django.db.models.fields.CharField', [], {'max_length': '64'}),
+            'default_timestamp': ('django.db.models.fields.DateTimeField', [], {}),
+            'filename': ('django.db.models.fields.CharField', [], {'max_length': '255', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'import_timestamp': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['mantis_stix_importer']
\ No newline at end of file
@@ -16,6 +16,7 @@
 #
 
 from django.conf import settings
+from django.db import models
 
 from mantis_stix_importer import RAW_DATA_TO_DB_FOR_LENGTH_LESS_THAN
 
@@ -25,3 +26,96 @@ if settings.configured and 'MANTIS' in dir(settings):
 
 
 
+class ImportLedgerEntry(models.Model):
+    """
+    Record of content that has been imported: the import of content with
+    the same hash, the same default timestamp (which is given
+    to objects for which the content provides no timestamp), the same
+    markings and the same default identifier namespace would not change
+    anything in the database and can therefore be skipped.
+    """
+
+    content_hash = models.CharField(max_length=64)
+
+    default_timestamp = models.DateTimeField()
+
+    # Digest of the other arguments of the import that change its result
+    # (markings and default identifier namespace, see
+    # ``STIX_Import.import_options_digest``); empty if there were none
+
+    options_digest = models.CharField(max_length=64, blank=True, default='')
+
+    import_timestamp = models.DateTimeField(auto_now_add=True)
+
+    # Name of the imported file (for information only)
+
+    filename = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        unique_together = ('content_hash', 'default_timestamp', 'options_digest')
+
+
+class InfoObjectFingerprint(models.Model):
+    """
+    Fingerprint of the content from which the facts of an InfoObject
+    have been created (see ``STIX_Import.object_fingerprint``): a new revision
+    of an object whose content is unchanged can be created by copying the
+    facts of an existing revision rather than deriving them again.
+    """
+
+    iobject = models.OneToOneField('dingos.InfoObject', related_name='stix_fingerprint')
+
+    fingerprint = models.CharField(max_length=64, db_index=True)
+
+
+class LargeValueIndexEntry(models.Model):
+    """
+    Index of the large values stored by a storage backend such as
+    ``mantis_stix_importer.storage.ShardedFileSystemStorage``: the
+    SHA256 hash of the value, its size (uncompressed) and the compression
+    with which it was stored.
+    """
+
+    value_hash = models.CharField(max_length=64, unique=True)
+
+    size = models.BigIntegerField()
+
+    compression = models.CharField(max_length=8, blank=True)
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of an import of content that has not been completed (see
+    ``mantis_stix_importer.importer.ImportCheckpointer``): the position of
+    the last object whose import has been committed. If the import fails,
+    importing the same content with the same default timestamp (and
+    the same markings etc., see ``ImportLedgerEntry``) again resumes after
+    this object.
+    """
+
+    content_hash = models.CharField(max_length=64)
+
+    default_timestamp = models.DateTimeField()
+
+    # As for the ImportLedgerEntry
+
+    options_digest = models.CharField(max_length=64, blank=True, default='')
+
+    # Position of the object: number of the top-level component (the
+    # streaming import imports the objects of each component in turn),
+    # queue ('import_first' or 'pending') and position within the queue
+
+    component = models.IntegerField()
+
+    queue = models.CharField(max_length=16)
+
+    position = models.IntegerField()
+
+    updated = models.DateTimeField(auto_now=True)
+
+    # Name of the imported file (for information only)
+
+    filename = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        unique_together = ('content_hash', 'default_timestamp', 'options_digest')
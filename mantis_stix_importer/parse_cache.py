@@ -0,0 +1,229 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+On-disk cache of the results of the DINGOS XML importer, such that a
+document that is imported again (e.g., with another default timestamp,
+after a failed import or with ``force``) is neither parsed nor are its
+objects extracted a second time (see ``STIX_Import.xml_dom_import``).
+
+An entry contains what ``MantisImporter.xml_import`` returns for a
+document (id and revision info, element name and dictionary representation
+of the top-level element, the embedded objects and the unprocessed content,
+the latter serialized with ``standalone_xml``) plus the namespace mapping
+of the document. Entries are keyed by the SHA256 hash of the content and
+the version of the importer, since a new version may extract differently;
+they are stored as zlib-compressed pickles (protocol 2) in one file each.
+
+The cache is bounded by the total size of its files: when an entry is
+added, the least recently used entries are removed until the cache fits.
+
+Which directory is used is configured with the setting
+``MANTIS['PARSE_CACHE_DIR']`` (default: no cache) or for each import
+(``parse_cache`` for ``xml_import``, ``--parse-cache`` for the command
+``mantis_stix_import``); the size bound is configured with
+``MANTIS['PARSE_CACHE_MAX_BYTES']``. Since the entries are pickles,
+only the importer must be able to write to the directory.
+"""
+
+import os
+import re
+import zlib
+import errno
+import logging
+import tempfile
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from django.conf import settings
+
+from mantis_stix_importer import __version__, PARSE_CACHE_DIR, PARSE_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+# Entries start with this tag, followed by the compressed pickle
+
+PARSE_CACHE_MAGIC = b'MSPC1\n'
+
+RE_ENTRY_FILE_NAME = re.compile(r"^[0-9a-f]{64}-.+\.parsed$")
+
+
+def get_parse_cache(location=None):
+    """
+    Return the parse cache in the given directory (default: the directory
+    configured in the MANTIS settings) or None if no directory is configured.
+    """
+
+    max_bytes = PARSE_CACHE_MAX_BYTES
+
+    if settings.configured and 'MANTIS' in dir(settings):
+        location = location or settings.MANTIS.get('PARSE_CACHE_DIR')
+        max_bytes = settings.MANTIS.get('PARSE_CACHE_MAX_BYTES', max_bytes)
+
+    location = location or PARSE_CACHE_DIR
+
+    if not location:
+        return None
+
+    return ParseCache(location, max_bytes=max_bytes)
+
+
+class ParseCache(object):
+    """
+    Cache of extraction results in the given directory (see the module documentation).
+    """
+
+    def __init__(self, location, max_bytes=PARSE_CACHE_MAX_BYTES, version=__version__):
+        self.location = location
+        self.max_bytes = max_bytes
+        self.version = version
+
+    def path(self, content_hash):
+        return os.path.join(self.location, "%s-%s.parsed" % (content_hash, self.version))
+
+    def load(self, content_hash):
+        """
+        Return the entry for the content with the given hash, or None if there
+        is none (or it cannot be read).
+        """
+
+        path = self.path(content_hash)
+
+        try:
+            with open(path, 'rb') as entry_file:
+                data = entry_file.read()
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                logger.warning("Could not read parse cache entry %s: %s" % (path, e))
+            return None
+
+        try:
+            if not data.startswith(PARSE_CACHE_MAGIC):
+                raise ValueError("Not a parse cache entry")
+            entry = pickle.loads(zlib.decompress(data[len(PARSE_CACHE_MAGIC):]))
+        except Exception as e:
+            # A damaged entry (e.g., after a full disk) is removed, such that
+            # it is replaced by the import of the content.
+            logger.warning("Removing damaged parse cache entry %s: %s" % (path, e))
+            self.remove(path)
+            return None
+
+        # The modification time marks the entry as recently used (see evict)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        return entry
+
+    def save(self, content_hash, entry):
+        """
+        Store the entry for the content with the given hash. Failures are
+        logged only: the cache is an optimization.
+        """
+
+        try:
+            data = PARSE_CACHE_MAGIC + zlib.compress(pickle.dumps(entry, 2))
+        except Exception as e:
+            logger.warning("Could not serialize parse result of %s: %s" % (content_hash, e))
+            return False
+
+        if len(data) > self.max_bytes:
+            return False
+
+        try:
+            if not os.path.isdir(self.location):
+                os.makedirs(self.location)
+
+            # Written to a temporary file first and renamed, such that imports
+            # in other threads or processes never read a partial entry
+
+            (handle, temp_path) = tempfile.mkstemp(dir=self.location, suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'wb') as temp_file:
+                    temp_file.write(data)
+                os.rename(temp_path, self.path(content_hash))
+            except:
+                self.remove(temp_path)
+                raise
+        except (IOError, OSError) as e:
+            logger.warning("Could not write parse cache entry for %s: %s" % (content_hash, e))
+            return False
+
+        self.evict()
+
+        return True
+
+    def entries(self):
+        """
+        Return a list of triples (modification time, size, path) of the
+        entries of the cache.
+        """
+
+        result = []
+
+        try:
+            file_names = os.listdir(self.location)
+        except OSError:
+            return result
+
+        for file_name in file_names:
+            if not RE_ENTRY_FILE_NAME.match(file_name):
+                continue
+            path = os.path.join(self.location, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed by another import in the meantime
+                continue
+            result.append((stat.st_mtime, stat.st_size, path))
+
+        return result
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits into
+        ``max_bytes``; returns the number of removed entries.
+        """
+
+        entries = self.entries()
+        total = sum(size for (mtime, size, path) in entries)
+
+        removed = 0
+
+        for (mtime, size, path) in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+            removed += 1
+
+        return removed
+
+    def clear(self):
+        for (mtime, size, path) in self.entries():
+            self.remove(path)
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,98 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Snapshots of the number of rows per model, for finding out what an import
+has added to the database.
+
+A snapshot is taken with one query per model and does not load any rows:
+
+- method ``count`` counts the rows of each table (``SELECT COUNT(*)``);
+- method ``max_id`` takes the largest primary key of each table
+  (``SELECT MAX(id)``), which the database answers from the index of the
+  primary key even for very large tables. The difference of two such
+  snapshots is the number of rows inserted in between, provided that
+  rows are not deleted in between.
+
+Snapshots are lists of pairs ``(model name, number)``, sorted by model name;
+``snapshot_delta`` computes the difference of two snapshots. See the command
+``mantis_stix_db_snapshot`` for taking and comparing snapshots from the
+command line.
+"""
+
+from django.db.models import Max
+
+from dingos.models import dingos_class_map
+
+from mantis_stix_importer.models import ImportLedgerEntry, InfoObjectFingerprint, LargeValueIndexEntry, \
+    ImportCheckpoint
+
+
+SNAPSHOT_METHODS = ['count', 'max_id']
+
+IMPORTER_MODELS = [ImportLedgerEntry, InfoObjectFingerprint, LargeValueIndexEntry, ImportCheckpoint]
+
+
+def snapshot_models(include_importer_models=False):
+    """
+    Return a dictionary that maps model names to the models covered by a snapshot:
+    the DINGOS models and, if requested, the models of the STIX importer.
+    """
+    models = dict(dingos_class_map)
+    if include_importer_models:
+        for model in IMPORTER_MODELS:
+            models[model._meta.object_name] = model
+    return models
+
+
+def take_snapshot(method='count', models=None):
+    """
+    Return a snapshot of the given models (a dictionary as returned by
+    ``snapshot_models``; default: the DINGOS models) as list of pairs
+    ``(model name, number)``.
+    """
+
+    if not method in SNAPSHOT_METHODS:
+        raise StandardError("Unknown snapshot method %s" % method)
+
+    if models is None:
+        models = snapshot_models()
+
+    result = []
+    for model_name in sorted(models.keys()):
+        model = models[model_name]
+        if method == 'count':
+            number = model.objects.count()
+        else:
+            number = model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0
+        result.append((model_name, number))
+
+    return result
+
+
+def snapshot_delta(snapshot1, snapshot2):
+    """
+    Return the difference between two snapshots as list of pairs
+    ``(model name, difference)`` for the models whose number has changed.
+    """
+    numbers1 = dict(snapshot1)
+    result = []
+    for (model_name, number) in snapshot2:
+        difference = number - numbers1.get(model_name, 0)
+        if difference != 0:
+            result.append((model_name, difference))
+    return result
@@ -0,0 +1,207 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Input sources for the import: an ``ImportSource`` is a single XML document
+that is imported as one unit, i.e., with one call of ``STIX_Import.xml_import``.
+
+A file on disk may contain one such document (plain XML, or XML compressed
+with gzip or bzip2) or many (zip and tar archives, where each member is a
+document of its own). ``iter_import_sources`` yields the documents contained
+in a file; their content is read directly from the compressed file or archive
+without extracting it to a temporary file.
+"""
+
+import os
+import bz2
+import gzip
+import hashlib
+import tarfile
+import zipfile
+
+from mantis_stix_importer import STREAMING_READ_BLOCK_SIZE
+
+
+# File name suffixes of the supported containers. Files with any
+# other suffix are treated as plain XML.
+
+GZIP_SUFFIXES = ('.gz',)
+BZIP2_SUFFIXES = ('.bz2',)
+ZIP_SUFFIXES = ('.zip',)
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz', '.tbz2')
+
+# Uncompressed tar archives can be read at any position; in compressed
+# ones, going back means decompressing the archive again from its start.
+
+UNCOMPRESSED_TAR_SUFFIXES = ('.tar',)
+
+
+class HashingReader(object):
+    """
+    Wrapper around a file-like object that computes the SHA256 and MD5
+    hashes of the content while it is read. Once the content has been
+    read up to its end, the hashes are stored in the ``ImportSource``.
+    """
+
+    def __init__(self, stream, source):
+        self.stream = stream
+        self.source = source
+        self.sha256 = hashlib.sha256()
+        self.md5 = hashlib.md5()
+        self.length = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if data:
+            self.sha256.update(data)
+            self.md5.update(data)
+            self.length += len(data)
+        elif size != 0:
+            # End of the content
+            self.source.sha256 = self.sha256.hexdigest()
+            self.source.md5 = self.md5.hexdigest()
+            self.source.length = self.length
+        return data
+
+    def close(self):
+        self.stream.close()
+
+
+class ImportSource(object):
+    """
+    A single XML document to be imported.
+
+    - ``name`` is used for reporting the import (e.g., ``bundle.zip!feed/1.xml``
+      for a member of an archive).
+    - ``filename`` is the file on disk that contains the document.
+    - ``path`` is set if the document is a plain, uncompressed file; such a
+      file can be memory-mapped or passed on to libxml2 by name.
+    - ``size`` is the uncompressed size of the document, if it is known
+      without reading the document (otherwise, the size of the file).
+    - ``rewindable`` tells whether the document can be read a second time
+      without much effort.
+
+    The SHA256 and MD5 hashes and the length of the content are available as
+    ``sha256``, ``md5`` and ``length`` once the document has been read up to its
+    end through ``open``.
+    """
+
+    def __init__(self, name, opener=None, filename=None, path=None, size=None, rewindable=True):
+        self.name = name
+        self.opener = opener
+        self.filename = filename or path
+        self.path = path
+        self.size = size
+        self.rewindable = rewindable
+        self.sha256 = None
+        self.md5 = None
+        self.length = None
+
+    def __repr__(self):
+        return "<ImportSource %s>" % self.name
+
+    def open(self):
+        """
+        Return a file-like object from which the document can be read.
+        """
+        if self.path:
+            stream = open(self.path, 'rb')
+        else:
+            stream = self.opener()
+        return HashingReader(stream, self)
+
+    def read_through(self):
+        """
+        Read the document once (without keeping its content) such that
+        the hashes of its content are known.
+        """
+        stream = self.open()
+        try:
+            while stream.read(STREAMING_READ_BLOCK_SIZE):
+                pass
+        finally:
+            stream.close()
+
+
+def has_suffix(filename, suffixes):
+    return filename.lower().endswith(suffixes)
+
+
+def is_archive(filename):
+    """
+    Does the file contain several documents (rather than one)?
+    """
+    return has_suffix(filename, ZIP_SUFFIXES + TAR_SUFFIXES)
+
+
+def open_import_source(filename):
+    """
+    Return the ``ImportSource`` for a file that contains a single document:
+    plain XML or XML compressed with gzip or bzip2.
+    """
+
+    if is_archive(filename):
+        raise StandardError("%s is an archive that may contain several documents" % filename)
+
+    size = os.path.getsize(filename)
+
+    if has_suffix(filename, GZIP_SUFFIXES):
+        return ImportSource(filename, lambda: gzip.GzipFile(filename, 'rb'), filename=filename, size=size)
+    elif has_suffix(filename, BZIP2_SUFFIXES):
+        return ImportSource(filename, lambda: bz2.BZ2File(filename, 'rb'), filename=filename, size=size)
+    else:
+        return ImportSource(filename, path=filename, size=size)
+
+
+def iter_import_sources(filename):
+    """
+    Yield an ``ImportSource`` for each document contained in the given file.
+
+    Archives are kept open while their members are yielded; a member must
+    therefore be imported before the next one is requested.
+    """
+
+    if has_suffix(filename, ZIP_SUFFIXES):
+        archive = zipfile.ZipFile(filename, 'r')
+        try:
+            for info in archive.infolist():
+                if info.filename.endswith('/'):
+                    continue
+                yield ImportSource('%s!%s' % (filename, info.filename),
+                                   (lambda info: lambda: archive.open(info, 'r'))(info),
+                                   filename=filename,
+                                   size=info.file_size)
+        finally:
+            archive.close()
+
+    elif has_suffix(filename, TAR_SUFFIXES):
+        archive = tarfile.open(filename, 'r:*')
+        rewindable = has_suffix(filename, UNCOMPRESSED_TAR_SUFFIXES)
+        try:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                yield ImportSource('%s!%s' % (filename, info.name),
+                                   (lambda info: lambda: archive.extractfile(info))(info),
+                                   filename=filename,
+                                   size=info.size,
+                                   rewindable=rewindable)
+        finally:
+            archive.close()
+
+    else:
+        yield open_import_source(filename)
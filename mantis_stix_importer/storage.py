@@ -0,0 +1,229 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Storage backends for large values (e.g., the contents of ``Raw_Header``
+or ``Raw_Artifact`` elements) that are written to the file system rather
+than to the database (see ``STIX_Import.cybox_RAW_ft_handler``).
+
+Values are addressed by the SHA256 hash of their content. A backend
+implements the following methods:
+
+- ``exists(value_hash, size)``: is the value with the given hash
+  and (uncompressed) size stored completely?
+- ``save(value_hash, value)``: store the value. This method may be called
+  from a background thread (see ``LargeValueWriter``) and therefore must
+  only access the file system, not the database.
+- ``read(value_hash)``: return the value
+- ``delete(value_hash)``
+- ``add_to_index(value_hash, size)``: record the value in the index of
+  the backend (if any). This method is called in the thread of the import.
+
+Which backend is used is configured with the setting
+``MANTIS['LARGE_VALUE_STORAGE']`` (dotted path of the backend class) and
+``MANTIS['LARGE_VALUE_STORAGE_OPTIONS']`` (keyword arguments for the
+backend class); see ``get_large_value_storage``.
+"""
+
+import os
+import re
+import zlib
+import errno
+import tempfile
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.utils.module_loading import import_by_path
+
+import dingos
+
+from mantis_stix_importer import LARGE_VALUE_STORAGE, LARGE_VALUE_STORAGE_OPTIONS
+
+from mantis_stix_importer.models import LargeValueIndexEntry
+
+
+RE_BLOB_FILE_NAME = re.compile(r"^(?P<value_hash>[0-9a-f]{64})\.blob$")
+
+
+def get_large_value_storage():
+    """
+    Return an instance of the configured storage backend for large values.
+    """
+
+    storage_class = LARGE_VALUE_STORAGE
+    storage_options = LARGE_VALUE_STORAGE_OPTIONS
+
+    if settings.configured and 'MANTIS' in dir(settings):
+        storage_class = settings.MANTIS.get('LARGE_VALUE_STORAGE', storage_class)
+        storage_options = settings.MANTIS.get('LARGE_VALUE_STORAGE_OPTIONS', storage_options)
+
+    return import_by_path(storage_class)(**storage_options)
+
+
+class DingosBlobStorage(object):
+    """
+    The flat layout used by DINGOS' ``write_large_value``: each value is stored
+    uncompressed as file ``<hash>.blob`` in the DINGOS blob storage.
+    """
+
+    def exists(self, value_hash, size):
+        # A file of the wrong size is a leftover of an interrupted write
+        file_name = '%s.blob' % value_hash
+        return (dingos.DINGOS_BLOB_STORAGE.exists(file_name)
+                and dingos.DINGOS_BLOB_STORAGE.size(file_name) == size)
+
+    def save(self, value_hash, value):
+        file_name = '%s.blob' % value_hash
+        if dingos.DINGOS_BLOB_STORAGE.exists(file_name):
+            dingos.DINGOS_BLOB_STORAGE.delete(file_name)
+        dingos.DINGOS_BLOB_STORAGE.save(file_name, ContentFile(value))
+
+    def read(self, value_hash):
+        blob_file = dingos.DINGOS_BLOB_STORAGE.open('%s.blob' % value_hash)
+        try:
+            return blob_file.read()
+        finally:
+            blob_file.close()
+
+    def delete(self, value_hash):
+        dingos.DINGOS_BLOB_STORAGE.delete('%s.blob' % value_hash)
+
+    def add_to_index(self, value_hash, size):
+        pass
+
+
+class ShardedFileSystemStorage(object):
+    """
+    Reference implementation of a storage backend for large values in the
+    local file system:
+
+    - Files are distributed over nested directories named by prefixes of
+      the hash: with the default ``shard_levels=2`` and ``shard_width=2``,
+      the value with hash ``abcdef...`` is stored in ``<root>/ab/cd/``.
+      Thus, no directory holds more than a few thousand files even for
+      hundreds of millions of values.
+    - Values are compressed with ``zlib`` (default), ``lzma`` (requires
+      the ``lzma`` module, i.e., Python 3 or ``backports.lzma``) or not at all
+      (``compression=None``); the compression is reflected in the file extension,
+      so that values stored with different compressions can be read.
+    - Files are written to a temporary file and renamed, so that a
+      file that exists is complete.
+    - Hash, uncompressed size and compression of each value are recorded
+      in the index (model ``LargeValueIndexEntry``).
+
+    If no root directory is given, the DINGOS blob root is used.
+    """
+
+    EXTENSIONS = {None: '.blob',
+                  'zlib': '.blob.zz',
+                  'lzma': '.blob.xz'}
+
+    def __init__(self, root=None, compression='zlib', compression_level=6, shard_levels=2, shard_width=2):
+        if not compression in self.EXTENSIONS:
+            raise ImproperlyConfigured("Unknown compression '%s' for large values" % compression)
+        if compression == 'lzma' and not lzma:
+            raise ImproperlyConfigured("Compression of large values with lzma requires the lzma module")
+
+        self.root = root or dingos.DINGOS_BLOB_ROOT
+        if not self.root:
+            raise ImproperlyConfigured("No directory for storing large values: "
+                                       "please configure the DINGOS BLOB_ROOT")
+        self.compression = compression
+        self.compression_level = compression_level
+        self.shard_levels = shard_levels
+        self.shard_width = shard_width
+
+    def directory(self, value_hash):
+        return os.path.join(self.root, *[value_hash[i * self.shard_width:(i + 1) * self.shard_width]
+                                         for i in range(self.shard_levels)])
+
+    def path(self, value_hash, compression):
+        return os.path.join(self.directory(value_hash), value_hash + self.EXTENSIONS[compression])
+
+    def compress(self, value):
+        if self.compression == 'zlib':
+            return zlib.compress(value, self.compression_level)
+        elif self.compression == 'lzma':
+            return lzma.compress(value, preset=self.compression_level)
+        return value
+
+    def decompress(self, data, compression):
+        if compression == 'zlib':
+            return zlib.decompress(data)
+        elif compression == 'lzma':
+            if not lzma:
+                raise ImproperlyConfigured("Reading large values compressed with lzma requires the lzma module")
+            return lzma.decompress(data)
+        return data
+
+    def find(self, value_hash):
+        """
+        Return the path and compression of the stored value (or (None, None)).
+        """
+        for compression in [self.compression] + [c for c in self.EXTENSIONS.keys() if c != self.compression]:
+            path = self.path(value_hash, compression)
+            if os.path.exists(path):
+                return (path, compression)
+        return (None, None)
+
+    def exists(self, value_hash, size):
+        return self.find(value_hash)[0] is not None
+
+    def save(self, value_hash, value):
+        directory = self.directory(value_hash)
+
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            # Another thread or process may have created the directory
+            if e.errno != errno.EEXIST:
+                raise
+
+        (handle, temp_path) = tempfile.mkstemp(dir=directory, prefix='.%s' % value_hash[:16])
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                temp_file.write(self.compress(value))
+            os.rename(temp_path, self.path(value_hash, self.compression))
+        except:
+            os.unlink(temp_path)
+            raise
+
+    def read(self, value_hash):
+        (path, compression) = self.find(value_hash)
+        if not path:
+            raise IOError("Large value %s not found in %s" % (value_hash, self.root))
+        with open(path, 'rb') as blob_file:
+            return self.decompress(blob_file.read(), compression)
+
+    def delete(self, value_hash):
+        (path, compression) = self.find(value_hash)
+        if path:
+            os.unlink(path)
+
+    def add_to_index(self, value_hash, size):
+        LargeValueIndexEntry.objects.get_or_create(value_hash=value_hash,
+                                                   defaults={'size': size,
+                                                             'compression': self.compression or ''})
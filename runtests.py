@@ -17,6 +17,7 @@ try:
             "django.contrib.auth",
             "django.contrib.contenttypes",
             "django.contrib.sites",
+            "dingos",
             "mantis_stix_importer",
         ],
         SITE_ID=1,
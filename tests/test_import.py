@@ -13,10 +13,25 @@ from utils import deltaCalc
 
 from django import test
 
-from mantis_stix_importer.management.commands.mantis_stix_import import Command
+from django.db import connection
+
+from django.test.utils import CaptureQueriesContext
+
+from mantis_stix_importer.management.commands.mantis_stix_import import Command, schedule_import_jobs
+
+from mantis_stix_importer.importer import STIX_Import
+
+from mantis_stix_importer.models import ImportLedgerEntry
+
+from dingos.core.datastructures import DingoObjDict
 
 from custom_test_runner import CustomSettingsTestCase
 
+import os
+import re
+import json
+import shutil
+import tempfile
 import pprint
 
 pp = pprint.PrettyPrinter(indent=2)
@@ -81,10 +96,33 @@ class XML_Import_Tests(CustomSettingsTestCase):
 
         self.assertEqual(delta,expected)
 
+        # The import above has not been skipped, since the content had been
+        # imported with markings before (see test_import_ledger). Importing it
+        # again without markings is skipped, because the import ledger records
+        # that the content has already been imported with this default timestamp.
+        # Forcing the import must not change anything either.
+
+        self.assertEqual(ImportLedgerEntry.objects.count(), 2)
+
+        (delta,result) = t_import('tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                  default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+
+        self.assertEqual(delta,expected)
+        self.assertTrue(self.command.Importer.context.skipped)
+
+        (delta,result) = t_import('tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                  default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                  force=True)
+
+        self.assertEqual(delta,expected)
+        self.assertEqual(ImportLedgerEntry.objects.count(), 2)
+
 
         # If we import with a later date, all that is added to the database
         # are entries in the InfoObject-table and the InfoObject2Fact-table:
         # all the facts and values were unchanged and are not duplicated.
+        # (Since the content of the objects is unchanged, the links to the
+        # facts are copied from the existing revisions.)
 
         (delta,result) = t_import('tests/testdata/xml/STIX_Phishing_Indicator.xml',
                                   default_timestamp = '2013-02-26 14:11:33.253370+00:00')
@@ -100,4 +138,1258 @@ class XML_Import_Tests(CustomSettingsTestCase):
 
         self.assertEqual(delta,expected)
 
+    def test_import_ledger(self):
+
+        # Content is skipped only if it has been imported with the same default
+        # timestamp, the same markings and the same default identifier namespace;
+        # the same holds for resuming a failed import.
+
+        from dingos.models import InfoObject
+        from mantis_stix_importer.models import ImportCheckpoint
+
+        importer = STIX_Import()
+
+        kwargs = dict(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                      default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+
+        importer.xml_import(**kwargs)
+
+        marking = InfoObject.objects.filter(iobject_type__name='Marking').order_by('pk')[0]
+
+        for (import_kwargs, skipped) in [({}, True),
+                                         ({'markings': [marking]}, False),
+                                         ({'markings': [marking]}, True),
+                                         ({'identifier_ns_uri': 'http://example.com'}, False),
+                                         ({'identifier_ns_uri': 'http://example.com'}, True)]:
+            importer.xml_import(**dict(kwargs, **import_kwargs))
+            self.assertEqual(importer.context.skipped, skipped)
+
+        self.assertEqual(ImportLedgerEntry.objects.count(), 3)
+
+        # A checkpoint left by an import without markings is not used by
+        # an import with markings
+
+        kwargs['default_timestamp'] = '2013-02-26 14:11:33.253370+00:00'
+
+        ImportCheckpoint.objects.create(content_hash=ImportLedgerEntry.objects.all()[0].content_hash,
+                                        default_timestamp=kwargs['default_timestamp'],
+                                        component=0, queue='pending', position=1000)
+
+        importer.xml_import(markings=[marking], **kwargs)
+
+        self.assertEqual(importer.context.checkpointer.skipped, 0)
+        self.assertEqual(ImportCheckpoint.objects.filter(options_digest='').count(), 1)
+
+        # The command creates a new marking object from --marking_json for each
+        # run; markings count as the same if their content is the same.
+
+        for (source, skipped) in [('Example_import', False),
+                                  ('Example_import', True),
+                                  ('Other_import', False)]:
+            self.command.handle('tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                placeholder_fillers=[('source', source)],
+                                marking_json='tests/testdata/markings/import_info.json',
+                                default_timestamp = '2013-02-26 15:11:33.253370+00:00')
+            self.assertEqual(self.command.Importer.context.skipped, skipped)
+
+    def test_streaming_import(self):
+
+        # The streaming import must yield the same objects as the
+        # DOM-based import.
+
+        @deltaCalc
+        def t_import(*args,**kwargs):
+            return self.command.handle(*args,**kwargs)
+
+        (delta,result) = t_import('tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                  placeholder_fillers=[('source', 'Example_import')],
+                                  identifier_ns_uri=None,
+                                  marking_json='tests/testdata/markings/import_info.json',
+                                  default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                  streaming=True)
+
+        expected = [ ('DataTypeNameSpace', 22),
+                     ('Fact', 83),
+                     ('FactDataType', 16),
+                     ('FactTerm', 52),
+                     ('FactTerm2Type', 56),
+                     ('FactTermNamespaceMap', 46),
+                     ('FactValue', 70),
+                     ('Identifier', 18),
+                     ('IdentifierNameSpace', 2),
+                     ('InfoObject', 18),
+                     ('InfoObject2Fact', 100),
+                     ('InfoObjectFamily', 4),
+                     ('InfoObjectType', 10),
+                     ('Marking2X', 15),
+                     ('NodeID', 49),
+                     ('PositionalNamespace', 93),
+                     ('Revision', 4)]
+
+        self.assertEqual(delta,expected)
+
+    def test_compressed_import(self):
+
+        # Compressed files and members of archives are imported without
+        # extracting them; the result is the same as for the plain file.
+
+        import gzip
+        import tarfile
+        import zipfile
+        from mantis_stix_importer.sources import iter_import_sources
+
+        @deltaCalc
+        def t_import(*args,**kwargs):
+            return self.command.handle(*args,**kwargs)
+
+        xml_file = 'tests/testdata/xml/STIX_Phishing_Indicator.xml'
+
+        with open(xml_file, 'rb') as content_file:
+            content = content_file.read()
+
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            gz_file = os.path.join(tmp_dir, 'phishing.xml.gz')
+            gz = gzip.open(gz_file, 'wb')
+            gz.write(content)
+            gz.close()
+
+            zip_file = os.path.join(tmp_dir, 'bundle.zip')
+            archive = zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED)
+            archive.writestr('feed/', '')
+            archive.writestr('feed/phishing.xml', content)
+            archive.close()
+
+            tar_file = os.path.join(tmp_dir, 'bundle.tar.gz')
+            archive = tarfile.open(tar_file, 'w:gz')
+            archive.add(xml_file, 'one.xml')
+            archive.add(xml_file, 'two.xml')
+            archive.close()
+
+            self.assertEqual([(source.name, source.size) for source in iter_import_sources(zip_file)],
+                             [('%s!feed/phishing.xml' % zip_file, len(content))])
+            self.assertEqual([source.name for source in iter_import_sources(tar_file)],
+                             ['%s!one.xml' % tar_file, '%s!two.xml' % tar_file])
+
+            (delta,result) = t_import(gz_file,
+                                      placeholder_fillers=[('source', 'Example_import')],
+                                      identifier_ns_uri=None,
+                                      marking_json='tests/testdata/markings/import_info.json',
+                                      default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+
+            expected = [ ('DataTypeNameSpace', 22),
+                         ('Fact', 83),
+                         ('FactDataType', 16),
+                         ('FactTerm', 52),
+                         ('FactTerm2Type', 56),
+                         ('FactTermNamespaceMap', 46),
+                         ('FactValue', 70),
+                         ('Identifier', 18),
+                         ('IdentifierNameSpace', 2),
+                         ('InfoObject', 18),
+                         ('InfoObject2Fact', 100),
+                         ('InfoObjectFamily', 4),
+                         ('InfoObjectType', 10),
+                         ('Marking2X', 15),
+                         ('NodeID', 49),
+                         ('PositionalNamespace', 93),
+                         ('Revision', 4)]
+
+            self.assertEqual(delta,expected)
+
+            # The content of the archive members is hashed just as the
+            # content of plain files. (The import is not skipped, since the
+            # content has been imported with a marking before.)
+
+            (delta,result) = t_import(zip_file,
+                                      default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+
+            self.assertEqual(delta,[])
+            self.assertEqual(ImportLedgerEntry.objects.count(), 2)
+            self.assertEqual(len(set(ImportLedgerEntry.objects.values_list('content_hash', flat=True))), 1)
+
+            # Each member of the tar archive is imported on its own; members
+            # of compressed tar archives are hashed while they are imported.
+
+            (delta,result) = t_import(tar_file,
+                                      default_timestamp = '2013-02-26 14:11:33.253370+00:00',
+                                      streaming=True)
+
+            self.assertEqual(delta,[('InfoObject', 15), ('InfoObject2Fact', 94)])
+            self.assertEqual(ImportLedgerEntry.objects.count(), 3)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_spool_import(self):
+
+        # The spool import imports the files in the spool directory and
+        # moves them to the subdirectories 'done' and 'failed'.
+
+        import json
+        from mantis_stix_importer.management.commands.mantis_stix_spool_import import Command as SpoolCommand
+
+        @deltaCalc
+        def t_import(*args,**kwargs):
+            return SpoolCommand().handle(*args,**kwargs)
+
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            spool_dir = os.path.join(tmp_dir, 'spool')
+            os.mkdir(spool_dir)
+            shutil.copy('tests/testdata/xml/STIX_Phishing_Indicator.xml', spool_dir)
+            with open(os.path.join(spool_dir, 'broken.xml'), 'w') as broken_file:
+                broken_file.write('This is not XML')
+            with open(os.path.join(spool_dir, '.incomplete.xml'), 'w') as incomplete_file:
+                incomplete_file.write('<STIX_Package')
+
+            status_file = os.path.join(tmp_dir, 'status.json')
+
+            (delta,result) = t_import(spool_dir,
+                                      placeholder_fillers=[('source', 'Example_import')],
+                                      identifier_ns_uri=None,
+                                      marking_json='tests/testdata/markings/import_info.json',
+                                      default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                      settle_time=0,
+                                      status_file=status_file,
+                                      once=True)
+
+            expected = [ ('DataTypeNameSpace', 22),
+                         ('Fact', 83),
+                         ('FactDataType', 16),
+                         ('FactTerm', 52),
+                         ('FactTerm2Type', 56),
+                         ('FactTermNamespaceMap', 46),
+                         ('FactValue', 70),
+                         ('Identifier', 18),
+                         ('IdentifierNameSpace', 2),
+                         ('InfoObject', 18),
+                         ('InfoObject2Fact', 100),
+                         ('InfoObjectFamily', 4),
+                         ('InfoObjectType', 10),
+                         ('Marking2X', 15),
+                         ('NodeID', 49),
+                         ('PositionalNamespace', 93),
+                         ('Revision', 4)]
+
+            self.assertEqual(delta,expected)
+
+            self.assertEqual(sorted(os.listdir(spool_dir)), ['.incomplete.xml', 'done', 'failed'])
+            self.assertEqual(os.listdir(os.path.join(spool_dir, 'done')), ['STIX_Phishing_Indicator.xml'])
+            self.assertEqual(os.listdir(os.path.join(spool_dir, 'failed')), ['broken.xml'])
+
+            with open(status_file) as status:
+                status = json.load(status)
+
+            self.assertEqual((status['imported'], status['failed'], status['queue_depth']), (1, 1, 0))
+            self.assertTrue(status['max_latency'] >= status['last_seconds'])
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_transactional_import(self):
+
+        # The transactional import must yield the same objects as the
+        # import without explicit transactions; objects whose import fails
+        # are rolled back without affecting the other objects.
+
+        @deltaCalc
+        def t_import(*args,**kwargs):
+            return self.command.handle(*args,**kwargs)
+
+        commit_count = self.command.Importer.commit_count
+
+        (delta,result) = t_import('tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                  placeholder_fillers=[('source', 'Example_import')],
+                                  identifier_ns_uri=None,
+                                  marking_json='tests/testdata/markings/import_info.json',
+                                  default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                  transactional=True,
+                                  commit_every=5)
+
+        expected = [ ('DataTypeNameSpace', 22),
+                     ('Fact', 83),
+                     ('FactDataType', 16),
+                     ('FactTerm', 52),
+                     ('FactTerm2Type', 56),
+                     ('FactTermNamespaceMap', 46),
+                     ('FactValue', 70),
+                     ('Identifier', 18),
+                     ('IdentifierNameSpace', 2),
+                     ('InfoObject', 18),
+                     ('InfoObject2Fact', 100),
+                     ('InfoObjectFamily', 4),
+                     ('InfoObjectType', 10),
+                     ('Marking2X', 15),
+                     ('NodeID', 49),
+                     ('PositionalNamespace', 93),
+                     ('Revision', 4)]
+
+        self.assertEqual(delta,expected)
+        # 15 objects, committed in batches of 5
+        self.assertEqual(self.command.Importer.commit_count - commit_count, 3)
+
+        class Failing_STIX_Import(STIX_Import):
+            def iobject_import(self, id_and_rev_info, elt_name, obj_dict, **kwargs):
+                result = STIX_Import.iobject_import(self, id_and_rev_info, elt_name, obj_dict, **kwargs)
+                if elt_name == 'Course_Of_Action':
+                    raise StandardError("Failing import of %s" % id_and_rev_info['id'])
+                return result
+
+        (delta,result) = deltaCalc(Failing_STIX_Import().xml_import)(
+            filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+            default_timestamp = '2013-02-26 14:11:33.253370+00:00',
+            transactional=True)
+
+        # All objects but the seven courses of action get a new revision
+
+        self.assertEqual(delta, [('InfoObject', 8), ('InfoObject2Fact', 60)])
+
+        # An object whose import fails because another process has created
+        # the same rows in the meantime is imported again in a new savepoint.
+
+        from django.db import IntegrityError
+
+        class Racing_STIX_Import(STIX_Import):
+            raced = set()
+
+            def iobject_import(self, id_and_rev_info, elt_name, obj_dict, **kwargs):
+                result = STIX_Import.iobject_import(self, id_and_rev_info, elt_name, obj_dict, **kwargs)
+                if not id_and_rev_info['id'] in self.raced:
+                    self.raced.add(id_and_rev_info['id'])
+                    raise IntegrityError("Concurrent creation in import of %s" % id_and_rev_info['id'])
+                return result
+
+        (delta,result) = deltaCalc(Racing_STIX_Import().xml_import)(
+            filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+            default_timestamp = '2013-02-26 15:11:33.253370+00:00',
+            transactional=True)
+
+        self.assertEqual(dict(delta)['InfoObject'], 15)
+
+    def test_transactional_rollback(self):
+
+        # If a transactional import fails as a whole, the identifiers it has
+        # created are rolled back: a following import that keeps the identifier
+        # cache must not take them for existing.
+
+        from dingos.models import Identifier
+
+        class Failing_STIX_Import(STIX_Import):
+            failing = True
+
+            def xml_dom_import(self, *args, **kwargs):
+                STIX_Import.xml_dom_import(self, *args, **kwargs)
+                if self.failing:
+                    raise StandardError("Failing import")
+
+        importer = Failing_STIX_Import()
+
+        self.assertRaises(StandardError, importer.xml_import,
+                          filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                          default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                          transactional=True)
+
+        self.assertEqual(Identifier.objects.count(), 0)
+
+        importer.failing = False
+
+        (delta,result) = deltaCalc(importer.xml_import)(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                                        default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                                        batch_identifier_cache=True)
+
+        self.assertEqual(dict(delta)['Identifier'], 17)
+        self.assertEqual(dict(delta)['InfoObject'], 17)
+        self.assertEqual(Identifier.objects.filter(latest=None).count(), 0)
+
+    def test_placeholders(self):
+
+        # PLACEHOLDERs for references are created along with the objects that
+        # reference them: an import that fails before any object has been
+        # imported leaves none behind.
+
+        from dingos import DINGOS_PLACEHOLDER_TYPE_NAME
+        from dingos.models import InfoObject, Identifier
+
+        class Failing_STIX_Import(STIX_Import):
+            def iobject_import(self, id_and_rev_info, elt_name, obj_dict, **kwargs):
+                raise StandardError("Failing import of %s" % id_and_rev_info['id'])
+
+        self.assertRaises(StandardError, Failing_STIX_Import().xml_import,
+                          filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                          default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+
+        self.assertEqual(InfoObject.objects.count(), 0)
+
+        STIX_Import().xml_import(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                 default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+
+        # Each identifier points to its latest revision, also those of PLACEHOLDERs
+
+        self.assertTrue(InfoObject.objects.filter(iobject_type__name=DINGOS_PLACEHOLDER_TYPE_NAME).exists())
+        self.assertEqual(Identifier.objects.filter(latest=None).count(), 0)
+
+    def test_import_profile(self):
+
+        # With profile=True, xml_import returns measurements per phase;
+        # the counters of the phases add up to what has been created.
+
+        (delta,profile) = deltaCalc(STIX_Import().xml_import)(
+            filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+            default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+            profile=True)
+
+        delta = dict(delta)
+
+        self.assertFalse(profile['skipped'])
+        self.assertEqual(profile['source'], 'tests/testdata/xml/STIX_Phishing_Indicator.xml')
+        self.assertEqual(profile['phases'].keys(), ['ledger', 'parse', 'extract', 'preresolve',
+                                                    'markings', 'objects', 'openioc', 'large_values',
+                                                    'other'])
+        self.assertEqual(sum([phase['created_objects'] for phase in profile['phases'].values()]),
+                         delta['InfoObject'])
+        self.assertEqual(sum([phase['facts'] for phase in profile['phases'].values()]),
+                         delta['InfoObject2Fact'])
+        self.assertEqual(sum([phase['new_facts'] for phase in profile['phases'].values()]),
+                         delta['Fact'])
+        self.assertEqual(profile['phases']['objects']['objects'], 15)
+        self.assertTrue(profile['phases']['objects']['queries'] > 0)
+        self.assertAlmostEqual(sum([phase['wall_seconds'] for phase in profile['phases'].values()]),
+                               profile['wall_seconds'])
+
+        # Without profile, nothing is returned
+
+        self.assertEqual(STIX_Import().xml_import(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                                  default_timestamp = '2013-02-26 13:11:33.253370+00:00'),
+                         None)
+
+    def test_synthetic_package(self):
+
+        # The package has been generated with
+        #
+        #    python benchmarks/stix_corpus.py -i 4 -o 6 -f 2 --openioc-every 2 --raw-size 256
+        #
+        # and contains all structures the generator produces: value sets,
+        # ##comma##-separated lists, raw values, kill chains, markings
+        # and embedded OpenIOC documents.
+
+        from dingos.models import FactValue, InfoObject
+
+        profile = STIX_Import().xml_import(filepath='tests/testdata/xml/Synthetic_Package.xml',
+                                           default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                           profile=True)
+
+        self.assertFalse(profile['skipped'])
+
+        # Each value of the value set and of the ##comma##-separated list
+        # is stored as value of its own.
+
+        for value in ['host-1.example.com/index.html', 'host-1.example.com/login.html',
+                      'cdn.host-1.example.com/kb.html', 'Invoice 4', 'Final notice 4']:
+            self.assertTrue(FactValue.objects.filter(value=value).exists())
+
+        self.assertEqual(InfoObject.objects.filter(iobject_type__name='ioc').count(), 2)
+        # The embedded OpenIOC documents are handed over to the pool of
+        # deferred processors, and the import waits for them at its end.
+
+        self.assertEqual(profile['phases']['openioc']['calls'], 2)
+
+    def test_query_budget(self):
+
+        # The number of database queries per imported InfoObject and per
+        # fact must stay within the budget recorded in
+        # tests/testdata/query_budget.json -- both for the first import of
+        # a package and for a forced re-import with the same timestamp.
+        # If a change reduces the number of queries, lower the budget in
+        # the same commit; raising it should be a conscious decision.
+
+        with open('tests/testdata/query_budget.json') as budget_file:
+            budgets = json.load(budget_file)
+
+        @deltaCalc
+        def t_import(**kwargs):
+            with CaptureQueriesContext(connection) as queries:
+                STIX_Import().xml_import(**kwargs)
+            return len(queries)
+
+        exceeded = []
+
+        for (file_name, budget) in sorted(budgets.items()):
+
+            measured = {}
+            denominators = None
+
+            for import_run in ['import', 'reimport']:
+                (delta,queries) = t_import(filepath=os.path.join('tests/testdata/xml', file_name),
+                                           default_timestamp = budget['default_timestamp'],
+                                           force=True)
+
+                if not denominators:
+                    # The re-import creates no objects; both runs are measured
+                    # against what the package contains.
+                    delta = dict(delta)
+                    denominators = (delta['InfoObject'], delta['InfoObject2Fact'])
+
+                measured[import_run] = {'queries_per_object': float(queries) / denominators[0],
+                                        'queries_per_fact': float(queries) / denominators[1]}
+
+            for import_run in ['import', 'reimport']:
+                for (key, limit) in sorted(budget[import_run].items()):
+                    if measured[import_run][key] > limit:
+                        exceeded.append("%s (%s): %.2f %s exceeds the budget of %.2f" % (file_name,
+                                                                                        import_run,
+                                                                                        measured[import_run][key],
+                                                                                        key,
+                                                                                        limit))
+
+        self.assertFalse(exceeded, "\n".join(exceeded))
+
+    def test_placeholder_query_budget(self):
+
+        # The PLACEHOLDERs for the missing identifiers referenced in a package
+        # are created with a fixed number of statements, however many there are.
+        # (The first import also creates the identifier namespace.)
+
+        from dingos import DINGOS_PLACEHOLDER_TYPE_NAME
+        from dingos.models import InfoObject, Identifier
+
+        def package(package_id, reference_count):
+            return """<?xml version="1.0" encoding="UTF-8"?>
+<stix:STIX_Package xmlns:stix="http://stix.mitre.org/stix-1"
+    xmlns:stixCommon="http://stix.mitre.org/common-1"
+    xmlns:indicator="http://stix.mitre.org/Indicator-2"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xmlns:example="http://example.com"
+    id="example:Package-%(id)s" version="1.0.1">
+    <stix:Indicators>
+        <stix:Indicator xsi:type="indicator:IndicatorType" id="example:Indicator-%(id)s">
+            <indicator:Title>Indicator with %(count)s references</indicator:Title>
+            <indicator:Related_Indicators>
+%(references)s
+            </indicator:Related_Indicators>
+        </stix:Indicator>
+    </stix:Indicators>
+</stix:STIX_Package>""" % {'id': package_id,
+                           'count': reference_count,
+                           'references': "\n".join(['<indicator:Related_Indicator><stixCommon:Indicator '
+                                                    'idref="example:Indicator-%s-%d"/></indicator:Related_Indicator>'
+                                                    % (package_id, i) for i in range(reference_count)])}
+
+        class Counting_STIX_Import(STIX_Import):
+            queries = 0
+
+            def create_pending_placeholders(self, elt_dict):
+                with CaptureQueriesContext(connection) as queries:
+                    STIX_Import.create_pending_placeholders(self, elt_dict)
+                self.queries += len(queries)
+
+        statements = []
+
+        for reference_count in [1, 10, 100]:
+            importer = Counting_STIX_Import()
+            importer.xml_import(xml_content=package(reference_count, reference_count),
+                                default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+            self.assertEqual(InfoObject.objects.filter(iobject_type__name=DINGOS_PLACEHOLDER_TYPE_NAME,
+                                                       identifier__uid__startswith='Indicator-%d-' % reference_count).count(),
+                             reference_count)
+            statements.append(importer.queries)
+
+        self.assertEqual(statements[1], statements[2])
+        self.assertTrue(max(statements) <= 12, statements)
+        self.assertEqual(Identifier.objects.filter(latest=None).count(), 0)
+
+    def test_db_snapshot(self):
+
+        # Snapshots by count and by max id yield the same delta for an
+        # import (nothing is deleted); the command compares a snapshot file
+        # with the current state.
+
+        from StringIO import StringIO
+        from django.core.management.base import OutputWrapper
+        from mantis_stix_importer.snapshots import take_snapshot, snapshot_delta
+        from mantis_stix_importer.management.commands.mantis_stix_db_snapshot import Command as SnapshotCommand
+
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            snapshot_file = os.path.join(tmp_dir, 'before.json')
+
+            snapshot_command = SnapshotCommand()
+            snapshot_command.handle(method='max_id', output=snapshot_file, importer_models=True)
+
+            counts_before = take_snapshot('count')
+            max_ids_before = take_snapshot('max_id')
+
+            STIX_Import().xml_import(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                     default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+
+            delta = snapshot_delta(counts_before, take_snapshot('count'))
+
+            self.assertEqual(dict(delta)['InfoObject'], 17)
+            self.assertEqual(snapshot_delta(max_ids_before, take_snapshot('max_id')), delta)
+
+            output = StringIO()
+            snapshot_command.stdout = OutputWrapper(output)
+            snapshot_command.handle(compare=snapshot_file)
+            output = output.getvalue()
+
+            self.assertTrue("InfoObject +17\n" in output)
+            self.assertTrue("ImportLedgerEntry +1\n" in output)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_deferred_processor_pool(self):
+
+        # Deferred content is handed over as standalone document (with the
+        # namespace declarations of its ancestors); processor instances are
+        # reused within an import, one per thread.
+
+        import libxml2
+        from mantis_stix_importer.importer import DeferredProcessorPool, standalone_xml
+
+        class RecordingProcessor(object):
+            instances = []
+
+            def __init__(self, namespace_dict=None):
+                self.namespace_dict = namespace_dict
+                RecordingProcessor.instances.append(self)
+
+            def xml_import(self, xml_content=None, markings=None, initialize_importer=True, **kwargs):
+                imported.append((self, xml_content.name, xml_content.ns().content, markings))
+
+        class ConcurrentPool(DeferredProcessorPool):
+            def concurrent(self):
+                return True
+
+        imported = []
+
+        document = libxml2.parseDoc('<a:x xmlns:a="urn:a" xmlns:b="urn:b"><b:y a:n="1"><b:z/></b:y></a:x>')
+        try:
+            node = document.getRootElement().children
+            self.assertEqual(standalone_xml(node).splitlines()[-1],
+                             '<b:y xmlns:b="urn:b" xmlns:a="urn:a" a:n="1"><b:z/></b:y>')
+
+            pool = DeferredProcessorPool({'test': RecordingProcessor}, threads=2)
+
+            for generation in range(2):
+                pool.begin({'a': 'urn:a'})
+                for markings in range(3):
+                    pool.submit('test', node, markings=markings)
+                pool.flush()
+
+            self.assertEqual([(name, ns, markings) for (processor, name, ns, markings) in imported],
+                             [('y', 'urn:b', markings) for markings in range(3)] * 2)
+            self.assertEqual(len(RecordingProcessor.instances), 2)
+            self.assertEqual(set([processor for (processor, name, ns, markings) in imported]),
+                             set(RecordingProcessor.instances))
+
+            del imported[:]
+
+            pool = ConcurrentPool({'test': RecordingProcessor}, threads=2)
+            pool.begin({'a': 'urn:a'})
+            for markings in range(10):
+                pool.submit('test', node, markings=markings)
+            pool.flush()
+
+            self.assertEqual(sorted([markings for (processor, name, ns, markings) in imported]), range(10))
+            self.assertTrue(len(set([processor for (processor, name, ns, markings) in imported])) <= 2)
+        finally:
+            document.freeDoc()
+
+    def test_import_context(self):
+
+        # The state of an import lives in a context of its own: the default
+        # timestamp of one import does not carry over to the next import, and
+        # hooks called in different threads see the namespaces of their thread.
+
+        import threading
+
+        importer = STIX_Import()
+
+        importer.xml_import(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                            default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+        self.assertEqual(str(importer.default_timestamp), '2013-02-26 13:11:33.253370+00:00')
+        first_context = importer.context
+
+        (delta,result) = deltaCalc(importer.xml_import)(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml')
+        self.assertEqual(importer.default_timestamp, importer.create_timestamp)
+        self.assertEqual(dict(delta)['InfoObject'], 15)
+        self.assertFalse(importer.context is first_context)
+
+        results = {}
+
+        def split_qnames(prefix_uri):
+            importer.namespace_dict = {'x': prefix_uri}
+            results[prefix_uri] = [importer.split_qname('x:%d' % i)[1] for i in range(1000)]
+            results[prefix_uri].append(importer.context is first_context)
+
+        threads = [threading.Thread(target=split_qnames, args=('urn:%d' % i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for (prefix_uri, uris) in results.items():
+            self.assertEqual(uris, [prefix_uri] * 1000 + [False])
+        self.assertFalse('x' in importer.namespace_dict)
+
+    def test_import_executor(self):
+
+        # A cancelled transactional import leaves nothing behind. The executor
+        # bounds the number of imports in flight; queued imports can be
+        # cancelled. (The threads of the executor do not see the in-memory
+        # database of the tests, so they run a stand-in for the importer.)
+
+        import threading
+        from multiprocessing import TimeoutError
+        from mantis_stix_importer.importer import ImportCancelled
+        from mantis_stix_importer.executor import ImportExecutor, ImportQueueFull
+
+        cancel_event = threading.Event()
+
+        class Cancelling_STIX_Import(STIX_Import):
+            def iobject_import(self, *args, **kwargs):
+                # Cancel the import after its first object
+                cancel_event.set()
+                return STIX_Import.iobject_import(self, *args, **kwargs)
+
+        @deltaCalc
+        def t_import(**kwargs):
+            self.assertRaises(ImportCancelled, Cancelling_STIX_Import().xml_import, **kwargs)
+
+        (delta,result) = t_import(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                  default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                  transactional=True,
+                                  cancel_event=cancel_event)
+
+        self.assertEqual(delta, [])
+
+        class BlockingImporter(object):
+            def __init__(self):
+                self.proceed = threading.Event()
+                self.context = self
+
+            def xml_import(self, cancel_event=None, deadline=None, **kwargs):
+                self.proceed.wait()
+                self.skipped = kwargs.get('xml_content') == 'old'
+                return {'content': kwargs.get('xml_content')}
+
+        importer = BlockingImporter()
+        executor = ImportExecutor(importer, threads=1, max_queued=1)
+        ended = []
+
+        try:
+            first = executor.submit(xml_content='new', callback=ended.append)
+            second = executor.submit(name='second', xml_content='old')
+
+            self.assertRaises(ImportQueueFull, executor.submit, xml_content='third')
+            self.assertRaises(TimeoutError, first.result, 0.1)
+
+            self.assertTrue(second.cancel())
+            importer.proceed.set()
+
+            result = first.result(10)
+            self.assertEqual((result.name, result.skipped, result.stats), ('XML content', False, {'content': 'new'}))
+            self.assertEqual(ended, [first])
+            self.assertRaises(ImportCancelled, second.result, 10)
+            self.assertFalse(second.cancel())
+
+            self.assertTrue(executor.submit(xml_content='old').result(10).skipped)
+        finally:
+            importer.proceed.set()
+            executor.close()
+
+    def test_resume_import(self):
+
+        # An import that fails after some commits is resumed after the last
+        # committed object when the content is imported again; the result is
+        # the same as for an import that has not failed.
+
+        import threading
+        from django.db import transaction
+        from mantis_stix_importer.importer import ImportCancelled
+        from mantis_stix_importer.models import ImportCheckpoint
+
+        class Counting_STIX_Import(STIX_Import):
+            def __init__(self, cancel_after=None):
+                STIX_Import.__init__(self)
+                self.cancel_after = cancel_after
+                self.count = 0
+
+            def iobject_import(self, *args, **kwargs):
+                self.count += 1
+                if self.count == self.cancel_after:
+                    cancel_event.set()
+                return STIX_Import.iobject_import(self, *args, **kwargs)
+
+        class Rollback(Exception):
+            pass
+
+        cancel_event = threading.Event()
+
+        kwargs = dict(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                      default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                      transactional=True,
+                      commit_every=3)
+
+        reference = Counting_STIX_Import()
+        try:
+            with transaction.atomic():
+                (expected,result) = deltaCalc(reference.xml_import)(**kwargs)
+                raise Rollback
+        except Rollback:
+            pass
+
+        failing = Counting_STIX_Import(cancel_after=7)
+
+        @deltaCalc
+        def t_import(**kwargs):
+            self.assertRaises(ImportCancelled, failing.xml_import, cancel_event=cancel_event, **kwargs)
+
+        (delta_failed,result) = t_import(**kwargs)
+
+        # The markings have been imported before the other objects; they are
+        # reloaded when the import is resumed.
+
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.component, checkpoint.queue), (0, 'pending'))
+
+        resuming = Counting_STIX_Import()
+        (delta_resumed,result) = deltaCalc(resuming.xml_import)(**kwargs)
+
+        total = dict(delta_failed)
+        for (model_name, difference) in delta_resumed:
+            total[model_name] = total.get(model_name, 0) + difference
+
+        self.assertEqual(sorted(total.items()), expected)
+        self.assertEqual(resuming.count, reference.count - 6)
+        self.assertEqual(ImportCheckpoint.objects.count(), 0)
+        self.assertEqual(ImportLedgerEntry.objects.count(), 1)
+
+    def test_dry_run(self):
+
+        # A dry run extracts the objects without accessing the database and
+        # writes them as JSON lines; DOM-based and streaming import extract the
+        # same objects.
+
+        from StringIO import StringIO
+        from django.core.management.base import OutputWrapper
+
+        runs = []
+
+        for streaming in [False, True]:
+            output = StringIO()
+            self.command.stdout = OutputWrapper(output)
+            self.command.stderr = OutputWrapper(StringIO())
+
+            with CaptureQueriesContext(connection) as queries:
+                self.command.handle('tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                    default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                    streaming=streaming,
+                                    dry_run=True)
+
+            self.assertEqual(len(queries), 0)
+
+            runs.append(sorted([(record['id'], record['elt_name'], record['type_info']['iobject_type_name'])
+                                for record in map(json.loads, output.getvalue().splitlines())]))
+
+        # The import creates two more InfoObjects: PLACEHOLDERs for references
+
+        self.assertEqual(runs[0], runs[1])
+        self.assertEqual(len(runs[0]), 15)
+        self.assertTrue(('example:Indicator-19e5d914-cc0e-478f-a523-b099a34383f7', 'Indicator', 'Indicator')
+                        in runs[0])
+        self.assertEqual(ImportLedgerEntry.objects.count(), 0)
+
+        # Called directly, the importer hands the objects over to the
+        # record_writer
+
+        records = []
+
+        with CaptureQueriesContext(connection) as queries:
+            self.command.Importer.xml_import(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                             default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                             dry_run=True,
+                                             record_writer=records.append)
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(sorted([(record['id'], record['elt_name'], record['type_info']['iobject_type_name'])
+                                 for record in records]), runs[0])
+
+    def test_parse_cache(self):
+
+        # Content whose extraction result is in the parse cache is not parsed
+        # again; the import creates the same objects.
+
+        from django.db import transaction
+        from mantis_stix_importer.parse_cache import ParseCache
+
+        class NonParsing_STIX_Import(STIX_Import):
+            def parse_source(self, source):
+                raise AssertionError("%s has been parsed" % source.name)
+
+        class Rollback(Exception):
+            pass
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            kwargs = dict(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                          default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                          parse_cache=cache_dir)
+
+            try:
+                with transaction.atomic():
+                    (expected,result) = deltaCalc(STIX_Import().xml_import)(**kwargs)
+                    raise Rollback
+            except Rollback:
+                pass
+
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            (delta,result) = deltaCalc(NonParsing_STIX_Import().xml_import)(**kwargs)
+
+            self.assertEqual(delta, expected)
+
+            # Least recently used entries are evicted once the cache is too large
+
+            cache = ParseCache(cache_dir, max_bytes=os.path.getsize(os.path.join(cache_dir, os.listdir(cache_dir)[0])))
+            self.assertTrue(cache.save('0' * 64, {'import_result': {}, 'namespace_dict': {}}))
+            self.assertEqual(cache.load('0' * 64), {'import_result': {}, 'namespace_dict': {}})
+            self.assertEqual(len(cache.entries()), 1)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_large_value_writer(self):
+
+        # Large values written to the file system are named by their hash;
+        # each value is written only once.
+
+        import dingos
+        from django.core.files.storage import FileSystemStorage
+        from mantis_stix_importer.importer import LargeValueWriter
+
+        tmp_dir = tempfile.mkdtemp()
+        blob_storage = dingos.DINGOS_BLOB_STORAGE
+        try:
+            dingos.DINGOS_BLOB_STORAGE = FileSystemStorage(location=tmp_dir)
+
+            writer = LargeValueWriter(threads=2)
+            values = ['Received: from a' * 100, 'Received: from b' * 100, 'Received: from a' * 100]
+            results = [writer.write(value, dingos.DINGOS_FILE_SYSTEM) for value in values]
+            writer.flush()
+
+            self.assertEqual(results[0], results[2])
+            self.assertEqual((writer.written, writer.skipped), (2, 1))
+            self.assertEqual(sorted(os.listdir(tmp_dir)), sorted(['%s.blob' % value_hash
+                                                                   for (value_hash, location) in results[:2]]))
+            with open(os.path.join(tmp_dir, '%s.blob' % results[1][0])) as blob_file:
+                self.assertEqual(blob_file.read(), values[1])
+
+            # Values already on disk are not written again
+
+            writer.write(values[1], dingos.DINGOS_FILE_SYSTEM)
+            writer.flush()
+            self.assertEqual((writer.written, writer.skipped), (2, 2))
+        finally:
+            dingos.DINGOS_BLOB_STORAGE = blob_storage
+            shutil.rmtree(tmp_dir)
+
+    def test_sharded_large_value_storage(self):
+
+        # Flat files are repacked into the sharded and compressed layout,
+        # into which the writer then writes new values.
+
+        import hashlib
+        from mantis_stix_importer.storage import ShardedFileSystemStorage
+        from mantis_stix_importer.importer import LargeValueWriter
+        from mantis_stix_importer.models import LargeValueIndexEntry
+        from mantis_stix_importer.management.commands.mantis_stix_repack_large_values import \
+            Command as RepackCommand
+        import dingos
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            values = ['Received: from a' * 100, 'Received: from b' * 100]
+            hashes = [hashlib.sha256(value).hexdigest() for value in values]
+
+            with open(os.path.join(tmp_dir, '%s.blob' % hashes[0]), 'wb') as blob_file:
+                blob_file.write(values[0])
+            with open(os.path.join(tmp_dir, '%s.blob' % ('0' * 64)), 'wb') as blob_file:
+                blob_file.write(values[0])
+
+            RepackCommand().handle(source=tmp_dir, root=tmp_dir, compression='zlib')
+
+            # By default, the flat files are kept for DINGOS, which reads
+            # the flat layout
+
+            self.assertEqual(sorted(os.listdir(tmp_dir)), sorted([hashes[0][:2], '%s.blob' % hashes[0],
+                                                                  '%s.blob' % ('0' * 64)]))
+
+            RepackCommand().handle(source=tmp_dir, root=tmp_dir, compression='zlib', delete=True)
+
+            # The file with the wrong hash is left in place
+            self.assertEqual(sorted(os.listdir(tmp_dir)), sorted([hashes[0][:2], '%s.blob' % ('0' * 64)]))
+
+            storage = ShardedFileSystemStorage(root=tmp_dir)
+
+            writer = LargeValueWriter(threads=2, storage=storage)
+            for value in values:
+                writer.write(value, dingos.DINGOS_FILE_SYSTEM)
+            writer.flush()
+            self.assertEqual((writer.written, writer.skipped), (1, 1))
+
+            for (value_hash, value) in zip(hashes, values):
+                path = os.path.join(tmp_dir, value_hash[:2], value_hash[2:4], '%s.blob.zz' % value_hash)
+                self.assertTrue(os.path.getsize(path) < len(value))
+                self.assertEqual(storage.read(value_hash), value)
+                self.assertEqual(LargeValueIndexEntry.objects.get(value_hash=value_hash).size, len(value))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_command_output(self):
+
+        # A sequential import writes nothing to stdout, as the DINGOS import
+        # command; with --verbosity 2, it ends with the summary of the import
+        # units and of the identifier cache.
+
+        from StringIO import StringIO
+        from django.core.management.base import OutputWrapper
+
+        outputs = []
+
+        for verbosity in ['1', '2']:
+            output = StringIO()
+            self.command.stdout = OutputWrapper(output)
+            self.command.handle('tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                default_timestamp = '2013-02-26 13:11:33.253370+00:00',
+                                verbosity=verbosity,
+                                force=True)
+            outputs.append(output.getvalue())
+
+        self.assertEqual(outputs[0], '')
+        self.assertTrue('Imported 1 of 1 units' in outputs[1])
+        self.assertTrue('Identifier cache saved' in outputs[1])
+
+    def test_parallel_job_scheduling(self):
+
+        # Files carrying the same top-level identifier must end up in the
+        # same job, so that they are never imported concurrently; jobs
+        # are ordered largest-first.
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with open('tests/testdata/xml/STIX_Phishing_Indicator.xml', 'r') as content_file:
+                xml_content = content_file.read()
+
+            for name in ['a.xml', 'b.xml']:
+                with open(os.path.join(tmp_dir, name), 'w') as out:
+                    out.write(xml_content)
+            with open(os.path.join(tmp_dir, 'c.xml'), 'w') as out:
+                out.write(xml_content.replace('Indicator-ba1d406e-937c-414f-9231-6e1dbe64fe8b',
+                                              'Indicator-other'))
+
+            jobs = schedule_import_jobs([os.path.join(tmp_dir, name) for name in ['c.xml', 'b.xml', 'a.xml']])
+
+            self.assertEqual(jobs, [[os.path.join(tmp_dir, 'a.xml'), os.path.join(tmp_dir, 'b.xml')],
+                                    [os.path.join(tmp_dir, 'c.xml')]])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_iobject_type_memo(self):
+
+        # Memoized results must equal freshly derived ones, also when
+        # the namespace declarations change between documents.
+
+        importer = Command.Importer.__class__()
+        importer.namespace_dict.update({'stix': 'http://stix.mitre.org/stix-1',
+                                        'cybox': 'http://cybox.mitre.org/cybox-2',
+                                        'indicator': 'http://stix.mitre.org/Indicator-2',
+                                        'AddressObj': 'http://cybox.mitre.org/objects#AddressObject-2'})
+
+        arguments = [('indicator', None, 'Indicator'),
+                     ('cybox', 'AddressObj', 'Object'),
+                     ('stix', None, 'STIX_Package')]
+
+        for args in arguments:
+            self.assertEqual(importer.derive_iobject_type(*args), importer._derive_iobject_type(*args))
+        for args in arguments:
+            importer.derive_iobject_type(*args)
+
+        self.assertEqual((importer.iobject_type_memo.hits, importer.iobject_type_memo.misses), (3, 3))
+
+        importer.namespace_dict['AddressObj'] = 'http://cybox.mitre.org/objects#AddressObject-3'
+
+        self.assertEqual(importer.derive_iobject_type('cybox', 'AddressObj', 'Object')['iobject_type_revision_name'],
+                         '3')
+
+    def test_produced_time_extraction(self):
+
+        # The timestamp of a package is read from
+        # STIX_Header/Information_Source/Time/Produced_Time.
+
+        import libxml2
+
+        doc = libxml2.parseDoc("""<stix:STIX_Package xmlns:stix="http://stix.mitre.org/stix-1"
+            xmlns:stixCommon="http://stix.mitre.org/common-1" xmlns:cyboxCommon="http://cybox.mitre.org/common-2"
+            id="example:Package-1">
+          <stix:STIX_Header>
+            <stix:Title>Test</stix:Title>
+            <stix:Information_Source>
+              <stixCommon:Identity><stixCommon:Name>Example</stixCommon:Name></stixCommon:Identity>
+              <stixCommon:Time><cyboxCommon:Produced_Time> 2014-01-01T10:00:00+02:00 </cyboxCommon:Produced_Time></stixCommon:Time>
+            </stix:Information_Source>
+          </stix:STIX_Header>
+        </stix:STIX_Package>""")
+        try:
+            id_and_rev_info = Command.Importer.__class__().id_and_revision_extractor(doc.getRootElement())
+        finally:
+            doc.freeDoc()
+
+        self.assertEqual(id_and_rev_info['id'], 'example:Package-1')
+        self.assertEqual(id_and_rev_info['embedding_STIX_Package'], 'example:Package-1')
+        self.assertEqual(id_and_rev_info['timestamp'].isoformat(), '2014-01-01T10:00:00+02:00')
+
+    def test_valueset_fact_handler(self):
+
+        # DINGOS passes the attributes of a node to the fact handlers as
+        # flat dictionary; the comma-separated values of a value set become
+        # separate values.
+
+        importer = STIX_Import()
+
+        fact = {'node_id': 'N000:N000:N000:N000',
+                'term': 'Properties/Value',
+                'attribute': False,
+                'value': ''}
+
+        add_fact_kargs = {}
+
+        self.assertTrue(importer.cybox_valueset_fact_handler(None, fact,
+                                                             {'condition': 'IsInSet',
+                                                              'value_set': 'sample1.com/index.html, sample2.com/login.html'},
+                                                             add_fact_kargs))
+        self.assertEqual(add_fact_kargs['values'], ['sample1.com/index.html', 'sample2.com/login.html'])
+
+        from dingos.models import FactValue
+
+        importer.xml_import(xml_content="""<?xml version="1.0" encoding="UTF-8"?>
+<cybox:Observables xmlns:cybox="http://cybox.mitre.org/cybox-2"
+    xmlns:URIObj="http://cybox.mitre.org/objects#URIObject-2"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xmlns:example="http://example.com"
+    cybox_major_version="2" cybox_minor_version="1">
+    <cybox:Observable id="example:Observable-1">
+        <cybox:Object id="example:URI-1">
+            <cybox:Properties xsi:type="URIObj:URIObjectType">
+                <URIObj:Value condition="IsInSet" value_set="sample1.com/index.html, sample2.com/login.html"/>
+            </cybox:Properties>
+        </cybox:Object>
+    </cybox:Observable>
+</cybox:Observables>""",
+                            default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+
+        self.assertEqual(FactValue.objects.filter(value__in=['sample1.com/index.html',
+                                                             'sample2.com/login.html']).count(), 2)
+
+    def test_object_fingerprint(self):
+
+        # The fingerprint of an object depends on its content and on the
+        # namespaces of the prefixes used in it (which are recorded with
+        # the facts), but not on other namespaces declared in the document.
+
+        importer = Command.Importer.__class__()
+
+        type_info = importer._derive_iobject_type('cybox', 'AddressObj', 'Object')
+
+        fingerprints = []
+
+        for (prefix, value, other_namespaces) in [('AddressObj', '10.0.0.1', {}),
+                                                  ('AddressObj', '10.0.0.1', {'URIObj': 'http://cybox.mitre.org/objects#URIObject-2'}),
+                                                  ('Addr', '10.0.0.1', {}),
+                                                  ('AddressObj', '10.0.0.2', {})]:
+            importer.namespace_dict = dict({'cybox': 'http://cybox.mitre.org/cybox-2',
+                                            prefix: 'http://cybox.mitre.org/objects#AddressObject-2'},
+                                           **other_namespaces)
+            obj_dict = DingoObjDict()
+            obj_dict['@@ns'] = 'cybox'
+            obj_dict['Properties'] = {'@xsi:type': '%s:AddressObjectType' % prefix,
+                                      '@@ns': 'cybox',
+                                      'Address_Value': {'@@ns': prefix, '_value': value}}
+            fingerprints.append(importer.object_fingerprint('Object', obj_dict, type_info))
+
+        self.assertEqual(fingerprints[0], fingerprints[1])
+        self.assertNotEqual(fingerprints[1], fingerprints[2])
+        self.assertNotEqual(fingerprints[1], fingerprints[3])
+
+    def test_unchanged_revision(self):
+
+        # No revision with unchanged content is looked up for objects that
+        # are new to the database, but their fingerprints are stored for the
+        # next import.
+
+        from dingos.models import InfoObject, InfoObject2Fact
+        from mantis_stix_importer.models import InfoObjectFingerprint
+
+        class Counting_STIX_Import(STIX_Import):
+            lookups = []
+            copied = []
+
+            def import_unchanged_revision(self, namespace_uri, uid, *args, **kwargs):
+                self.lookups.append(uid)
+                result = STIX_Import.import_unchanged_revision(self, namespace_uri, uid, *args, **kwargs)
+                if result:
+                    self.copied.append(uid)
+                return result
+
+        Counting_STIX_Import().xml_import(filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+                                          default_timestamp = '2013-02-26 13:11:33.253370+00:00')
+
+        self.assertEqual(Counting_STIX_Import.lookups, [])
+        self.assertEqual(InfoObjectFingerprint.objects.count(), 15)
+
+        # If the links to the facts of the unchanged revision cannot be
+        # ordered, the facts of the new revision are derived from its content
+        # rather than copied partially.
+
+        source = InfoObjectFingerprint.objects.order_by('pk')[0].iobject
+        links = list(InfoObject2Fact.objects.filter(iobject=source).order_by('pk'))
+        self.assertTrue(len(links) > 1)
+
+        InfoObject2Fact.objects.filter(pk=links[0].pk).update(attributed_fact=links[1])
+        InfoObject2Fact.objects.filter(pk=links[1].pk).update(attributed_fact=links[0])
+
+        (delta,result) = deltaCalc(Counting_STIX_Import().xml_import)(
+            filepath='tests/testdata/xml/STIX_Phishing_Indicator.xml',
+            default_timestamp = '2013-02-26 14:11:33.253370+00:00')
+
+        self.assertEqual(len(Counting_STIX_Import.lookups), 15)
+        self.assertEqual(dict(delta)['InfoObject'], 15)
+
+        revision = InfoObject.objects.get(identifier=source.identifier,
+                                          timestamp='2013-02-26 14:11:33.253370+00:00')
+
+        self.assertEqual(revision.identifier.latest, revision)
+        self.assertEqual(InfoObject2Fact.objects.filter(iobject=revision).count(), len(links))
+        self.assertEqual(InfoObject2Fact.objects.filter(iobject=revision, attributed_fact=None).count(),
+                         InfoObject2Fact.objects.filter(iobject=source, attributed_fact=None).count() + 2)
+
+        # Objects in which another prefix is used for a namespace are not
+        # taken for unchanged revisions: their facts are derived anew rather
+        # than copied along with what has been recorded for the old prefixes.
+
+        with open('tests/testdata/xml/STIX_Phishing_Indicator.xml') as xml_file:
+            content = xml_file.read()
+
+        copied = []
+
+        for (xml_content, timestamp) in [(re.sub(r'\bEmailMessageObj([:=])', r'EMailObj\1', content),
+                                          '2013-02-26 15:11:33.253370+00:00'),
+                                         (content, '2013-02-26 16:11:33.253370+00:00')]:
+            Counting_STIX_Import.copied = []
+            Counting_STIX_Import().xml_import(xml_content=xml_content, default_timestamp=timestamp)
+            copied.append(set(Counting_STIX_Import.copied))
 
+        self.assertEqual(len(copied[1]), 15)
+        self.assertTrue(0 < len(copied[0]) < 15)
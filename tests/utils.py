@@ -14,38 +14,22 @@ import pprint
 
 pp = pprint.PrettyPrinter(indent=2)
 
-from dingos.models import dingos_class_map, DataTypeNameSpace
+from mantis_stix_importer.snapshots import take_snapshot, snapshot_delta
 
 
 def object_counter():
     """
     Returns a tuple that contains counts of how many objects of each model
-    defined in dingos.models are in the database.
+    defined in dingos.models are in the database (one COUNT query per model).
     """
-    class_names = dingos_class_map.keys()
-    class_names.sort()
-    result = []
-    for class_name in class_names:
-        result.append((class_name, len(dingos_class_map[class_name].objects.all())))
-
-    #datatypes = DataTypeNameSpace.objects.all()
-
-    #print "Datatypes"
-    #for dtype in datatypes:
-    #    print dtype.uri
-
-    return result
+    return take_snapshot('count')
 
 
 def object_count_delta(count1, count2):
     """
     Calculates the difference between to object counts.
     """
-    result = []
-    for i in range(0, len(count1)):
-        if (count2[i][1] - count1[i][1]) != 0:
-            result.append((count1[i][0], count2[i][1] - count1[i][1]))
-    return result
+    return snapshot_delta(count1, count2)
 
 
 def deltaCalc(func):